@@ -0,0 +1,369 @@
+"""
+Daily rollups behind /api/analytics/dashboard.
+
+Every quiz session, meme generation and MCQ generation adds to two rollup
+tables in the same transaction as the write:
+
+  user_daily_stats    (day, user_id, metric) -> count, total
+  global_daily_stats  (day, metric)          -> count, total   (includes anonymous activity)
+
+The dashboard sums a handful of rollup rows for the requested window
+instead of aggregating full history. A periodic compaction rebuilds the
+most recent days from the source tables, which repairs any drift; a full
+rebuild backfills the tables:
+    python backend/analytics_rollups.py rebuild
+
+Rebuilds read the source tables first, then write through db_writer in
+batches of ROLLUP_REBUILD_BATCH_DAYS days.
+"""
+import os
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import db_writer
+import models
+
+ROLLUP_COMPACT_INTERVAL_SECONDS = int(os.environ.get("ROLLUP_COMPACT_INTERVAL_SECONDS", "900"))
+ROLLUP_COMPACT_DAYS = int(os.environ.get("ROLLUP_COMPACT_DAYS", "2"))
+ROLLUP_REBUILD_BATCH_DAYS = int(os.environ.get("ROLLUP_REBUILD_BATCH_DAYS", "31"))
+
+# Metrics: count / total
+QUIZZES = "quizzes"                  # quizzes taken / summed score percentage
+QUIZ_TIME = "quiz_time"              # timed quizzes / summed seconds
+MEMES = "memes"                      # meme generations
+MCQS = "mcqs"                        # MCQ generations
+DIFFICULTY = "difficulty:"           # + difficulty: MCQ generations
+ANSWERS_CORRECT = "answers_correct"  # correct answers to the user's questions
+ANSWERS_WRONG = "answers_wrong"      # wrong answers to the user's questions
+ANSWER_TIME = "answer_time"          # timed answers to the user's questions / summed seconds
+TOPIC = "topic:"                     # + topic text: MCQ and meme generations
+
+TOPIC_MAX_CHARS = 100
+MCQ_TOPIC_CHARS = 40  # MCQ topics are the start of the source text
+WINDOW_DAYS = {"day": 1, "week": 7, "month": 30}
+TIME_RANGES = (*WINDOW_DAYS, "all")
+
+Increments = Dict[str, Tuple[int, float]]
+
+
+def today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def day_of(value: Optional[datetime]) -> date:
+    if value is None:
+        return today()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def window_start(time_range: str) -> Optional[date]:
+    """First day included in a dashboard window (None = all time)"""
+    days = WINDOW_DAYS.get(time_range)
+    return today() - timedelta(days=days - 1) if days else None
+
+
+def mcq_topic(source_content: Optional[str]) -> Optional[str]:
+    # Cut first, then strip: rebuild() can then read just the first
+    # MCQ_TOPIC_CHARS characters and still derive the same key
+    topic = (source_content or "")[:MCQ_TOPIC_CHARS].strip()
+    return topic if len(topic) > 3 else None
+
+
+def meme_topic(topic: Optional[str]) -> Optional[str]:
+    topic = (topic or "").strip()[:TOPIC_MAX_CHARS]
+    return topic if len(topic) > 3 else None
+
+
+# ==== INCREMENTAL WRITES (call before the caller's commit) ====
+
+def _upsert(db: Session, model, key: dict, count: int, total: float, conflict_columns: List[str]):
+    dialect = db.bind.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(model).values(**key, count=count, total=total)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=conflict_columns,
+            set_={"count": model.count + stmt.excluded.count, "total": model.total + stmt.excluded.total}
+        )
+        db.execute(stmt)
+        return
+    # Other databases: update, insert when the row does not exist yet
+    filters = [getattr(model, column) == value for column, value in key.items()]
+    result = db.execute(update(model).where(*filters).values(count=model.count + count, total=model.total + total))
+    if result.rowcount == 0:
+        db.add(model(**key, count=count, total=total))
+        db.flush()
+
+
+def record(db: Session, day: date, user_id: Optional[int], increments: Increments):
+    """Add increments to the global rollup and, for logged in users, the user's rollup"""
+    for metric, (count, total) in increments.items():
+        if not count and not total:
+            continue
+        _upsert(db, models.GlobalDailyStat, {"day": day, "metric": metric}, count, total, ["metric", "day"])
+        if user_id:
+            _upsert(db, models.UserDailyStat, {"day": day, "user_id": user_id, "metric": metric},
+                    count, total, ["user_id", "metric", "day"])
+
+
+def record_mcq(db: Session, generation: models.MCQGeneration):
+    increments = {MCQS: (1, 0), DIFFICULTY + str(generation.difficulty): (1, 0)}
+    topic = mcq_topic(generation.source_content)
+    if topic:
+        increments[TOPIC + topic] = (1, 0)
+    record(db, today(), generation.user_id, increments)
+
+
+def record_meme(db: Session, generation: models.MemeGeneration):
+    increments = {MEMES: (1, 0)}
+    topic = meme_topic(generation.topic)
+    if topic:
+        increments[TOPIC + topic] = (1, 0)
+    record(db, today(), generation.user_id, increments)
+
+
+def record_quiz(db: Session, quiz: models.QuizSession, answers: Iterable,
+                answered_at: Optional[datetime] = None):
+    """
+    A quiz counts for its taker; its answers count for the owners of the
+    answered questions (question-level analytics are about your questions),
+    on the day of answered_at - the value stored on the answers, as rebuild() reads it.
+    """
+    increments = {QUIZZES: (1, quiz.score_percentage or 0)}
+    if quiz.time_taken_seconds is not None:
+        increments[QUIZ_TIME] = (1, quiz.time_taken_seconds)
+    record(db, day_of(quiz.started_at), quiz.user_id, increments)
+
+    answers = list(answers)
+    if not answers:
+        return
+    owners = dict(db.query(models.MCQQuestion.id, models.MCQGeneration.user_id).join(
+        models.MCQGeneration, models.MCQQuestion.generation_id == models.MCQGeneration.id
+    ).filter(models.MCQQuestion.id.in_({a.question_id for a in answers})).all())
+
+    by_owner: Dict[Optional[int], Dict[str, List[float]]] = defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+    for ans in answers:
+        if ans.question_id not in owners:
+            continue
+        stats = by_owner[owners[ans.question_id]]
+        stats[ANSWERS_CORRECT if ans.is_correct else ANSWERS_WRONG][0] += 1
+        if ans.time_spent_seconds:
+            stats[ANSWER_TIME][0] += 1
+            stats[ANSWER_TIME][1] += ans.time_spent_seconds
+    for owner_id, stats in by_owner.items():
+        record(db, day_of(answered_at), owner_id, {metric: tuple(value) for metric, value in stats.items()})
+
+
+# ==== READS ====
+
+def totals(db: Session, user_id: Optional[int], since: Optional[date]) -> Dict[str, Tuple[int, float]]:
+    """metric -> (count, total) summed over the window (topics excluded)"""
+    model = models.UserDailyStat if user_id else models.GlobalDailyStat
+    query = db.query(model.metric, func.sum(model.count), func.sum(model.total)).filter(
+        ~model.metric.like(TOPIC + "%")
+    )
+    if user_id:
+        query = query.filter(model.user_id == user_id)
+    if since:
+        query = query.filter(model.day >= since)
+    return {metric: (count or 0, total or 0.0) for metric, count, total in query.group_by(model.metric).all()}
+
+
+def top_topics(db: Session, user_id: Optional[int], since: Optional[date], limit: int = 8) -> List[dict]:
+    model = models.UserDailyStat if user_id else models.GlobalDailyStat
+    count = func.sum(model.count).label("value")
+    query = db.query(model.metric, count).filter(model.metric.like(TOPIC + "%"))
+    if user_id:
+        query = query.filter(model.user_id == user_id)
+    if since:
+        query = query.filter(model.day >= since)
+    rows = query.group_by(model.metric).order_by(count.desc()).limit(limit).all()
+    return [{"text": metric[len(TOPIC):], "value": value} for metric, value in rows]
+
+
+def user_metric_values(db: Session, metric: str, since: Optional[date]) -> List[Tuple[int, int, float]]:
+    """(user_id, count, total) for every user with the metric in the window"""
+    query = db.query(
+        models.UserDailyStat.user_id, func.sum(models.UserDailyStat.count), func.sum(models.UserDailyStat.total)
+    ).filter(models.UserDailyStat.metric == metric)
+    if since:
+        query = query.filter(models.UserDailyStat.day >= since)
+    return [(user_id, count or 0, total or 0.0)
+            for user_id, count, total in query.group_by(models.UserDailyStat.user_id).all()]
+
+
+# ==== REBUILD / COMPACTION ====
+
+def _as_date(value) -> date:
+    return date.fromisoformat(value[:10]) if isinstance(value, str) else value
+
+
+def rebuild(db: Session, since: Optional[date] = None, user_id: Optional[int] = None) -> int:
+    """
+    Recompute rollups from the source tables for days >= since (all days when None).
+    With user_id only that user's rows are rebuilt - (user_id, time) index range scans
+    on the source tables - and the global rows are adjusted by the difference.
+    """
+    rows: Dict[Tuple[date, Optional[int], str], List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def add(day, owner_id, metric, count, total=0.0):
+        entry = rows[(_as_date(day), owner_id, metric)]
+        entry[0] += count or 0
+        entry[1] += total or 0.0
+
+    def windowed(query, column, owner):
+        if user_id:
+            query = query.filter(owner == user_id)
+        return query.filter(column >= since) if since else query
+
+    quiz_day = func.date(models.QuizSession.started_at)
+    for day, owner_id, n, score, timed, seconds in windowed(db.query(
+        quiz_day, models.QuizSession.user_id, func.count(models.QuizSession.id),
+        func.sum(models.QuizSession.score_percentage), func.count(models.QuizSession.time_taken_seconds),
+        func.sum(models.QuizSession.time_taken_seconds)
+    ), models.QuizSession.started_at, models.QuizSession.user_id).group_by(quiz_day, models.QuizSession.user_id):
+        add(day, owner_id, QUIZZES, n, score)
+        add(day, owner_id, QUIZ_TIME, timed, seconds)
+
+    meme_day = func.date(models.MemeGeneration.created_at)
+    for day, owner_id, topic, n in windowed(db.query(
+        meme_day, models.MemeGeneration.user_id, models.MemeGeneration.topic, func.count(models.MemeGeneration.id)
+    ), models.MemeGeneration.created_at, models.MemeGeneration.user_id).group_by(
+        meme_day, models.MemeGeneration.user_id, models.MemeGeneration.topic
+    ):
+        add(day, owner_id, MEMES, n)
+        if meme_topic(topic):
+            add(day, owner_id, TOPIC + meme_topic(topic), n)
+
+    mcq_day = func.date(models.MCQGeneration.created_at)
+    mcq_prefix = func.substr(models.MCQGeneration.source_content, 1, MCQ_TOPIC_CHARS)
+    for day, owner_id, difficulty, prefix, n in windowed(db.query(
+        mcq_day, models.MCQGeneration.user_id, models.MCQGeneration.difficulty, mcq_prefix,
+        func.count(models.MCQGeneration.id)
+    ), models.MCQGeneration.created_at, models.MCQGeneration.user_id).group_by(
+        mcq_day, models.MCQGeneration.user_id, models.MCQGeneration.difficulty, mcq_prefix
+    ):
+        add(day, owner_id, MCQS, n)
+        add(day, owner_id, DIFFICULTY + str(difficulty), n)
+        if mcq_topic(prefix):
+            add(day, owner_id, TOPIC + mcq_topic(prefix), n)
+
+    answer_day = func.date(models.QuestionAnswer.answered_at)
+    timed = models.QuestionAnswer.time_spent_seconds > 0
+    for day, owner_id, correct, wrong, n_timed, seconds in windowed(db.query(
+        answer_day, models.MCQGeneration.user_id,
+        func.sum(case((models.QuestionAnswer.is_correct == True, 1), else_=0)),
+        func.sum(case((models.QuestionAnswer.is_correct == True, 0), else_=1)),
+        func.sum(case((timed, 1), else_=0)),
+        func.sum(case((timed, models.QuestionAnswer.time_spent_seconds), else_=0))
+    ).join(
+        models.MCQQuestion, models.QuestionAnswer.question_id == models.MCQQuestion.id
+    ).join(
+        models.MCQGeneration, models.MCQQuestion.generation_id == models.MCQGeneration.id
+    ), models.QuestionAnswer.answered_at, models.MCQGeneration.user_id).group_by(answer_day, models.MCQGeneration.user_id):
+        add(day, owner_id, ANSWERS_CORRECT, correct)
+        add(day, owner_id, ANSWERS_WRONG, wrong)
+        add(day, owner_id, ANSWER_TIME, n_timed, seconds)
+
+    # End the read transaction: the writes below go through db_writer
+    db.rollback()
+    if user_id:
+        db_writer.write_sync(_rebuild_user, user_id, since, rows)
+        return len(rows)
+
+    global_rows: Dict[Tuple[date, str], List[float]] = defaultdict(lambda: [0, 0.0])
+    for (day, owner_id, metric), (count, total) in rows.items():
+        global_rows[(day, metric)][0] += count
+        global_rows[(day, metric)][1] += total
+
+    # One write per ROLLUP_REBUILD_BATCH_DAYS days that have rows, so a full
+    # rebuild never holds the write lock for long. The first range starts at
+    # `since` and the last one is open-ended, so stale days are dropped too.
+    days = sorted({day for day, _ in global_rows})
+    starts = days[::ROLLUP_REBUILD_BATCH_DAYS] or [since]
+    for start, end in zip([since] + starts[1:], starts[1:] + [None]):
+        def in_range(day):
+            return (start is None or day >= start) and (end is None or day < end)
+        db_writer.write_sync(_replace_days, start, end, [
+            {"day": day, "user_id": owner_id, "metric": metric, "count": count, "total": total}
+            for (day, owner_id, metric), (count, total) in rows.items()
+            if owner_id and (count or total) and in_range(day)
+        ], [
+            {"day": day, "metric": metric, "count": count, "total": total}
+            for (day, metric), (count, total) in global_rows.items()
+            if (count or total) and in_range(day)
+        ])
+    return len(global_rows)
+
+
+def _replace_days(db: Session, start: Optional[date], end: Optional[date], user_rows: List[dict],
+                  global_rows: List[dict]):
+    """Swap the rollup rows of days in [start, end) for rebuilt ones (None = unbounded)"""
+    for model in (models.UserDailyStat, models.GlobalDailyStat):
+        stmt = delete(model)
+        if start:
+            stmt = stmt.where(model.day >= start)
+        if end:
+            stmt = stmt.where(model.day < end)
+        db.execute(stmt)
+    db.bulk_insert_mappings(models.UserDailyStat, user_rows)
+    db.bulk_insert_mappings(models.GlobalDailyStat, global_rows)
+
+
+def _rebuild_user(db: Session, user_id: int, since: Optional[date], rows):
+    """Swap one user's rollup rows for recomputed ones and shift the global rows by the delta.
+    Reads the current rows in the write itself so the delta matches what it deletes."""
+    current = db.query(models.UserDailyStat).filter(models.UserDailyStat.user_id == user_id)
+    if since:
+        current = current.filter(models.UserDailyStat.day >= since)
+    delta: Dict[Tuple[date, str], List[float]] = defaultdict(lambda: [0, 0.0])
+    for stat in current:
+        delta[(stat.day, stat.metric)][0] -= stat.count or 0
+        delta[(stat.day, stat.metric)][1] -= stat.total or 0.0
+        db.delete(stat)
+    db.flush()
+    for (day, _, metric), (count, total) in rows.items():
+        delta[(day, metric)][0] += count
+        delta[(day, metric)][1] += total
+        if count or total:
+            db.add(models.UserDailyStat(day=day, user_id=user_id, metric=metric, count=count, total=total))
+    for (day, metric), (count, total) in delta.items():
+        if count or total:
+            _upsert(db, models.GlobalDailyStat, {"day": day, "metric": metric}, count, total, ["metric", "day"])
+
+
+def compact(db: Session) -> int:
+    """Periodic job: rebuild the most recent days so incremental drift never lasts"""
+    return rebuild(db, today() - timedelta(days=ROLLUP_COMPACT_DAYS - 1))
+
+
+def is_empty(db: Session) -> bool:
+    return db.query(models.GlobalDailyStat.id).first() is None
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["rebuild"] or len(sys.argv) > 3:
+        print("Usage: python backend/analytics_rollups.py rebuild [user_email]")
+        sys.exit(1)
+    import database
+    models.Base.metadata.create_all(bind=database.engine)
+    session = database.SessionLocal()
+    try:
+        if len(sys.argv) == 3:
+            user = session.query(models.User).filter(models.User.email == sys.argv[2]).first()
+            if not user:
+                print(f"User not found: {sys.argv[2]}")
+                sys.exit(1)
+            print(f"Rollup rebuild complete: {rebuild(session, user_id=user.id)} rows for {user.email}")
+        else:
+            print(f"Rollup rebuild complete: {rebuild(session)} global rows")
+    finally:
+        session.close()
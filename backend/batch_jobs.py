@@ -0,0 +1,180 @@
+"""
+Batch MCQ generation jobs (/api/generate-mcqs/batch).
+
+A job holds N source items (pasted text or URLs). Items run through a
+bounded pool of concurrent workers against the LLM, finished items are
+persisted in groups (a few transactions for the whole job instead of one
+per document) and clients poll the job for progress and results.
+
+Jobs live in memory of the worker that accepted them, so polling must
+reach the same process (sticky sessions or a single worker).
+"""
+import asyncio
+import os
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+BATCH_COMMIT_SIZE = int(os.environ.get("BATCH_COMMIT_SIZE", "25"))
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "200"))
+BATCH_JOB_TTL_SECONDS = int(os.environ.get("BATCH_JOB_TTL_SECONDS", "3600"))
+
+PENDING = "pending"
+RUNNING = "running"
+GENERATED = "generated"
+DONE = "done"
+FAILED = "failed"
+
+
+class BatchItem:
+    def __init__(self, index: int, text: Optional[str] = None, url: Optional[str] = None,
+                 title: Optional[str] = None, input_type: str = "paste_text"):
+        self.index = index
+        self.text = text
+        self.url = url
+        self.title = title
+        self.input_type = input_type
+        self.status = PENDING
+        self.error: Optional[str] = None
+        self.questions: List[dict] = []
+        self.model: Optional[str] = None
+        self.cached = False
+        self.generation_id: Optional[int] = None
+        self.generation_time = 0.0
+
+    def to_dict(self, include_questions: bool) -> dict:
+        data = {
+            "index": self.index,
+            "title": self.title or self.url,
+            "status": self.status,
+            "generation_id": self.generation_id,
+            "num_questions": len(self.questions),
+            "model": self.model,
+            "cached": self.cached,
+            "error": self.error
+        }
+        if include_questions:
+            data["questions"] = self.questions
+        return data
+
+
+class BatchJob:
+    def __init__(self, items: List[BatchItem], params: dict, user_id: Optional[int],
+                 ip_address: Optional[str] = None, user_agent: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.items = items
+        self.params = params
+        self.user_id = user_id
+        self.ip_address = ip_address
+        self.user_agent = user_agent
+        self.status = PENDING
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def progress(self) -> dict:
+        counts = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        finished = counts.get(DONE, 0) + counts.get(FAILED, 0)
+        return {
+            "total": len(self.items),
+            "completed": counts.get(DONE, 0),
+            "failed": counts.get(FAILED, 0),
+            "in_progress": counts.get(RUNNING, 0) + counts.get(GENERATED, 0),
+            "percent": round(100.0 * finished / len(self.items), 1) if self.items else 100.0
+        }
+
+    def to_dict(self, include_questions: bool = False) -> dict:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress(),
+            "elapsed_seconds": round(end - self.created_at, 2),
+            "items": [item.to_dict(include_questions) for item in self.items]
+        }
+
+
+_jobs: Dict[str, BatchJob] = {}
+
+
+def register(job: BatchJob) -> BatchJob:
+    _cleanup()
+    _jobs[job.id] = job
+    return job
+
+
+def get(job_id: str) -> Optional[BatchJob]:
+    return _jobs.get(job_id)
+
+
+def _cleanup():
+    cutoff = time.time() - BATCH_JOB_TTL_SECONDS
+    for job_id in [j.id for j in _jobs.values() if j.finished_at and j.finished_at < cutoff]:
+        del _jobs[job_id]
+
+
+async def run_job(
+    job: BatchJob,
+    load_text: Callable[[str], Awaitable[str]],
+    generate: Callable[[str], Awaitable[Tuple[List[dict], str, bool]]],
+    persist: Callable[[BatchJob, List[BatchItem]], None]
+):
+    """
+    Drive a job to completion.
+      load_text(url)   -> source text for URL items
+      generate(text)   -> (questions, model, cached)
+      persist(job, items) - sync; writes a group of generated items in one transaction
+    """
+    job.status = RUNNING
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    ready: List[BatchItem] = []
+    persist_lock = asyncio.Lock()
+
+    async def flush():
+        async with persist_lock:
+            group = ready[:]
+            ready.clear()
+            if not group:
+                return
+            try:
+                await run_in_threadpool(persist, job, group)
+                for item in group:
+                    item.status = DONE
+            except Exception as e:
+                print(f"Batch job {job.id}: persisting {len(group)} items failed: {e}")
+                for item in group:
+                    item.status = FAILED
+                    item.error = f"Save failed: {str(e)}"
+
+    async def worker(item: BatchItem):
+        async with semaphore:
+            item.status = RUNNING
+            start = time.time()
+            try:
+                if not item.text and item.url:
+                    item.text = await load_text(item.url)
+                if not item.text or not item.text.strip():
+                    raise ValueError("No text to generate from")
+                item.questions, item.model, item.cached = await generate(item.text)
+                item.generation_time = time.time() - start
+                item.status = GENERATED
+            except Exception as e:
+                item.status = FAILED
+                item.error = getattr(e, "detail", None) or str(e)
+                return
+        ready.append(item)
+        if len(ready) >= BATCH_COMMIT_SIZE:
+            await flush()
+
+    try:
+        await asyncio.gather(*(worker(item) for item in job.items))
+        await flush()
+    finally:
+        job.status = DONE
+        job.finished_at = time.time()
+        print(f"Batch job {job.id} finished: {job.progress()}")
@@ -0,0 +1,170 @@
+"""
+Load test of the DB_ASYNC modes.
+
+Seeds a database with users, quizzes, memes, the social feed and the
+dashboard rollups, then starts the API under uvicorn once with
+DB_ASYNC=false and once with DB_ASYNC=true and sends the same mix of
+requests to the endpoints on database.get_async_db (social feed,
+dashboard, trending, bookmarks), at each concurrency level:
+
+    python backend/benchmark_async_db.py                          # throwaway SQLite
+    python backend/benchmark_async_db.py --requests 5000 --concurrency 50 200
+    python backend/benchmark_async_db.py --database-url postgresql://...   # writes seed rows there
+
+Compare the two modes on the database you deploy on: results on SQLite
+say little about Postgres or MySQL.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BACKEND = os.path.dirname(os.path.abspath(__file__))
+SEED_EMAIL = "load0@example.com"
+PATHS = (
+    "/api/social/feed?limit=40",
+    "/api/analytics/dashboard?time_range=month",
+    "/api/analytics/dashboard?time_range=all&target_email=global",
+    "/api/trending?limit=10",
+    "/api/bookmarks/check?content_type=meme&content_id=1",
+)
+
+
+def seed(users: int, rows: int):
+    """Runs in a child process so this one never imports the app"""
+    import analytics_rollups
+    import database
+    import models
+    import social_feed
+    from sqlalchemy import insert
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        if db.query(models.User).filter(models.User.email == SEED_EMAIL).first():
+            return
+        db.execute(insert(models.User), [
+            {"email": f"load{i}@example.com", "full_name": f"Load {i}"} for i in range(users)
+        ])
+        user_ids = [u.id for u in db.query(models.User.id).filter(models.User.email.like("load%@example.com"))]
+        base = datetime.utcnow() - timedelta(days=30)
+        db.execute(insert(models.MemeGeneration), [
+            dict(user_id=user_ids[i % len(user_ids)], input_type="topic", topic=f"Load topic {i % 50}",
+                 meme_type="image", num_memes=1, total_generated=1, successful_generations=1,
+                 failed_generations=0, created_at=base + timedelta(minutes=i))
+            for i in range(rows // 2)
+        ])
+        db.execute(insert(models.QuizSession), [
+            dict(user_id=user_ids[i % len(user_ids)], total_questions=5, correct_answers=i % 6,
+                 score_percentage=(i % 6) * 20, time_taken_seconds=40, is_completed=True,
+                 started_at=base + timedelta(minutes=i))
+            for i in range(rows - rows // 2)
+        ])
+        db.commit()
+        social_feed.backfill(db)
+        analytics_rollups.rebuild(db)
+    finally:
+        db.close()
+
+
+async def load(base_url: str, token: str, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"},
+                                 timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        for path in PATHS:
+            (await client.get(path)).raise_for_status()
+
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    res = await client.get(PATHS[i % len(PATHS)])
+                    if res.status_code != 200:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+        "errors": errors,
+    }
+
+
+def wait_until_up(base_url: str, server: subprocess.Popen):
+    import httpx
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        try:
+            httpx.get(f"{base_url}/health", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    raise RuntimeError("API server did not start within 60s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DB_ASYNC load test")
+    parser.add_argument("--requests", type=int, default=3000, help="requests per mode and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=40000, help="quiz sessions plus meme generations to seed")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--seed-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.seed_only:
+        sys.path.insert(0, BACKEND)
+        seed(args.users, args.rows)
+        return
+
+    env = dict(os.environ, DATABASE_URL=args.database_url or f"sqlite:///{tempfile.mkdtemp()}/load.db")
+    print(f"Seeding {args.rows} rows for {args.users} users...")
+    subprocess.run([sys.executable, os.path.abspath(__file__), "--seed-only", "--users", str(args.users),
+                    "--rows", str(args.rows)], env=env, check=True, stdout=subprocess.DEVNULL)
+
+    sys.path.insert(0, BACKEND)
+    os.environ["DATABASE_URL"] = env["DATABASE_URL"]
+    from auth import core as auth
+    token = auth.create_access_token({"sub": SEED_EMAIL})
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    print(f"{args.requests} requests per run over {len(PATHS)} endpoints")
+    print(f"  {'mode':<15} {'concurrency':>11} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for mode in ("false", "true"):
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND, "--port", str(args.port),
+             "--log-level", "warning"],
+            env=dict(env, DB_ASYNC=mode), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_up(base_url, server)
+            for concurrency in args.concurrency:
+                result = asyncio.run(load(base_url, token, args.requests, concurrency))
+                print(f"  DB_ASYNC={mode:<6} {concurrency:>11} {result['rps']:>7.0f} {result['p50']:>8.0f} "
+                      f"{result['p95']:>8.0f} {result['errors']:>7}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Dashboard benchmark on a large synthetic history.
+
+Fills a throwaway SQLite database with quiz sessions, MCQ generations and
+meme generations spread over a year, then measures:
+
+  1. /api/analytics/dashboard for every time_range, for one user and
+     global (served from the daily rollups)
+  2. the same windows aggregated from the source tables - what the
+     dashboard ran before the rollups - globally, and for a heavy user
+     (10% of all rows; analytics_rollups.rebuild(user_id=...) runs these)
+     with the (user_id, time) composite indexes and again without them
+
+    python backend/benchmark_dashboard.py                    # 1M rows
+    python backend/benchmark_dashboard.py --rows 200000 --runs 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+COMPOSITE_INDEXES = (
+    "ix_quiz_sessions_user_started",
+    "ix_mcq_generations_user_created",
+    "ix_meme_generations_user_created",
+)
+
+
+def timed(fn, runs: int) -> float:
+    """Median milliseconds of runs calls (after one warm-up call)"""
+    fn()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def seed(db, models, rows: int, users: int, days: int):
+    from sqlalchemy import insert
+
+    rng = random.Random(42)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    user_ids = [u.id for u in db.query(models.User.id).order_by(models.User.id)]
+    heavy_user_id = user_ids[0]
+
+    def when():
+        return now - timedelta(seconds=rng.randrange(days * 86400))
+
+    def owner():
+        return heavy_user_id if rng.random() < 0.1 else rng.choice(user_ids)
+
+    # Half quizzes, 30% MCQ generations, 20% meme generations
+    counts = {
+        models.QuizSession: rows // 2,
+        models.MCQGeneration: rows * 3 // 10,
+        models.MemeGeneration: rows - rows // 2 - rows * 3 // 10,
+    }
+    builders = {
+        models.QuizSession: lambda: {
+            "user_id": owner(), "total_questions": 5, "correct_answers": rng.randrange(6),
+            "score_percentage": rng.randrange(101), "time_taken_seconds": rng.randrange(20, 300),
+            "is_completed": True, "started_at": when(),
+        },
+        models.MCQGeneration: lambda: {
+            "user_id": owner(), "input_type": "paste_text", "content_type": "general",
+            "difficulty": rng.choice(("easy", "medium", "hard")), "num_questions": 5,
+            "source_content": f"Topic {rng.randrange(200)} notes", "created_at": when(),
+        },
+        models.MemeGeneration: lambda: {
+            "user_id": owner(), "input_type": "topic", "topic": f"Meme topic {rng.randrange(200)}",
+            "meme_type": "image", "num_memes": 1, "total_generated": 1, "successful_generations": 1,
+            "failed_generations": 0, "created_at": when(),
+        },
+    }
+    for model, count in counts.items():
+        for start in range(0, count, 20000):
+            db.execute(insert(model), [builders[model]() for _ in range(min(20000, count - start))])
+        db.commit()
+        print(f"  {model.__tablename__}: {count} rows")
+
+
+def windowed_source_queries(db, models, user_id, since: datetime):
+    """KPI aggregates of one window from the source tables (user_id None = global)"""
+    from sqlalchemy import func
+
+    def scoped(query, owner, column):
+        query = query.filter(column >= since)
+        return query.filter(owner == user_id) if user_id else query
+
+    Quiz, Mcq, Meme = models.QuizSession, models.MCQGeneration, models.MemeGeneration
+    scoped(db.query(func.count(Quiz.id), func.sum(Quiz.score_percentage), func.sum(Quiz.time_taken_seconds)),
+           Quiz.user_id, Quiz.started_at).one()
+    scoped(db.query(Mcq.difficulty, func.count(Mcq.id)), Mcq.user_id, Mcq.created_at).group_by(Mcq.difficulty).all()
+    scoped(db.query(func.count(Meme.id)), Meme.user_id, Meme.created_at).one()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytics dashboard benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="source rows across the three tables")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    # Always a fresh database: the benchmark drops indexes
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main as app_main
+    import analytics_rollups
+    import database
+    import models
+    from auth import core as auth
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    print(f"Seeding {args.rows} rows for {args.users} users over {args.days} days...")
+    db.bulk_insert_mappings(models.User, [
+        {"email": f"bench{i}@example.com", "full_name": f"Bench {i}"} for i in range(args.users)
+    ])
+    db.commit()
+    seed(db, models, args.rows, args.users, args.days)
+
+    start = time.perf_counter()
+    analytics_rollups.rebuild(db)
+    print(f"Rollup rebuild: {time.perf_counter() - start:.1f}s")
+
+    user = db.query(models.User).filter(models.User.email == "bench0@example.com").one()
+    client = TestClient(app_main.app)
+    headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': user.email})}"}
+
+    print(f"\n/api/analytics/dashboard, median of {args.runs} (ms)")
+    print(f"  {'time_range':<10} {'self':>8} {'global':>8}")
+    for time_range in analytics_rollups.TIME_RANGES:
+        def dashboard(target=None):
+            params = {"time_range": time_range, **({"target_email": target} if target else {})}
+            res = client.get("/api/analytics/dashboard", headers=headers, params=params)
+            assert res.status_code == 200, res.text
+        self_ms = timed(dashboard, args.runs)
+        global_ms = timed(lambda: dashboard("global"), args.runs)
+        print(f"  {time_range:<10} {self_ms:>8.1f} {global_ms:>8.1f}")
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    windows = {"day": now - timedelta(days=1), "week": now - timedelta(days=7),
+               "month": now - timedelta(days=30), "all": datetime(1970, 1, 1)}
+    results = {"global": {
+        name: timed(lambda: windowed_source_queries(db, models, None, since), args.runs)
+        for name, since in windows.items()
+    }}
+    for label in ("indexed", "no index"):
+        if label == "no index":
+            for name in COMPOSITE_INDEXES:
+                db.execute(text(f"DROP INDEX {name}"))
+            db.commit()
+        results[label] = {
+            name: timed(lambda: windowed_source_queries(db, models, user.id, since), args.runs)
+            for name, since in windows.items()
+        }
+    print(f"\nSame windows aggregated from the source tables, median of {args.runs} (ms)")
+    print(f"  {'time_range':<10} {'global':>8} {'user, indexed':>14} {'user, no index':>15}")
+    for name in windows:
+        print(f"  {name:<10} {results['global'][name]:>8.1f} {results['indexed'][name]:>14.2f} "
+              f"{results['no index'][name]:>15.2f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+MCQ persistence microbenchmark: generations of 10/50/200 questions saved
+the old way (ORM add per question, commit, refresh each row for its id)
+versus persistence.insert_children (one multi-row INSERT).
+
+Runs on a throwaway SQLite database, or on DATABASE_URL with
+--database-url (rows are written to mcq_generations / mcq_questions):
+
+    python backend/benchmark_persistence.py
+    python backend/benchmark_persistence.py --database-url postgresql://... --generations 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+SIZES = (10, 50, 200)
+
+
+def question(generation_id: int, number: int) -> dict:
+    return dict(
+        generation_id=generation_id,
+        question_number=number,
+        question_text=f"Question {number}: which option is right?",
+        option_a="First", option_b="Second", option_c="Third", option_d="Fourth",
+        correct_answer="B",
+        explanation="Because the second option is right."
+    )
+
+
+def generation(models, size: int):
+    return models.MCQGeneration(input_type="paste_text", content_type="general", difficulty="easy",
+                                num_questions=size, questions_data=[])
+
+
+def save_per_row(db, models, size: int) -> list:
+    gen = generation(models, size)
+    db.add(gen)
+    db.commit()
+    rows = [models.MCQQuestion(**question(gen.id, n)) for n in range(1, size + 1)]
+    for row in rows:
+        db.add(row)
+    db.commit()
+    for row in rows:
+        db.refresh(row)
+    return [row.id for row in rows]
+
+
+def save_bulk(db, models, persistence, size: int) -> list:
+    gen = generation(models, size)
+    db.add(gen)
+    db.flush()
+    ids = persistence.insert_children(
+        db, models.MCQQuestion, [question(gen.id, n) for n in range(1, size + 1)],
+        order_by=models.MCQQuestion.question_number
+    )
+    db.commit()
+    return ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCQ persistence microbenchmark")
+    parser.add_argument("--generations", type=int, default=200, help="generations saved per size and path")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import database
+    import models
+    import persistence
+
+    models.Base.metadata.create_all(bind=database.engine)
+    print(f"{database.engine.dialect.name}, {args.generations} generations per size and path")
+    print(f"  {'questions':>9} {'per-row q/s':>12} {'bulk q/s':>10} {'speedup':>8}")
+    for size in SIZES:
+        rates = []
+        for save in (lambda db: save_per_row(db, models, size), lambda db: save_bulk(db, models, persistence, size)):
+            db = database.SessionLocal()
+            try:
+                save(db)  # warm-up
+                start = time.perf_counter()
+                for _ in range(args.generations):
+                    save(db)
+                rates.append(size * args.generations / (time.perf_counter() - start))
+            finally:
+                db.close()
+        print(f"  {size:>9} {rates[0]:>12.0f} {rates[1]:>10.0f} {rates[1] / rates[0]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,10 @@ from sqlalchemy import desc, func
 from typing import Optional, List
 from datetime import datetime, timedelta
 import models
-from database import get_db
+import trending
+import view_counters
+import database
+import db_executor
 
 router = APIRouter()
 
@@ -37,81 +40,36 @@ class ViewRequest(BaseModel):
     content_id: int
 
 @router.post("/api/content/view")
-async def track_view(
-    request: ViewRequest,
-    db: Session = Depends(get_db)
-):
-    """Track content view"""
-    try:
-        if request.content_type == "mcq":
-            item = db.query(models.MCQGeneration).filter(models.MCQGeneration.id == request.content_id).first()
-            if item:
-                item.view_count += 1
-                db.commit()
-        elif request.content_type == "meme":
-            item = db.query(models.MemeGeneration).filter(models.MemeGeneration.id == request.content_id).first()
-            if item:
-                item.view_count += 1
-                db.commit()
-        
-        return {"success": True}
-    except Exception as e:
-        print(f"View tracking error: {e}")
-        return {"success": False}
+async def track_view(request: ViewRequest):
+    """Track content view (buffered, written in batches - see view_counters.py)"""
+    view_counters.add(request.content_type, request.content_id, "view_count")
+    return {"success": True}
 
 @router.post("/api/content/share")
-async def track_share(
-    request: ViewRequest,
-    db: Session = Depends(get_db)
-):
-    """Track content share"""
-    try:
-        if request.content_type == "mcq":
-            item = db.query(models.MCQGeneration).filter(models.MCQGeneration.id == request.content_id).first()
-            if item:
-                item.share_count += 1
-                db.commit()
-        elif request.content_type == "meme":
-            item = db.query(models.MemeGeneration).filter(models.MemeGeneration.id == request.content_id).first()
-            if item:
-                item.share_count += 1
-                db.commit()
-        
-        return {"success": True}
-    except Exception as e:
-        print(f"Share tracking error: {e}")
-        return {"success": False}
+async def track_share(request: ViewRequest):
+    """Track content share (buffered, written in batches - see view_counters.py)"""
+    view_counters.add(request.content_type, request.content_id, "share_count")
+    return {"success": True}
 
 @router.get("/api/trending")
 async def get_trending(
     content_type: Optional[str] = None,  # mcq, meme, all
     limit: int = 10,
     days: int = 7,  # Trending in last N days
-    db: Session = Depends(get_db)
+    sort: str = "score",  # score: views + saves*2 + shares*3, hot: decayed by age (see trending.py)
+    db=Depends(database.get_async_db)
 ):
     """Get trending content"""
+    if sort not in trending.SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort. Use one of: {', '.join(trending.SORTS)}")
     result = {"mcqs": [], "memes": []}
     
-    # Calculate trending score: views + (saves * 2) + (shares * 3)
+    # Scored, sorted and limited in SQL
     cutoff_date = datetime.utcnow() - timedelta(days=days)
     
     if content_type in [None, "all", "mcq"]:
         # Get trending MCQs
-        mcqs = db.query(models.MCQGeneration).filter(
-            models.MCQGeneration.created_at >= cutoff_date
-        ).all()
-        
-        # Calculate trending score
-        mcq_scores = []
-        for mcq in mcqs:
-            score = (mcq.view_count or 0) + (mcq.save_count or 0) * 2 + (mcq.share_count or 0) * 3
-            mcq_scores.append((mcq, score))
-        
-        # Sort by score
-        mcq_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        # Get top items
-        for mcq, score in mcq_scores[:limit]:
+        for mcq, score in await database.run_sync(db, trending.top, models.MCQGeneration, cutoff_date, limit, sort):
             result["mcqs"].append({
                 "id": mcq.id,
                 "difficulty": mcq.difficulty,
@@ -127,21 +85,7 @@ async def get_trending(
     
     if content_type in [None, "all", "meme"]:
         # Get trending Memes
-        memes = db.query(models.MemeGeneration).filter(
-            models.MemeGeneration.created_at >= cutoff_date
-        ).all()
-        
-        # Calculate trending score
-        meme_scores = []
-        for meme in memes:
-            score = (meme.view_count or 0) + (meme.save_count or 0) * 2 + (meme.share_count or 0) * 3
-            meme_scores.append((meme, score))
-        
-        # Sort by score
-        meme_scores.sort(key=lambda x: x[1], reverse=True)
-        
-        # Get top items
-        for meme, score in meme_scores[:limit]:
+        for meme, score in await database.run_sync(db, trending.top, models.MemeGeneration, cutoff_date, limit, sort):
             result["memes"].append({
                 "id": meme.id,
                 "topic": meme.topic,
@@ -161,10 +105,12 @@ async def get_trending(
 async def get_content_by_category(
     category: str,
     content_type: Optional[str] = None,  # mcq, meme, all
-    limit: int = 20,
-    db: Session = Depends(get_db)
+    limit: int = 20
 ):
     """Get content by category"""
+    return await db_executor.run(content_by_category, category, content_type, limit)
+
+def content_by_category(db: Session, category: str, content_type: Optional[str], limit: int) -> dict:
     result = {"mcqs": [], "memes": []}
     
     if content_type in [None, "all", "mcq"]:
@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -34,10 +36,48 @@ engine = create_engine(
     echo=False  # Disable SQL echo for performance
 )
 
+# Async mode: endpoints on get_async_db talk to the database through an async driver
+# (aiosqlite / asyncpg / aiomysql) instead of blocking the event loop. Everything else
+# keeps using the sync engine, so both point at the same database.
+#
+# Off by default. Keep it off on SQLite: aiosqlite runs every connection on a thread of its own
+# and serializes the calls, and benchmark_async_db.py measured it slower than the sync pool
+# (3000 requests: 90 vs 110 req/s at concurrency 50, 44 vs 105 req/s at 200).
+# Turn it on only for Postgres or MySQL, and only if benchmark_async_db.py against that
+# database shows a gain - e.g. when the DB-bound async endpoints queue for threadpool workers.
+DB_ASYNC =os.environ.get("DB_ASYNC", "false").lower() == "true"
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "mysql": "mysql+aiomysql"}
+
+
+def async_url(url: str) -> str:
+    """Same database, async driver"""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(
+            f"DB_ASYNC=true has no async driver for '{backend}' "
+            f"(supported: {', '.join(ASYNC_DRIVERS)}); set ASYNC_DATABASE_URL or DB_ASYNC=false"
+        )
+    # str(url) would mask the password as ***
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_engine = create_async_engine(
+        os.environ.get("ASYNC_DATABASE_URL") or async_url(DATABASE_URL),
+        connect_args=connect_args,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        echo=False
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Enable WAL mode for SQLite (better concurrency)
 if "sqlite" in DATABASE_URL:
     from sqlalchemy import event
-    @event.listens_for(engine, "connect")
     def set_sqlite_pragma(dbapi_connection, connection_record):
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA journal_mode=WAL")
@@ -45,6 +85,10 @@ if "sqlite" in DATABASE_URL:
         cursor.execute("PRAGMA busy_timeout=5000")
         cursor.close()
 
+    event.listen(engine, "connect", set_sqlite_pragma)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "connect", set_sqlite_pragma)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -56,3 +100,26 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency for async endpoints: an AsyncSession in DB_ASYNC mode, a regular Session otherwise
+async def get_async_db():
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+        return
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def run_sync(db, fn, *args, **kwargs):
+    """
+    Run sync ORM code fn(session, *args, **kwargs) on a get_async_db session.
+    With an AsyncSession the queries go through the async driver. Loaded columns of
+    returned objects can be read afterwards, but relationships and other lazy loads
+    only work inside fn.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return fn(db, *args, **kwargs)
@@ -0,0 +1,127 @@
+"""
+Bounded thread pool for the sync database work of async endpoints.
+
+An `async def` endpoint that queries through a sync Session blocks the
+event loop for the whole query - with SQLite that includes up to
+busy_timeout (5s) waiting for the write lock. run(fn, ...) executes
+fn(session, ...) on a dedicated pool instead, with its own session.
+
+  DB_EXECUTOR_WORKERS      threads; defaults to the engine's pool size +
+                           max overflow, so a worker never waits for a
+                           connection
+  DB_EXECUTOR_MAX_QUEUE    calls waiting for a worker beyond this are
+                           rejected with 503 instead of piling up
+  DB_EXECUTOR_TIMEOUT_SECONDS
+                           a call that has not started by then is dropped
+                           (503); one that is already running cannot be
+                           interrupted, so the caller gets 504 and the
+                           work finishes in the background
+
+stats() feeds /api/metrics/db.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+
+import database
+
+
+def _engine_connections() -> int:
+    pool = database.engine.pool
+    if not hasattr(pool, "size"):
+        # NullPool / StaticPool: no fixed limit to match
+        return 5
+    return pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+
+
+DB_EXECUTOR_WORKERS = int(os.environ.get("DB_EXECUTOR_WORKERS", "0")) or _engine_connections()
+DB_EXECUTOR_MAX_QUEUE = int(os.environ.get("DB_EXECUTOR_MAX_QUEUE", "200"))
+DB_EXECUTOR_TIMEOUT_SECONDS = float(os.environ.get("DB_EXECUTOR_TIMEOUT_SECONDS", "15"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+_stats = {
+    "queued": 0, "active": 0, "completed": 0, "failed": 0,
+    "rejected": 0, "timeouts": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0,
+}
+
+
+def _call(fn, args, kwargs, submitted: float):
+    wait_ms = (time.monotonic() - submitted) * 1000
+    with _lock:
+        _stats["queued"] -= 1
+        _stats["active"] += 1
+        _stats["wait_ms_total"] += wait_ms
+        _stats["wait_ms_max"] = max(_stats["wait_ms_max"], wait_ms)
+    db = database.SessionLocal()
+    failed = True
+    try:
+        result = fn(db, *args, **kwargs)
+        failed = False
+        return result
+    finally:
+        db.close()
+        with _lock:
+            _stats["active"] -= 1
+            _stats["failed" if failed else "completed"] += 1
+
+
+def _pool() -> ThreadPoolExecutor:
+    # Created on first use (and again after shutdown), so a restarted app gets a fresh pool
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+    return _executor
+
+
+async def run(fn, *args, timeout: float = None, **kwargs):
+    """Await fn(session, *args, **kwargs) run on the DB pool; the session is closed afterwards"""
+    with _lock:
+        if _stats["queued"] >= DB_EXECUTOR_MAX_QUEUE:
+            _stats["rejected"] += 1
+            raise HTTPException(status_code=503, detail="Database busy, try again shortly")
+        _stats["queued"] += 1
+    future = _pool().submit(_call, fn, args, kwargs, time.monotonic())
+    try:
+        return await asyncio.wait_for(
+            asyncio.shield(asyncio.wrap_future(future)),
+            timeout or DB_EXECUTOR_TIMEOUT_SECONDS
+        )
+    except asyncio.TimeoutError:
+        with _lock:
+            _stats["timeouts"] += 1
+        if future.cancel():
+            # Never started: nothing was written
+            with _lock:
+                _stats["queued"] -= 1
+            raise HTTPException(status_code=503, detail="Database busy, try again shortly")
+        raise HTTPException(status_code=504, detail="Database request timed out")
+
+
+def stats() -> dict:
+    with _lock:
+        started = _stats["completed"] + _stats["failed"] + _stats["active"]
+        return {
+            "workers": DB_EXECUTOR_WORKERS,
+            "max_queue": DB_EXECUTOR_MAX_QUEUE,
+            "queued": _stats["queued"],
+            "active": _stats["active"],
+            "completed": _stats["completed"],
+            "failed": _stats["failed"],
+            "rejected": _stats["rejected"],
+            "timeouts": _stats["timeouts"],
+            "avg_wait_ms": round(_stats["wait_ms_total"] / started, 2) if started else 0,
+            "max_wait_ms": round(_stats["wait_ms_max"], 2),
+        }
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
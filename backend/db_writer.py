@@ -0,0 +1,213 @@
+"""
+Write path for likes, comments, bookmarks, feedback, quiz sessions,
+generations, counters and tracked events, and for the maintenance jobs:
+rollup rebuilds and compaction, leaderboard snapshots, feed counter
+repair, trending scores and the generation cache. Low-volume writes
+outside it (profile edits, login history, the admin query, startup and
+CLI backfills) still commit on their own sessions and wait for the
+SQLite lock through busy_timeout.
+
+    result = await db_writer.write(fn, *args)       # async endpoints
+    result = db_writer.write_sync(fn, *args)        # sync code in worker threads
+
+fn(session, *args) makes its changes and returns plain data (ids, counts);
+it must not commit or roll back - write() commits it.
+
+By default each write is its own transaction on the db_executor pool.
+
+With SQLITE_SINGLE_WRITER=true (SQLite only) every write goes through
+one writer task instead: it collects writes for up to
+SQLITE_WRITER_BATCH_MS (or SQLITE_WRITER_BATCH_MAX writes), runs each in
+its own SAVEPOINT on a single writer thread and commits them together.
+A failing write only rolls back its savepoint and its caller gets the
+exception; the others still commit. Writers no longer queue on the
+database file lock (and busy_timeout) - reads stay on the WAL
+connections of the regular pool. The writer is per process: with several
+workers each has its own, which still cuts lock contention to one
+writer per worker.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+import database
+import db_executor
+
+SQLITE_SINGLE_WRITER = (
+    os.environ.get("SQLITE_SINGLE_WRITER", "false").lower() == "true"
+    and database.DATABASE_URL.startswith("sqlite")
+)
+SQLITE_WRITER_BATCH_MS = float(os.environ.get("SQLITE_WRITER_BATCH_MS", "5"))
+SQLITE_WRITER_BATCH_MAX = int(os.environ.get("SQLITE_WRITER_BATCH_MAX", "200"))
+SQLITE_WRITER_QUEUE_MAX = int(os.environ.get("SQLITE_WRITER_QUEUE_MAX", "10000"))
+
+_STOP = object()
+
+_queue: Optional[asyncio.Queue] = None
+_task: Optional[asyncio.Task] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+_lock = threading.Lock()
+_stats = {"writes": 0, "failed": 0, "rejected": 0, "commits": 0, "failed_commits": 0, "max_batch": 0}
+
+
+def _commit(db, fn, args, kwargs):
+    result = fn(db, *args, **kwargs)
+    db.commit()
+    return result
+
+
+def _apply(batch: List[tuple]) -> List[tuple]:
+    """Writer thread: one transaction for the whole batch, one savepoint per write"""
+    outcomes = []
+    db = database.SessionLocal()
+    try:
+        for fn, args, kwargs, _ in batch:
+            try:
+                with db.begin_nested():
+                    outcomes.append((True, fn(db, *args, **kwargs)))
+            except Exception as e:
+                outcomes.append((False, e))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Writer commit failed ({len(batch)} writes): {e}")
+        with _lock:
+            _stats["failed_commits"] += 1
+            _stats["failed"] += len(batch)
+        return [(False, e)] * len(batch)
+    finally:
+        db.close()
+    with _lock:
+        _stats["commits"] += 1
+        _stats["writes"] += len(batch)
+        _stats["failed"] += sum(1 for ok, _ in outcomes if not ok)
+        _stats["max_batch"] = max(_stats["max_batch"], len(batch))
+    return outcomes
+
+
+async def _fill(queue: asyncio.Queue) -> List[tuple]:
+    batch = [await queue.get()]
+    if batch[0] is _STOP:
+        return batch
+    deadline = _loop.time() + SQLITE_WRITER_BATCH_MS / 1000
+    while len(batch) < SQLITE_WRITER_BATCH_MAX:
+        try:
+            job = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            remaining = deadline - _loop.time()
+            if remaining <= 0:
+                break
+            try:
+                job = await asyncio.wait_for(queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+        batch.append(job)
+        if job is _STOP:
+            break
+    return batch
+
+
+async def _run(queue: asyncio.Queue):
+    while True:
+        batch = await _fill(queue)
+        stop = batch[-1] is _STOP
+        if stop:
+            batch.pop()
+        if batch:
+            outcomes = await _loop.run_in_executor(_thread, _apply, batch)
+            for (_, _, _, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue  # caller went away
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+        if stop:
+            return
+
+
+def _direct(fn, args, kwargs):
+    db = database.SessionLocal()
+    try:
+        return _commit(db, fn, args, kwargs)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _enqueue(fn, args, kwargs) -> asyncio.Future:
+    future = _loop.create_future()
+    try:
+        _queue.put_nowait((fn, args, kwargs, future))
+    except asyncio.QueueFull:
+        with _lock:
+            _stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Database busy, try again shortly")
+    return future
+
+
+async def write(fn, *args, **kwargs):
+    """Await fn(session, *args, **kwargs) committed; returns fn's result"""
+    if _queue is None:
+        return await db_executor.run(_commit, fn, args, kwargs)
+    future = _enqueue(fn, args, kwargs)
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), db_executor.DB_EXECUTOR_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        # Still queued or running on the writer - it will commit (or fail) without us
+        raise HTTPException(status_code=504, detail="Database request timed out")
+
+
+async def _write_untimed(fn, args, kwargs):
+    if _queue is None:
+        # The writer stopped after write_sync looked
+        return await run_in_threadpool(_direct, fn, args, kwargs)
+    return await _enqueue(fn, args, kwargs)
+
+
+def write_sync(fn, *args, **kwargs):
+    """
+    write() for sync code in a worker thread (never call it on the event loop).
+    No timeout: callers like the counter flush must know whether their write committed.
+    """
+    if _queue is None:
+        return _direct(fn, args, kwargs)
+    return asyncio.run_coroutine_threadsafe(_write_untimed(fn, args, kwargs), _loop).result()
+
+
+def start():
+    global _queue, _task, _loop
+    if SQLITE_SINGLE_WRITER and _task is None:
+        _loop = asyncio.get_running_loop()
+        _queue = asyncio.Queue(maxsize=SQLITE_WRITER_QUEUE_MAX)
+        _task = _loop.create_task(_run(_queue))
+        print(f"SQLite single-writer mode on (batch window {SQLITE_WRITER_BATCH_MS}ms)")
+
+
+async def stop():
+    """Commit everything queued, then send new writes down the regular path"""
+    global _queue, _task
+    if _task is None:
+        return
+    queue, _queue = _queue, None
+    await queue.put(_STOP)
+    await _task
+    _task = None
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            "single_writer": _task is not None,
+            "queued": _queue.qsize() if _queue else 0,
+            "avg_batch": round(_stats["writes"] / _stats["commits"], 2) if _stats["commits"] else 0,
+            **_stats,
+        }
@@ -0,0 +1,190 @@
+"""
+Non-blocking ingestion for /api/track-event(s) and /api/track-session.
+
+Requests only put rows on a bounded asyncio queue (put_nowait - a full
+queue drops the row and counts it) and return. One background writer
+drains the queue in batches of up to EVENT_BATCH_SIZE rows, waiting at
+most EVENT_FLUSH_MS for a batch to fill, and writes each batch in one
+transaction: a bulk INSERT for events and an upsert by session_id for
+sessions. Each session upsert has its own SAVEPOINT (as do the events,
+retried row by row if the bulk insert fails), so one bad row is dropped
+on its own instead of taking the batch with it. Whatever is still queued
+is written on shutdown.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+
+import db_writer
+import models
+
+EVENT_QUEUE_MAX = int(os.environ.get("EVENT_QUEUE_MAX", "10000"))
+EVENT_BATCH_SIZE = int(os.environ.get("EVENT_BATCH_SIZE", "500"))
+EVENT_FLUSH_MS = int(os.environ.get("EVENT_FLUSH_MS", "500"))
+EVENT_BATCH_MAX_ITEMS = int(os.environ.get("EVENT_BATCH_MAX_ITEMS", "100"))  # per /api/track-events request
+
+SESSION_FIELDS = ("ended_at", "duration_seconds", "is_active", "pages_viewed",
+                  "mcqs_generated", "quizzes_taken", "memes_generated")
+
+_queue: Optional[asyncio.Queue] = None
+_task: Optional[asyncio.Task] = None
+_stats = {"accepted": 0, "dropped": 0, "written": 0, "failed": 0, "batches": 0}
+
+
+def _put(kind: str, row: dict) -> bool:
+    if _queue is None:
+        _stats["dropped"] += 1
+        return False
+    try:
+        _queue.put_nowait((kind, row))
+    except asyncio.QueueFull:
+        _stats["dropped"] += 1
+        return False
+    _stats["accepted"] += 1
+    return True
+
+
+def enqueue_event(row: dict) -> bool:
+    """Queue a user_events row (column -> value); False when it was dropped"""
+    return _put("event", row)
+
+
+def enqueue_session(row: dict) -> bool:
+    """Queue a user_sessions upsert; only the fields present in row are updated on existing sessions"""
+    return _put("session", row)
+
+
+def _write_sessions(db, rows: List[dict]) -> int:
+    """Upsert sessions, each in its own savepoint; returns the number of rows that failed"""
+    # Later updates for the same session win, field by field; a missing user or client never erases a known one
+    merged = {}
+    for row in rows:
+        merged.setdefault(row["session_id"], {}).update(
+            {k: v for k, v in row.items() if v is not None or k in SESSION_FIELDS}
+        )
+    existing = {
+        s.session_id: s for s in db.query(models.UserSession).filter(
+            models.UserSession.session_id.in_(list(merged))
+        )
+    }
+    failed = 0
+    for session_id, row in merged.items():
+        try:
+            with db.begin_nested():
+                session = existing.get(session_id)
+                if session is None:
+                    row.setdefault("started_at", datetime.now(timezone.utc))
+                    db.add(models.UserSession(**row))
+                    continue
+                for field in SESSION_FIELDS:
+                    if field in row:
+                        setattr(session, field, row[field])
+                if session.user_id is None and row.get("user_id"):
+                    session.user_id = row["user_id"]
+        except Exception as e:
+            failed += sum(1 for r in rows if r["session_id"] == session_id)
+            print(f"Event ingest: session {session_id} dropped: {e}")
+    return failed
+
+
+def _write_events(db, rows: List[dict]) -> int:
+    """Bulk insert events; if that fails, row by row so only the bad rows are lost"""
+    try:
+        with db.begin_nested():
+            db.execute(insert(models.UserEvent), rows)
+        return 0
+    except Exception:
+        pass
+    failed = 0
+    for row in rows:
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.UserEvent), [row])
+        except Exception as e:
+            failed += 1
+            print(f"Event ingest: event dropped: {e}")
+    return failed
+
+
+def _write(db, events: List[dict], sessions: List[dict]) -> int:
+    failed = 0
+    if events:
+        failed += _write_events(db, events)
+    if sessions:
+        failed += _write_sessions(db, sessions)
+    return failed
+
+
+def write_batch(batch: List[Tuple[str, dict]]):
+    events = [row for kind, row in batch if kind == "event"]
+    sessions = [row for kind, row in batch if kind == "session"]
+    try:
+        failed = db_writer.write_sync(_write, events, sessions)
+        _stats["written"] += len(batch) - failed
+        _stats["failed"] += failed
+    except Exception as e:
+        _stats["failed"] += len(batch)
+        print(f"Event ingest error ({len(batch)} rows dropped): {e}")
+    _stats["batches"] += 1
+
+
+async def _fill(batch: List[Tuple[str, dict]]):
+    batch.append(await _queue.get())
+    deadline = time.monotonic() + EVENT_FLUSH_MS / 1000
+    while len(batch) < EVENT_BATCH_SIZE:
+        try:
+            batch.append(_queue.get_nowait())
+            continue
+        except asyncio.QueueEmpty:
+            pass
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        try:
+            batch.append(await asyncio.wait_for(_queue.get(), remaining))
+        except asyncio.TimeoutError:
+            return
+
+
+async def _run():
+    while True:
+        batch = []
+        try:
+            await _fill(batch)
+        except asyncio.CancelledError:
+            # Shutdown while a batch was filling: write what was already taken off the queue
+            if batch:
+                await run_in_threadpool(write_batch, batch)
+            raise
+        await run_in_threadpool(write_batch, batch)
+
+
+def start():
+    global _queue, _task
+    if _task is None:
+        _queue = asyncio.Queue(maxsize=EVENT_QUEUE_MAX)
+        _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop():
+    """Stop the writer and write everything still queued"""
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    await asyncio.gather(_task, return_exceptions=True)
+    _task = None
+    remaining = []
+    while not _queue.empty():
+        remaining.append(_queue.get_nowait())
+    for i in range(0, len(remaining), EVENT_BATCH_SIZE):
+        await run_in_threadpool(write_batch, remaining[i:i + EVENT_BATCH_SIZE])
+
+
+def stats() -> dict:
+    return {**_stats, "queued": _queue.qsize() if _queue else 0, "queue_max": EVENT_QUEUE_MAX}
@@ -0,0 +1,220 @@
+"""
+Content-addressed cache for /api/generate-mcqs results.
+
+Two tiers:
+  1. In-process LRU (fast, per worker)
+  2. generation_cache table in the main database (shared by all workers)
+
+Entries are keyed by a hash of the normalized source text and every
+parameter that changes the output, expire after a TTL and are evicted
+least-recently-hit first once the table grows past its size limit.
+
+Hits (from either tier) are counted in memory and written to the table
+in one batch by flush_hits() - periodically and before every eviction,
+so eviction order follows LRU hits too.
+
+Reads run on the db_executor pool (get_async); every write - stored
+entries, hit counts, evictions - goes through db_writer.
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+import db_executor
+import db_writer
+import models
+
+CACHE_TTL_SECONDS = int(os.environ.get("GENERATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CACHE_LRU_SIZE = int(os.environ.get("GENERATION_CACHE_LRU_SIZE", "256"))
+CACHE_MAX_ROWS = int(os.environ.get("GENERATION_CACHE_MAX_ROWS", "5000"))
+CACHE_EVICT_EVERY = int(os.environ.get("GENERATION_CACHE_EVICT_EVERY", "50"))
+CACHE_HIT_FLUSH_SECONDS = int(os.environ.get("GENERATION_CACHE_HIT_FLUSH_SECONDS", "60"))
+
+CACHE_MODES = ("bypass", "prefer", "only")
+
+_lru: "OrderedDict[str, Tuple[datetime, list, str]]" = OrderedDict()
+_lock = threading.Lock()
+_puts_since_evict = 0
+# cache_key -> [hits not yet written, latest hit time]
+_pending_hits: Dict[str, list] = {}
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so re-pasted copies of the same doc hash identically"""
+    return " ".join((text or "").split())
+
+
+def make_key(text: str, num_questions: int, difficulty: str, content_type: str,
+             include_explanation: bool, model: Optional[str]) -> str:
+    payload = json.dumps([
+        normalize_text(text),
+        num_questions,
+        (difficulty or "").lower(),
+        (content_type or "").lower(),
+        bool(include_explanation),
+        model or ""
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _lru_get(key: str):
+    with _lock:
+        entry = _lru.get(key)
+        if entry is None:
+            return None
+        expires_at, questions, model_name = entry
+        if expires_at <= datetime.utcnow():
+            del _lru[key]
+            return None
+        _lru.move_to_end(key)
+        return questions, model_name
+
+
+def _lru_put(key: str, questions: list, model_name: str, expires_at: datetime):
+    with _lock:
+        _lru[key] = (expires_at, questions, model_name)
+        _lru.move_to_end(key)
+        while len(_lru) > CACHE_LRU_SIZE:
+            _lru.popitem(last=False)
+
+
+def _note_hit(key: str, now: datetime):
+    with _lock:
+        pending = _pending_hits.setdefault(key, [0, now])
+        pending[0] += 1
+        pending[1] = now
+
+
+def get(db: Session, key: str) -> Optional[Tuple[List[dict], str]]:
+    """Look up a cached generation. Returns (questions, model_name) or None."""
+    hit = _lru_get(key)
+    if hit is not None:
+        _note_hit(key, datetime.utcnow())
+        questions, model_name = hit
+        return copy.deepcopy(questions), model_name
+
+    now = datetime.utcnow()
+    row = db.query(models.GenerationCacheEntry).filter(
+        models.GenerationCacheEntry.cache_key == key,
+        models.GenerationCacheEntry.expires_at > now
+    ).first()
+    if row is None:
+        return None
+
+    _note_hit(key, now)
+    _lru_put(key, row.questions_data, row.model_name, row.expires_at)
+    return copy.deepcopy(row.questions_data), row.model_name
+
+
+def _store(db: Session, key: str, questions: List[dict], model_name: str, now: datetime, expires_at: datetime):
+    row = db.query(models.GenerationCacheEntry).filter(
+        models.GenerationCacheEntry.cache_key == key
+    ).first()
+    if row is None:
+        row = models.GenerationCacheEntry(cache_key=key, hit_count=0)
+        db.add(row)
+    row.model_name = model_name
+    row.questions_data = questions
+    row.size_bytes = len(json.dumps(questions))
+    row.last_hit_at = now
+    row.expires_at = expires_at
+
+
+def _take_hits() -> Dict[str, list]:
+    global _pending_hits
+    with _lock:
+        pending, _pending_hits = _pending_hits, {}
+    return pending
+
+
+def _restore_hits(pending: Dict[str, list]):
+    """Keep hits whose write failed for the next flush"""
+    with _lock:
+        for key, (count, last_hit_at) in pending.items():
+            merged = _pending_hits.setdefault(key, [0, last_hit_at])
+            merged[0] += count
+            merged[1] = max(merged[1], last_hit_at)
+
+
+def _write_hits(db: Session, pending: Dict[str, list]):
+    Entry = models.GenerationCacheEntry
+    for key, (count, last_hit_at) in pending.items():
+        db.query(Entry).filter(Entry.cache_key == key).update({
+            Entry.hit_count: Entry.hit_count + count,
+            Entry.last_hit_at: last_hit_at
+        }, synchronize_session=False)
+
+
+def _evict(db: Session, pending: Dict[str, list]):
+    # Hits first, so eviction order follows them
+    _write_hits(db, pending)
+    Entry = models.GenerationCacheEntry
+    db.query(Entry).filter(Entry.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+
+    total = db.query(Entry).count()
+    overflow = total - CACHE_MAX_ROWS
+    if overflow > 0:
+        stale_ids = [r.id for r in db.query(Entry.id).order_by(
+            Entry.last_hit_at.asc(), Entry.id.asc()
+        ).limit(overflow).all()]
+        db.query(Entry).filter(Entry.id.in_(stale_ids)).delete(synchronize_session=False)
+
+
+def flush_hits() -> int:
+    """Write the hits counted since the last flush (hit_count, last_hit_at); returns keys written.
+    Sync, for worker threads (periodic job)."""
+    pending = _take_hits()
+    if not pending:
+        return 0
+    try:
+        db_writer.write_sync(_write_hits, pending)
+    except Exception:
+        _restore_hits(pending)
+        raise
+    return len(pending)
+
+
+async def put_async(key: str, questions: List[dict], model_name: str):
+    """Store a fresh generation in both tiers. Never raises - caching is best effort."""
+    global _puts_since_evict
+    if not questions:
+        return
+
+    clean = [{k: v for k, v in q.items() if k != "id"} for q in questions]
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=CACHE_TTL_SECONDS)
+    _lru_put(key, clean, model_name, expires_at)
+
+    try:
+        await db_writer.write(_store, key, clean, model_name, now, expires_at)
+    except Exception as e:
+        print(f"Generation cache write error: {e}")
+        return
+
+    _puts_since_evict += 1
+    if _puts_since_evict < CACHE_EVICT_EVERY:
+        return
+    _puts_since_evict = 0
+    pending = _take_hits()
+    try:
+        await db_writer.write(_evict, pending)
+    except Exception as e:
+        _restore_hits(pending)
+        print(f"Generation cache eviction error: {e}")
+
+
+async def get_async(key: str) -> Optional[Tuple[List[dict], str]]:
+    """get() on the db_executor pool"""
+    return await db_executor.run(get, key)
+
+
+def clear_memory():
+    with _lock:
+        _lru.clear()
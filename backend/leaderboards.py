@@ -0,0 +1,200 @@
+"""
+Global leaderboards (top scorers, meme creators, MCQ generators) for the
+analytics dashboard, served from a cache so requests never wait on the
+ranking queries.
+
+Two tiers, like generation_cache.py:
+  1. In-process snapshot per time_range (per worker)
+  2. leaderboard_snapshots table in the main database (shared by all workers)
+
+Reads are stale-while-revalidate: a request always gets the cached
+snapshot, and a stale one (older than LEADERBOARD_TTL_SECONDS or more
+than LEADERBOARD_REFRESH_WRITES writes behind) schedules a single
+background refresh. A periodic job keeps every window warm.
+
+Each snapshot also keeps every ranked user's position on each board, so
+a user's own rank is a lookup instead of a scan.
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import analytics_rollups
+import db_writer
+import models
+import periodic
+
+LEADERBOARD_TTL_SECONDS = int(os.environ.get("LEADERBOARD_TTL_SECONDS", "60"))
+LEADERBOARD_REFRESH_WRITES = int(os.environ.get("LEADERBOARD_REFRESH_WRITES", "50"))
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", "5"))
+
+# board -> (rollup metric, ranked by average total instead of count, output field)
+BOARDS = {
+    "leaderboard": (analytics_rollups.QUIZZES, True, "score"),
+    "memeboard": (analytics_rollups.MEMES, False, "memes"),
+    "mcqboard": (analytics_rollups.MCQS, False, "mcqs"),
+}
+
+_snapshots: Dict[str, dict] = {}
+_lock = threading.Lock()
+_writes = 0
+_refreshing = set()
+_tasks = set()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def note_write():
+    """Called on quiz/meme/MCQ writes; enough of them make the snapshots stale early"""
+    global _writes
+    with _lock:
+        _writes += 1
+
+
+def _value(by_average: bool, count: int, total: float) -> float:
+    return round(total / count, 1) if by_average else count
+
+
+def compute(db: Session, time_range: str) -> dict:
+    """Rank every user on every board from the daily rollups"""
+    since = analytics_rollups.window_start(time_range)
+    ranked = {}
+    for board, (metric, by_average, _) in BOARDS.items():
+        rows = analytics_rollups.user_metric_values(db, metric, since)
+        rows.sort(key=lambda row: (-_value(by_average, row[1], row[2]), row[0]))
+        ranked[board] = rows
+
+    top_ids = {row[0] for rows in ranked.values() for row in rows[:LEADERBOARD_SIZE]}
+    users = {u.id: u for u in db.query(models.User).filter(models.User.id.in_(top_ids))} if top_ids else {}
+
+    data = {"boards": {}, "ranks": {}}
+    for board, (metric, by_average, field) in BOARDS.items():
+        entries = []
+        for user_id, count, total in ranked[board][:LEADERBOARD_SIZE]:
+            user = users.get(user_id)
+            if not user:
+                continue
+            entry = {
+                "name": user.full_name or user.email.split('@')[0],
+                "avatar": user.profile_picture,
+                field: _value(by_average, count, total)
+            }
+            if by_average:
+                entry["quizzes"] = count
+            entries.append(entry)
+        data["boards"][board] = entries
+        # Competition ranks (ties share a rank); str keys so the snapshot round-trips through JSON
+        ranks, previous = {}, None
+        for position, (user_id, count, total) in enumerate(ranked[board], 1):
+            value = _value(by_average, count, total)
+            if value != previous:
+                rank, previous = position, value
+            ranks[str(user_id)] = rank
+        data["ranks"][board] = ranks
+    return data
+
+
+def _store(time_range: str, data: dict, computed_at: datetime, writes: int):
+    with _lock:
+        current = _snapshots.get(time_range)
+        if current and current["computed_at"] > computed_at:
+            return
+        _snapshots[time_range] = {"data": data, "computed_at": computed_at, "writes": writes}
+
+
+def refresh(db: Session, time_range: str, force: bool = False):
+    """Adopt the shared snapshot if another worker refreshed it recently, otherwise recompute it"""
+    writes = _writes
+    row = db.query(models.LeaderboardSnapshot).filter(
+        models.LeaderboardSnapshot.time_range == time_range
+    ).first()
+    if row and not force and (_now() - row.computed_at).total_seconds() < LEADERBOARD_TTL_SECONDS:
+        local = _snapshots.get(time_range)
+        if not local or row.computed_at > local["computed_at"]:
+            _store(time_range, row.data, row.computed_at, writes)
+            return
+
+    computed_at = _now()
+    data = compute(db, time_range)
+    _store(time_range, data, computed_at, writes)
+    try:
+        db_writer.write_sync(_save_snapshot, time_range, data, computed_at)
+    except IntegrityError:
+        pass  # Another worker created the row first; its snapshot is just as fresh
+
+
+def _save_snapshot(db: Session, time_range: str, data: dict, computed_at: datetime):
+    row = db.query(models.LeaderboardSnapshot).filter(
+        models.LeaderboardSnapshot.time_range == time_range
+    ).first()
+    if row is None:
+        row = models.LeaderboardSnapshot(time_range=time_range)
+        db.add(row)
+    row.data = data
+    row.computed_at = computed_at
+
+
+def refresh_all(db: Session):
+    """Periodic job"""
+    for time_range in analytics_rollups.TIME_RANGES:
+        refresh(db, time_range)
+
+
+def _is_stale(snapshot: dict) -> bool:
+    age = (_now() - snapshot["computed_at"]).total_seconds()
+    return age >= LEADERBOARD_TTL_SECONDS or _writes - snapshot["writes"] >= LEADERBOARD_REFRESH_WRITES
+
+
+async def _refresh_in_background(time_range: str):
+    try:
+        await run_in_threadpool(periodic.run_with_session, lambda db: refresh(db, time_range, force=True))
+    except Exception as e:
+        print(f"Leaderboard refresh failed ({time_range}): {e}")
+    finally:
+        _refreshing.discard(time_range)
+
+
+async def get(time_range: str) -> dict:
+    """Cached snapshot for the window; only a cold worker with no shared snapshot computes inline"""
+    snapshot = _snapshots.get(time_range)
+    if snapshot is None:
+        await run_in_threadpool(periodic.run_with_session, lambda db: refresh(db, time_range))
+        snapshot = _snapshots[time_range]
+    elif _is_stale(snapshot) and time_range not in _refreshing:
+        _refreshing.add(time_range)
+        task = asyncio.get_running_loop().create_task(_refresh_in_background(time_range))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    return {**snapshot["data"], "computed_at": snapshot["computed_at"]}
+
+
+def rank(snapshot: dict, board: str, user_id: int) -> Optional[int]:
+    """1-based competition rank of the user in the snapshot (None when not ranked in it)"""
+    return snapshot.get("ranks", {}).get(board, {}).get(str(user_id))
+
+
+def ranked_users(snapshot: dict, board: str) -> int:
+    return len(snapshot.get("ranks", {}).get(board, {}))
+
+
+def user_values(db: Session, user_id: int, time_range: str) -> Dict[str, Optional[float]]:
+    """The user's own board values - a lookup on the user's rollup rows"""
+    stats = analytics_rollups.totals(db, user_id, analytics_rollups.window_start(time_range))
+    values = {}
+    for board, (metric, by_average, _) in BOARDS.items():
+        count, total = stats.get(metric, (0, 0.0))
+        values[board] = _value(by_average, count, total) if count else None
+    return values
+
+
+def clear_memory():
+    with _lock:
+        _snapshots.clear()
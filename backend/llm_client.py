@@ -0,0 +1,387 @@
+"""
+Async LLM client shared by every endpoint that talks to Groq / OpenAI-style APIs.
+
+One keep-alive httpx.AsyncClient is reused for the whole process so calls
+share a connection pool instead of opening a new TLS connection per attempt.
+Model selection and rate-limit handling live in model_router, and any waiting
+uses asyncio.sleep so a slow or rate-limited provider never blocks the event loop.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+import model_router
+
+GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# Models to try in order - if one is rate limited we switch to the next
+GROQ_MODELS = [
+    "llama-3.3-70b-versatile",
+    "mixtral-8x7b-32768",
+    "gemma2-9b-it",
+    "llama-3.1-8b-instant"
+]
+
+# Per-call timeout (seconds), and the longest we will wait for a cooling-down model
+LLM_TIMEOUT_SECONDS = float(os.environ.get("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_WAIT_SECONDS = float(os.environ.get("LLM_MAX_WAIT_SECONDS", "5"))
+
+# Connection pool sizing - enough to keep dozens of calls in flight per worker
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.environ.get("LLM_MAX_KEEPALIVE", "20"))
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop = None
+
+
+class LLMError(Exception):
+    """Raised when no model could serve a request"""
+    pass
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller starts the upstream
+    request as a task and every caller with the same key awaits that task.
+    The task is shielded, so a follower (or the leader) disconnecting does not
+    cancel the call for everyone else.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        loop = asyncio.get_running_loop()
+        task = self._calls.get(key)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            self.coalesced += 1
+        else:
+            task = loop.create_task(fn())
+            self._calls[key] = task
+            self.started += 1
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved so failures nobody awaited are not logged twice
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "started": self.started, "coalesced": self.coalesced}
+
+
+_singleflight = SingleFlight()
+
+
+def request_key(messages: List[dict], **params) -> str:
+    """Hash of the prompt plus every parameter that changes the completion"""
+    payload = json.dumps({"messages": messages, **params}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def singleflight_stats() -> dict:
+    return _singleflight.stats()
+
+
+def get_api_key() -> str:
+    return os.environ.get("GROQ_API_KEY", "")
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient, creating it for the running event loop if needed"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                keepalive_expiry=60.0
+            )
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    """Close the shared client (called on app shutdown)"""
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+async def chat_completion(
+    messages: List[dict],
+    model: str,
+    json_mode: bool = False,
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+    timeout: Optional[float] = None,
+    api_key: Optional[str] = None,
+    url: str = GROQ_CHAT_URL
+) -> dict:
+    """Single chat-completion request against one model. Raises httpx errors as-is."""
+    headers = {
+        "Authorization": f"Bearer {api_key or get_api_key()}",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "messages": messages,
+        "model": model,
+        "temperature": temperature
+    }
+    if max_tokens:
+        data["max_tokens"] = max_tokens
+    if json_mode:
+        data["response_format"] = {"type": "json_object"}
+
+    response = await get_client().post(
+        url,
+        headers=headers,
+        json=data,
+        timeout=timeout or LLM_TIMEOUT_SECONDS
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def _next_model(candidates: List[str], tried: set, waited: bool):
+    """Ask the router for the best untried model; wait once for a short cool-down if none is available"""
+    model = model_router.router.acquire(candidates, exclude=tried)
+    if model is not None or waited:
+        return model, waited
+    wait = model_router.router.seconds_until_available(candidates)
+    if wait is None or wait > LLM_MAX_WAIT_SECONDS:
+        return None, waited
+    print(f"All models cooling down. Waiting {wait:.1f}s for the next circuit to half-open...")
+    await asyncio.sleep(wait)
+    tried.clear()
+    return model_router.router.acquire(candidates), True
+
+
+def _record_failure(model: str, error: Exception) -> bool:
+    """
+    Report a failed call to the router. Returns False when the request itself
+    was rejected (4xx other than 429): another model would reject it too.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        if not model_router.is_model_fault(status_code):
+            model_router.router.release(model)
+            return False
+        model_router.router.record_failure(
+            model,
+            status_code=status_code,
+            retry_after=model_router.parse_retry_after(error.response.headers.get("retry-after"))
+        )
+    elif isinstance(error, httpx.TimeoutException):
+        model_router.router.record_failure(model, error="timeout")
+    elif isinstance(error, httpx.TransportError):
+        model_router.router.record_failure(model, error=str(error)[:200])
+    else:
+        # Not a provider failure (e.g. an unreadable body): try the next model, keep this one's record
+        model_router.router.release(model)
+    return True
+
+
+async def call_groq_with_fallback(
+    messages: List[dict],
+    json_mode: bool = False,
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+    timeout: Optional[float] = None,
+    models: Optional[List[str]] = None
+):
+    """
+    Calls Groq API with model fallback, sharing one upstream call between
+    concurrent identical requests (same messages and parameters).
+    Returns (response_json, model_name).
+    """
+    key = request_key(
+        messages,
+        json_mode=json_mode,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        models=models
+    )
+    result, model = await _singleflight.do(key, lambda: _call_groq_with_fallback(
+        messages,
+        json_mode=json_mode,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        timeout=timeout,
+        models=models
+    ))
+    # Callers get their own copy of the shared response
+    return copy.deepcopy(result), model
+
+
+async def _call_groq_with_fallback(
+    messages: List[dict],
+    json_mode: bool = False,
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+    timeout: Optional[float] = None,
+    models: Optional[List[str]] = None
+):
+    """
+    Calls Groq API on the healthiest available model.
+    A 429 or repeated failure opens that model's circuit and the call moves
+    straight on to the next best model instead of sleeping. Other 4xx
+    responses fail the call at once.
+    Returns (response_json, model_name).
+    """
+    candidates = models or GROQ_MODELS
+    tried, waited = set(), False
+    last_error = None
+
+    while True:
+        model, waited = await _next_model(candidates, tried, waited)
+        if model is None:
+            break
+        tried.add(model)
+        start = time.monotonic()
+        try:
+            result = await chat_completion(
+                messages,
+                model,
+                json_mode=json_mode,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout
+            )
+        except asyncio.CancelledError:
+            model_router.router.release(model)
+            raise
+        except Exception as e:
+            print(f"Error on {model}: {str(e)}")
+            if not _record_failure(model, e):
+                raise LLMError(f"Request rejected by {model}: {str(e)}")
+            last_error = e
+            continue
+        model_router.router.record_success(model, time.monotonic() - start)
+        return result, model
+
+    # If all models fail
+    raise LLMError(f"All AI models failed or are cooling down. Last error: {str(last_error)}")
+
+
+async def stream_chat_completion(
+    messages: List[dict],
+    model: str,
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+    timeout: Optional[float] = None,
+    api_key: Optional[str] = None,
+    url: str = GROQ_CHAT_URL
+) -> AsyncIterator[str]:
+    """Stream a chat completion, yielding content deltas as they arrive (OpenAI SSE format)"""
+    headers = {
+        "Authorization": f"Bearer {api_key or get_api_key()}",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "messages": messages,
+        "model": model,
+        "temperature": temperature,
+        "stream": True
+    }
+    if max_tokens:
+        data["max_tokens"] = max_tokens
+
+    async with get_client().stream(
+        "POST",
+        url,
+        headers=headers,
+        json=data,
+        timeout=timeout or LLM_TIMEOUT_SECONDS
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+            chunk = json.loads(payload)
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            delta = (choices[0].get("delta") or {}).get("content")
+            if delta:
+                yield delta
+
+
+async def stream_groq_with_fallback(
+    messages: List[dict],
+    temperature: float = 0.7,
+    max_tokens: Optional[int] = None,
+    timeout: Optional[float] = None,
+    models: Optional[List[str]] = None
+) -> AsyncIterator[Tuple[str, str]]:
+    """
+    Streaming variant of call_groq_with_fallback. Yields (model, delta).
+    A model is only swapped out if it fails before producing its first token;
+    once output has been streamed to the caller an error is raised instead.
+    """
+    candidates = models or GROQ_MODELS
+    tried, waited = set(), False
+    last_error = None
+
+    while True:
+        model, waited = await _next_model(candidates, tried, waited)
+        if model is None:
+            break
+        tried.add(model)
+        start = time.monotonic()
+        started = False
+        try:
+            async for delta in stream_chat_completion(
+                messages,
+                model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout
+            ):
+                started = True
+                yield model, delta
+        except (asyncio.CancelledError, GeneratorExit):
+            model_router.router.release(model)
+            raise
+        except Exception as e:
+            if not _record_failure(model, e):
+                raise LLMError(f"Request rejected by {model}: {str(e)}")
+            if started:
+                raise LLMError(f"Stream from {model} broke mid-response: {str(e)}")
+            last_error = e
+            print(f"Stream error on {model}: {str(e)}. Switching to next model...")
+            continue
+        model_router.router.record_success(model, time.monotonic() - start)
+        return
+
+    raise LLMError(f"All AI models failed or are cooling down. Last error: {str(last_error)}")
+
+
+async def post_json(url: str, payload: dict, headers: Optional[dict] = None, timeout: Optional[float] = None):
+    """POST through the shared pool (used for non-Groq providers such as HF Inference)"""
+    response = await get_client().post(
+        url,
+        headers=headers,
+        json=payload,
+        timeout=timeout or LLM_TIMEOUT_SECONDS
+    )
+    response.raise_for_status()
+    return response.json()
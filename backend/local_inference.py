@@ -0,0 +1,320 @@
+"""
+Local model inference server (provider="local").
+
+One process owns the transformers model, loads and warms it up at start,
+and serves every API worker over a local socket. Concurrent prompts are
+queued and grouped into a single batched `generate` call, so memory and
+throughput stay the same no matter how many uvicorn workers are running.
+
+Run the server:
+    python backend/local_inference.py --model Qwen/Qwen2.5-Coder-1.5B-Instruct
+
+and point the API at it:
+    LOCAL_INFERENCE_ADDRESS=/tmp/mcq-local-inference.sock   (unix socket)
+    LOCAL_INFERENCE_ADDRESS=127.0.0.1:8765                  (TCP, e.g. Windows)
+
+Protocol: one JSON object per line in each direction.
+    -> {"prompt": "...", "max_new_tokens": 2048, "temperature": 0.7}
+    <- {"text": "...", "model": "..."}   or   {"error": "..."}
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+LOCAL_INFERENCE_ADDRESS = os.environ.get("LOCAL_INFERENCE_ADDRESS", "")
+LOCAL_INFERENCE_MODEL = os.environ.get("LOCAL_INFERENCE_MODEL", "Qwen/Qwen2.5-Coder-1.5B-Instruct")
+LOCAL_INFERENCE_MAX_BATCH = int(os.environ.get("LOCAL_INFERENCE_MAX_BATCH", "8"))
+LOCAL_INFERENCE_BATCH_WAIT_MS = int(os.environ.get("LOCAL_INFERENCE_BATCH_WAIT_MS", "20"))
+LOCAL_INFERENCE_MAX_QUEUE = int(os.environ.get("LOCAL_INFERENCE_MAX_QUEUE", "64"))
+LOCAL_INFERENCE_THREADS = int(os.environ.get("LOCAL_INFERENCE_THREADS", "0"))  # 0 = torch default
+LOCAL_INFERENCE_TIMEOUT = float(os.environ.get("LOCAL_INFERENCE_TIMEOUT", "600"))
+
+SYSTEM_PROMPT = "You are a helpful assistant that outputs JSON."
+STREAM_LIMIT = 16 * 1024 * 1024  # prompts can carry a whole chunk of source text
+
+
+class LocalInferenceError(Exception):
+    pass
+
+
+def is_configured() -> bool:
+    return bool(LOCAL_INFERENCE_ADDRESS)
+
+
+def _parse_address(address: str) -> Tuple[Optional[str], Optional[str], Optional[int]]:
+    """-> (unix_path, host, port)"""
+    if address.startswith("unix:"):
+        return address[len("unix:"):], None, None
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and not address.startswith("/"):
+        return None, host or "127.0.0.1", int(port)
+    return address, None, None
+
+
+# ==== CLIENT (used by the API workers) ====
+
+async def _open_connection(address: str):
+    path, host, port = _parse_address(address)
+    if path:
+        return await asyncio.open_unix_connection(path, limit=STREAM_LIMIT)
+    return await asyncio.open_connection(host, port, limit=STREAM_LIMIT)
+
+
+async def generate(prompt: str, max_new_tokens: int = 2048, temperature: float = 0.7,
+                   address: Optional[str] = None) -> Tuple[str, str]:
+    """Send one prompt to the inference server -> (text, model_name)"""
+    address = address or LOCAL_INFERENCE_ADDRESS
+    try:
+        reader, writer = await asyncio.wait_for(_open_connection(address), 5)
+    except (OSError, asyncio.TimeoutError) as e:
+        raise LocalInferenceError(f"Local inference server unavailable at {address}: {e}")
+
+    try:
+        request = {"prompt": prompt, "max_new_tokens": max_new_tokens, "temperature": temperature}
+        writer.write(json.dumps(request).encode("utf-8") + b"\n")
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), LOCAL_INFERENCE_TIMEOUT)
+        if not line:
+            raise LocalInferenceError("Local inference server closed the connection")
+        response = json.loads(line)
+        if "error" in response:
+            raise LocalInferenceError(response["error"])
+        return response["text"], response.get("model", "local")
+    except asyncio.TimeoutError:
+        raise LocalInferenceError(f"Local inference timed out after {LOCAL_INFERENCE_TIMEOUT:.0f}s")
+    except OSError as e:
+        raise LocalInferenceError(f"Local inference connection failed: {e}")
+    except (ValueError, KeyError, TypeError) as e:
+        raise LocalInferenceError(f"Malformed response from local inference server: {e}")
+    finally:
+        writer.close()
+
+
+# ==== SERVER ====
+
+class PendingPrompt:
+    def __init__(self, prompt: str, max_new_tokens: int, temperature: float):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        # <= 0 means greedy decoding; one value so all greedy prompts can share a batch
+        self.temperature = max(temperature, 0.0)
+        self.future = asyncio.get_running_loop().create_future()
+
+    def batch_key(self) -> Tuple[int, float]:
+        # Only prompts with the same sampling settings can share a generate call
+        return self.max_new_tokens, self.temperature
+
+
+class InferenceServer:
+    def __init__(self, model_name: str, max_batch: int = None, batch_wait_ms: int = None,
+                 max_queue: int = None):
+        self.model_name = model_name
+        self.max_batch = max_batch or LOCAL_INFERENCE_MAX_BATCH
+        self.batch_wait = (batch_wait_ms if batch_wait_ms is not None else LOCAL_INFERENCE_BATCH_WAIT_MS) / 1000.0
+        self.max_queue = max_queue or LOCAL_INFERENCE_MAX_QUEUE
+        self._queue: Optional[asyncio.Queue] = None
+        self.backlog: deque = deque()
+        # A single thread runs generate, so there is never more than one batch in memory
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-inference")
+        self.model = None
+        self.tokenizer = None
+
+    # --- model ---
+
+    def load(self):
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        import torch
+
+        if LOCAL_INFERENCE_THREADS > 0:
+            torch.set_num_threads(LOCAL_INFERENCE_THREADS)
+
+        print(f"Loading local model: {self.model_name}...")
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        # Batched prompts are left padded so every sequence ends where generation starts
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(
+            self.model_name,
+            torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+            device_map="auto",
+            trust_remote_code=True
+        )
+        self.model.eval()
+
+        start = time.time()
+        self.generate_batch(["Say OK."], max_new_tokens=4, temperature=0.7)
+        print(f"Model loaded and warmed up ({time.time() - start:.1f}s warm-up call).")
+
+    def generate_batch(self, prompts: List[str], max_new_tokens: int, temperature: float) -> List[str]:
+        import torch
+
+        texts = [
+            self.tokenizer.apply_chat_template(
+                [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+                tokenize=False,
+                add_generation_prompt=True
+            )
+            for prompt in prompts
+        ]
+        model_inputs = self.tokenizer(texts, return_tensors="pt", padding=True).to(self.model.device)
+        if temperature > 0:
+            sampling = {"do_sample": True, "temperature": temperature}
+        else:
+            sampling = {"do_sample": False}  # greedy: sampling with temperature 0 is invalid
+        with torch.inference_mode():
+            generated_ids = self.model.generate(
+                **model_inputs,
+                max_new_tokens=max_new_tokens,
+                pad_token_id=self.tokenizer.pad_token_id,
+                **sampling
+            )
+        prompt_length = model_inputs.input_ids.shape[1]
+        return self.tokenizer.batch_decode(generated_ids[:, prompt_length:], skip_special_tokens=True)
+
+    # --- batching ---
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        # Created on first use, on the running loop: on Python < 3.10 a queue
+        # made before asyncio.run() is bound to another loop and get() fails
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        return self._queue
+
+    def enqueue(self, prompt: str, max_new_tokens: int, temperature: float) -> PendingPrompt:
+        pending = PendingPrompt(prompt, max_new_tokens, temperature)
+        try:
+            self.queue.put_nowait(pending)
+        except asyncio.QueueFull:
+            raise LocalInferenceError("Local inference server is busy, try again shortly")
+        return pending
+
+    async def submit(self, prompt: str, max_new_tokens: int, temperature: float) -> str:
+        return await self.enqueue(prompt, max_new_tokens, temperature).future
+
+    async def _collect_batch(self) -> List[PendingPrompt]:
+        first = self.backlog.popleft() if self.backlog else await self.queue.get()
+        key = first.batch_key()
+        batch, skipped = [first], deque()
+        for item in self.backlog:
+            (batch if item.batch_key() == key and len(batch) < self.max_batch else skipped).append(item)
+        self.backlog = skipped
+
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            # Different sampling settings wait for a later batch, in arrival order
+            (batch if item.batch_key() == key else self.backlog).append(item)
+        return batch
+
+    async def batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [p for p in await self._collect_batch() if not p.future.cancelled()]
+            if not batch:
+                continue
+            max_new_tokens, temperature = batch[0].batch_key()
+            start = time.time()
+            try:
+                outputs = await loop.run_in_executor(
+                    self.executor, self.generate_batch, [p.prompt for p in batch], max_new_tokens, temperature
+                )
+            except Exception as e:
+                print(f"Local inference batch of {len(batch)} failed: {e}")
+                for p in batch:
+                    if not p.future.done():
+                        p.future.set_exception(LocalInferenceError(str(e)))
+                continue
+            print(f"Local inference: batch of {len(batch)} in {time.time() - start:.1f}s")
+            for p, text in zip(batch, outputs):
+                if not p.future.done():
+                    p.future.set_result(text)
+
+    # --- socket ---
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        pending = None
+        closed = None
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+                pending = self.enqueue(
+                    request["prompt"],
+                    int(request.get("max_new_tokens", 2048)),
+                    float(request.get("temperature", 0.7))
+                )
+                # The client sends nothing more, so a read returning means it hung up
+                closed = asyncio.ensure_future(reader.read(1))
+                await asyncio.wait({pending.future, closed}, return_when=asyncio.FIRST_COMPLETED)
+                if not pending.future.done():
+                    return  # disconnected: finally cancels the prompt before it reaches a batch
+                response = {"text": pending.future.result(), "model": self.model_name}
+            except (LocalInferenceError, KeyError, ValueError) as e:
+                response = {"error": str(e)}
+            writer.write(json.dumps(response).encode("utf-8") + b"\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if pending is not None:
+                pending.future.cancel()
+            if closed is not None:
+                closed.cancel()
+            writer.close()
+
+    async def serve(self, address: str):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.load)
+
+        path, host, port = _parse_address(address)
+        if path:
+            if os.path.exists(path):
+                os.remove(path)
+            server = await asyncio.start_unix_server(self.handle_connection, path, limit=STREAM_LIMIT)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=STREAM_LIMIT)
+        print(f"Local inference server for {self.model_name} listening on {address} "
+              f"(max batch {self.max_batch}, wait {self.batch_wait * 1000:.0f}ms)")
+
+        batcher = asyncio.create_task(self.batch_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local model inference server")
+    parser.add_argument("--model", default=LOCAL_INFERENCE_MODEL)
+    parser.add_argument("--address", default=LOCAL_INFERENCE_ADDRESS or "/tmp/mcq-local-inference.sock")
+    parser.add_argument("--max-batch", type=int, default=LOCAL_INFERENCE_MAX_BATCH)
+    parser.add_argument("--batch-wait-ms", type=int, default=LOCAL_INFERENCE_BATCH_WAIT_MS)
+    args = parser.parse_args()
+
+    server = InferenceServer(args.model, max_batch=args.max_batch, batch_wait_ms=args.batch_wait_ms)
+    try:
+        asyncio.run(server.serve(args.address))
+    except KeyboardInterrupt:
+        print("Local inference server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,24 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Depends, status
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Depends, status
 
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import bindparam, case, func, desc, insert, inspect, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 import os
+import asyncio
 import requests
-from bs4 import BeautifulSoup
-from pypdf import PdfReader
 import io
 import docx
 import json
@@ -52,6 +54,25 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import models, schemas, database
 from auth import core as auth
 import category_endpoints
+import llm_client
+import model_router
+import generation_cache
+import mcq_stream
+import mcq_chunking
+import batch_jobs
+import pdf_extract
+import url_fetcher
+import local_inference
+import social_feed
+import periodic
+import analytics_rollups
+import leaderboards
+import trending
+import view_counters
+import event_ingest
+import persistence
+import db_executor
+import db_writer
 
 # Load environment variables from parent directory
 env_path = os.path.join(os.path.dirname(__file__), "..", ".env")
@@ -143,18 +164,87 @@ def populate_superusers(db: Session):
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/api/metrics/llm")
+async def llm_metrics():
+    """Circuit state, success rate and latency of each LLM model, plus request coalescing counters"""
+    return {
+        "models": model_router.router.snapshot(llm_client.GROQ_MODELS),
+        "singleflight": llm_client.singleflight_stats()
+    }
+
+def add_missing_columns():
+    """ALTER TABLE ... ADD COLUMN for model columns that are nullable or have a server default"""
+    inspector = inspect(database.engine)
+    dialect = database.engine.dialect
+    for table in models.Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not (column.nullable or column.server_default is not None):
+                continue
+            # CreateColumn renders name, type, DEFAULT (quoted literals, text() and
+            # functions alike) and NOT NULL the way CREATE TABLE would
+            ddl = (f"ALTER TABLE {dialect.identifier_preparer.format_table(table)} "
+                   f"ADD COLUMN {CreateColumn(column).compile(dialect=dialect)}")
+            try:
+                with database.engine.begin() as conn:
+                    conn.exec_driver_sql(ddl)  # raw DDL: a ':' in a default is not a bind parameter
+                print(f"Added column {table.name}.{column.name}")
+            except Exception as e:
+                # e.g. SQLite refuses non-constant defaults such as CURRENT_TIMESTAMP here
+                print(f"Could not add column {table.name}.{column.name}: {e}")
+
+@app.get("/api/metrics/events")
+async def event_metrics():
+    """Event ingestion queue depth and accepted/dropped/written counters"""
+    return event_ingest.stats()
+
+@app.get("/api/metrics/db")
+async def db_metrics():
+    """DB thread pool (db_executor.py) and write path (db_writer.py) queue depths, wait times and outcomes"""
+    return {**db_executor.stats(), "writer": db_writer.stats()}
+
 @app.on_event("startup")
 async def startup_event():
     # Create tables
     models.Base.metadata.create_all(bind=database.engine)
+    # create_all skips existing tables - add columns and indexes introduced since they were created
+    add_missing_columns()
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=database.engine, checkfirst=True)
     
     # Populate superusers
     db = database.SessionLocal()
     try:
         populate_superusers(db)
+        # First start with the feed table: publish existing content
+        if social_feed.is_empty(db):
+            social_feed.backfill(db)
+        # Same for the dashboard rollups
+        if analytics_rollups.is_empty(db):
+            analytics_rollups.rebuild(db)
     finally:
         db.close()
 
+    # Repair drift in the denormalized feed counters
+    periodic.start("feed-reconcile", social_feed.RECONCILE_INTERVAL_SECONDS, social_feed.reconcile_counts)
+    # Rebuild the latest days of the dashboard rollups from the source tables
+    periodic.start("rollup-compact", analytics_rollups.ROLLUP_COMPACT_INTERVAL_SECONDS, analytics_rollups.compact)
+    # Keep the cached global leaderboards warm
+    periodic.start("leaderboard-refresh", leaderboards.LEADERBOARD_TTL_SECONDS, leaderboards.refresh_all, initial_delay=0)
+    # Write generation cache hits (hit_count / last_hit_at) used for eviction order
+    periodic.start("generation-cache-hits", generation_cache.CACHE_HIT_FLUSH_SECONDS, lambda db: generation_cache.flush_hits())
+    # Recompute the time-decayed trending scores
+    periodic.start("trending-refresh", trending.TRENDING_REFRESH_INTERVAL_SECONDS, trending.refresh_scores, initial_delay=0)
+    # Optional SQLite single-writer mode (SQLITE_SINGLE_WRITER) - before anything that writes through it
+    db_writer.start()
+    # Batched view/share counter writes
+    view_counters.start()
+    # Background writer for tracked events and sessions
+    event_ingest.start()
+
     print("--> STARTUP: Listing all registered routes:")
     for route in app.routes:
         if hasattr(route, "methods"):
@@ -162,6 +252,20 @@ async def startup_event():
         else:
             print(f"   Route: {route.path} (Mount)")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await periodic.stop_all()
+    await view_counters.stop()
+    await event_ingest.stop()
+    await db_writer.stop()
+    # Close pooled LLM/URL connections and the PDF worker processes
+    await llm_client.close_client()
+    await url_fetcher.close_client()
+    pdf_extract.shutdown()
+    db_executor.shutdown()
+    if database.async_engine is not None:
+        await database.async_engine.dispose()
+
 # --- OAUTH ROUTES (from separate file) ---
 try:
     from auth.oauth_routes import router as oauth_router
@@ -198,14 +302,15 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     
     return {"access_token": access_token, "token_type": "bearer"}
 
-# Helper to get current user from token
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def token_email(token: str) -> str:
+    """Email (sub) of a valid access token"""
     from jose import JWTError, jwt
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
     try:
         payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
         email: str = payload.get("sub")
@@ -213,13 +318,24 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = auth.get_user_by_email(db, email=email)
+    return email
+
+# Helper to get current user from token
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = auth.get_user_by_email(db, email=token_email(token))
+    if user is None:
+        raise credentials_exception
+    return user
+
+# Same, for endpoints on database.get_async_db (shares the endpoint's session)
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db=Depends(database.get_async_db)):
+    user = await database.run_sync(db, auth.get_user_by_email, token_email(token))
     if user is None:
         raise credentials_exception
     return user
 
 @app.get("/api/profile")
-def get_user_profile(current_user: models.User = Depends(get_current_user)):
+async def get_user_profile(current_user: models.User = Depends(get_current_user_async)):
     return {
         "id": current_user.id,
         "email": current_user.email,
@@ -296,66 +412,6 @@ def log_activity(db: Session, user_id: int, action: str, details: dict = None):
 
 # --- END AUTHENTICATION ---
 
-# --- HELPER FUNCTIONS ---
-def call_groq_with_fallback(messages, json_mode=False):
-    """
-    Calls Groq API with retries and model fallback.
-    If one model is rate limited, it switches to the next.
-    """
-    # List of models to try in order
-    models = [
-        "llama-3.3-70b-versatile",
-        "mixtral-8x7b-32768", 
-        "gemma2-9b-it",
-        "llama-3.1-8b-instant"
-    ]
-    
-    last_error = None
-
-    for model in models:
-        # Try each model with retries
-        for attempt in range(3):
-            try:
-                headers = {
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json"
-                }
-                data = {
-                    "messages": messages,
-                    "model": model,
-                    "temperature": 0.7
-                }
-                if json_mode:
-                    data["response_format"] = {"type": "json_object"}
-
-                response = requests.post("https://api.groq.com/openai/v1/chat/completions", headers=headers, json=data)
-                response.raise_for_status()
-                return response.json(), model
-                
-            except requests.exceptions.HTTPError as e:
-                last_error = e
-                if e.response.status_code == 429:
-                    # Rate limit hit
-                    delay = (2 ** attempt) + random.uniform(0, 1)
-                    print(f"Rate limit on {model} (Attempt {attempt+1}). Retrying in {delay:.2f}s...")
-                    time.sleep(delay)
-                    continue # Retry same model
-                else:
-                    # Other error, try next model immediately
-                    print(f"Error on {model}: {str(e)}")
-                    break 
-            except Exception as e:
-                last_error = e
-                print(f"Unexpected error on {model}: {str(e)}")
-                break
-        
-        # If we are here, the model failed 3 times or had non-429 error
-        print(f"Switching from {model} to next model...")
-
-    # If all models fail
-    raise Exception(f"All AI models failed. Last error: {str(last_error)}")
-
-
 # --- CONFIGURATION ---
 # Get a free API key from: https://console.groq.com/keys
 # Groq offers FREE, FAST inference with models like Llama and Mixtral
@@ -380,6 +436,20 @@ class GenerateRequest(BaseModel):
     content_type: str = "coding"
     include_explanation: bool = True
     llm_config: Optional[LLMConfig] = None
+    cache: str = "prefer"  # bypass, prefer, only
+
+class BatchSource(BaseModel):
+    text: Optional[str] = None
+    url: Optional[str] = None
+    title: Optional[str] = None
+
+class BatchGenerateRequest(BaseModel):
+    items: List[BatchSource]
+    num_questions: int = 10
+    difficulty: str = "auto"
+    content_type: str = "coding"
+    include_explanation: bool = True
+    cache: str = "prefer"  # bypass, prefer, only
 
 class URLRequest(BaseModel):
     url: str
@@ -391,26 +461,21 @@ class BookmarkRequest(BaseModel):
     content_data: Optional[dict] = None
 
 # Utilities
-def extract_text_from_pdf(file_content: bytes) -> str:
+async def extract_text_from_pdf(file_content: bytes, pages: Optional[str] = None, max_pages: Optional[int] = None) -> str:
     try:
-        reader = PdfReader(io.BytesIO(file_content))
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-    except Exception as e:
+        return await pdf_extract.extract_text(file_content, pages, max_pages)
+    except pdf_extract.PDFExtractError as e:
         raise HTTPException(status_code=400, detail=f"Error reading PDF: {str(e)}")
 
-def extract_text_from_url(url: str) -> str:
+async def extract_text_from_url(url: str) -> str:
+    text, _ = await fetch_url_text(url)
+    return text
+
+async def fetch_url_text(url: str):
+    """(text, cache_status) - pooled async fetch, revalidated against the on-disk cache"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        # Basic text extraction - can be improved
-        paragraphs = soup.find_all('p')
-        text = "\n".join([p.get_text() for p in paragraphs])
-        return text
-    except Exception as e:
+        return await url_fetcher.fetch_text(url)
+    except url_fetcher.FetchError as e:
         raise HTTPException(status_code=400, detail=f"Error fetching URL: {str(e)}")
 
 # Mock MCQ Generator (Replace with AI Model later)
@@ -432,7 +497,7 @@ def generate_mock_mcqs(text: str, num: int, difficulty: str, c_type: str):
         })
     return questions
 
-def generate_with_huggingface(prompt: str, api_key: str, model: str):
+async def generate_with_huggingface(prompt: str, api_key: str, model: str):
     api_url = f"https://api-inference.huggingface.co/models/{model}"
     headers = {"Authorization": f"Bearer {api_key}"}
     
@@ -449,9 +514,7 @@ def generate_with_huggingface(prompt: str, api_key: str, model: str):
         }
     }
 
-    response = requests.post(api_url, headers=headers, json=payload)
-    response.raise_for_status()
-    result = response.json()
+    result = await llm_client.post_json(api_url, payload, headers=headers)
     
     # HF returns a list of dicts, usually [{'generated_text': '...'}]
     if isinstance(result, list) and len(result) > 0:
@@ -517,8 +580,8 @@ def generate_with_local(prompt: str, model_name: str):
     response = tokenizer.batch_decode(generated_ids, skip_special_tokens=True)[0]
     return response
 
-def generate_mcqs_with_llm(text: str, num: int, difficulty: str, c_type: str, config: LLMConfig):
-    prompt = f"""
+def build_mcq_prompt(text: str, num: int, difficulty: str, c_type: str) -> str:
+    return f"""
     You are an expert tutor specializing in {c_type}.
     Goal: Generate {num} {difficulty} difficulty multiple choice questions based on the text below.
     
@@ -533,27 +596,45 @@ def generate_mcqs_with_llm(text: str, num: int, difficulty: str, c_type: str, co
     5. For questions with formulas or calculations, show ALL intermediate steps clearly.
     
     Text Content:
-    {text[:3000]}
+    {text[:mcq_chunking.chunk_char_budget()]}
     """
 
+async def generate_mcqs_with_llm(text: str, num: int, difficulty: str, c_type: str, config: LLMConfig):
+    # Long documents: map-reduce over overlapping chunks instead of truncating
+    if mcq_chunking.needs_chunking(text):
+        return await mcq_chunking.generate_chunked(
+            text,
+            num,
+            lambda chunk, n: generate_mcqs_for_chunk(chunk, n, difficulty, c_type, config)
+        )
+    return await generate_mcqs_for_chunk(text, num, difficulty, c_type, config)
+
+async def generate_mcqs_for_chunk(text: str, num: int, difficulty: str, c_type: str, config: LLMConfig):
+    prompt = build_mcq_prompt(text, num, difficulty, c_type)
+
     try:
         content = ""
         used_model = "unknown"
         if config.provider == "huggingface":
-            content = generate_with_huggingface(prompt, config.api_key, config.model)
+            content = await generate_with_huggingface(prompt, config.api_key, config.model)
             used_model = config.model
         elif config.provider == "local":
-            # Use a default small model if none specified to avoid huge downloads
-            model_name = config.model or "Qwen/Qwen2.5-Coder-1.5B-Instruct"
-            content = generate_with_local(prompt, model_name)
-            used_model = model_name
+            if local_inference.is_configured():
+                # Shared, warmed-up inference server batches prompts from every worker
+                content, used_model = await local_inference.generate(prompt)
+            else:
+                # Use a default small model if none specified to avoid huge downloads
+                model_name = config.model or "Qwen/Qwen2.5-Coder-1.5B-Instruct"
+                # model.generate is CPU/GPU bound - keep it off the event loop
+                content = await run_in_threadpool(generate_with_local, prompt, model_name)
+                used_model = model_name
         else:
             # Use Groq/OpenAI with fallback
             messages = [
                 {"role": "system", "content": "You are a helpful AI assistant."},
                 {"role": "user", "content": prompt}
             ]
-            result, used_model = call_groq_with_fallback(messages, json_mode=True)
+            result, used_model = await llm_client.call_groq_with_fallback(messages, json_mode=True)
             content = result['choices'][0]['message']['content']
 
         # Clean up markdown if present
@@ -579,7 +660,7 @@ class MemePromptRequest(BaseModel):
     meme_type: str = "image"  # image, gif, video
 
 @app.post("/api/generate-meme-prompt")
-def generate_meme_prompt(request: MemePromptRequest):
+async def generate_meme_prompt(request: MemePromptRequest):
     """
     Generates creative prompts for memes (image/GIF/video) based on the topic using Groq.
     Returns a list of prompts and URLs.
@@ -645,7 +726,7 @@ Output ONLY JSON:
             ]
             
             try:
-                translation_result, _ = call_groq_with_fallback(translation_messages, json_mode=True)
+                translation_result, _ = await llm_client.call_groq_with_fallback(translation_messages, json_mode=True)
                 translation_content = translation_result['choices'][0]['message']['content'].strip()
                 
                 # Clean markdown
@@ -673,7 +754,7 @@ Output ONLY JSON:
         ]
         
         # Use the new helper function
-        result, used_model = call_groq_with_fallback(messages, json_mode=True)
+        result, used_model = await llm_client.call_groq_with_fallback(messages, json_mode=True)
         
         content = result['choices'][0]['message']['content'].strip()
         print(f"Raw Groq Response: {content}")
@@ -1140,7 +1221,7 @@ class MemeRequest(BaseModel):
 
 # ... (keep existing functions)
 
-def generate_meme_caption_with_ai(question: str, explanation: str) -> str:
+async def generate_meme_caption_with_ai(question: str, explanation: str) -> str:
     """Generate a funny meme caption using AI"""
     prompt = f"""Generate a SHORT, FUNNY meme caption for this coding question.
     
@@ -1157,25 +1238,16 @@ Examples:
 Your caption:"""
 
     try:
-        headers = {"Authorization": f"Bearer {GROQ_API_KEY}", "Content-Type": "application/json"}
-        payload = {
-            "model": "llama-3.3-70b-versatile",
-            "messages": [
-                {"role": "system", "content": "You are a witty programmer who creates funny meme captions."},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.9,
-            "max_tokens": 100
-        }
-        
-        response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            json=payload,
-            headers=headers,
+        messages = [
+            {"role": "system", "content": "You are a witty programmer who creates funny meme captions."},
+            {"role": "user", "content": prompt}
+        ]
+        result, _ = await llm_client.call_groq_with_fallback(
+            messages,
+            temperature=0.9,
+            max_tokens=100,
             timeout=10
         )
-        response.raise_for_status()
-        result = response.json()
         caption = result["choices"][0]["message"]["content"].strip()
         
         # Clean up the caption
@@ -1198,9 +1270,9 @@ def prefetch_image(url: str):
         print(f"Failed to prefetch image: {e}")
 
 @app.post("/api/generate-meme")
-def generate_meme(request: MemeRequest, background_tasks: BackgroundTasks):
+async def generate_meme(request: MemeRequest, background_tasks: BackgroundTasks):
     # 1. Generate Caption using AI
-    caption = generate_meme_caption_with_ai(request.question, request.explanation)
+    caption = await generate_meme_caption_with_ai(request.question, request.explanation)
     
     # 2. Use Pollinations.ai for free image generation (no API key needed)
     # This generates meme-style images based on text prompts
@@ -1231,19 +1303,48 @@ def generate_meme(request: MemeRequest, background_tasks: BackgroundTasks):
 
 # Endpoints
 @app.post("/api/extract-url")
-def extract_url(request: URLRequest):
-    text = extract_text_from_url(request.url)
-    return {"text": text}
+async def extract_url(request: URLRequest):
+    text, cache_status = await fetch_url_text(request.url)
+    return {"text": text, "cache": cache_status}
+
+async def extract_upload_text(filename: str, content: bytes, pages: Optional[str] = None, max_pages: Optional[int] = None) -> str:
+    if filename.endswith('.pdf'):
+        return await extract_text_from_pdf(content, pages, max_pages)
+    elif filename.endswith('.txt') or filename.endswith('.md'):
+        return content.decode('utf-8')
+    raise HTTPException(status_code=400, detail="Unsupported file type")
 
 @app.post("/api/extract-file")
-async def extract_file(file: UploadFile = File(...)):
+async def extract_file(
+    file: UploadFile = File(...),
+    pages: Optional[str] = None,
+    max_pages: Optional[int] = None,
+    stream: bool = False
+):
+    """
+    Extract text from an uploaded file. PDFs are parsed in a process pool.
+    pages="1-5,9" / max_pages limit what is extracted; stream=true returns
+    PDF pages as Server-Sent Events while later pages are still being parsed.
+    """
     content = await file.read()
-    if file.filename.endswith('.pdf'):
-        text = extract_text_from_pdf(content)
-    elif file.filename.endswith('.txt') or file.filename.endswith('.md'):
-        text = content.decode('utf-8')
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported file type")
+    if stream and file.filename.endswith('.pdf'):
+        async def page_stream():
+            count = 0
+            try:
+                async for page_number, page_text in pdf_extract.extract_pages(content, pages, max_pages):
+                    count += 1
+                    yield mcq_stream.sse_event("page", {"page": page_number, "text": page_text})
+                yield mcq_stream.sse_event("done", {"pages": count})
+            except pdf_extract.PDFExtractError as e:
+                yield mcq_stream.sse_event("error", {"detail": f"Error reading PDF: {str(e)}", "pages": count})
+
+        return StreamingResponse(
+            page_stream(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    text = await extract_upload_text(file.filename, content, pages, max_pages)
     return {"text": text}
 
 # ---------------------
@@ -1267,45 +1368,131 @@ def get_current_user_optional(
     except:
         return None
 
+# For endpoints whose DB work runs on db_executor / db_writer: the user comes from a short session
+# of its own, so the request does not hold a pool connection while it waits for a worker
+def get_current_user_detached(token: str = Depends(oauth2_scheme)):
+    db = database.SessionLocal()
+    try:
+        return get_current_user(token, db)  # loaded columns stay readable after close
+    finally:
+        db.close()
+
+def get_current_user_optional_detached(token: str = Depends(oauth2_scheme_optional)):
+    if not token:
+        return None
+    try:
+        return get_current_user_detached(token)
+    except HTTPException:
+        return None
+
+async def get_current_user_optional_async(
+    token: str = Depends(oauth2_scheme_optional),
+    db=Depends(database.get_async_db)
+):
+    """get_current_user_optional for endpoints on database.get_async_db"""
+    if not token:
+        return None
+    try:
+        return await get_current_user_async(token, db)
+    except HTTPException:
+        return None
+
 # ---------------------
 
 
+def mcq_question_values(generation_id: int, number: int, q: dict) -> dict:
+    """Column values for an MCQQuestion row built from an LLM question dict"""
+    # Get options - check both uppercase and lowercase keys
+    options = q.get('options', {})
+    option_a = options.get('A') or options.get('a', '')
+    option_b = options.get('B') or options.get('b', '')
+    option_c = options.get('C') or options.get('c', '')
+    option_d = options.get('D') or options.get('d', '')
+    
+    # Get correct answer - normalize to uppercase
+    correct_ans = q.get('correct_answer') or q.get('correct_option', '')
+    if isinstance(correct_ans, str):
+        correct_ans = correct_ans.upper()
+    
+    return dict(
+        generation_id=generation_id,
+        question_number=number,
+        question_text=q.get('question', ''),
+        option_a=option_a,
+        option_b=option_b,
+        option_c=option_c,
+        option_d=option_d,
+        correct_answer=correct_ans,
+        explanation=q.get('explanation', ''),
+        times_attempted=0,
+        times_correct=0,
+        times_wrong=0
+    )
+
+def mcq_question_from_dict(generation_id: int, number: int, q: dict) -> models.MCQQuestion:
+    """Build an MCQQuestion row from an LLM question dict"""
+    return models.MCQQuestion(**mcq_question_values(generation_id, number, q))
+
+def server_llm_config() -> LLMConfig:
+    """Server-side Groq credentials (client-supplied llm_config is ignored)"""
+    return LLMConfig(
+        provider="openai",
+        api_key=GROQ_API_KEY,
+        base_url="https://api.groq.com/openai/v1",
+        model="llama-3.3-70b-versatile"
+    )
+
 @app.post("/api/generate-mcqs")
 async def generate_mcqs(
     request: GenerateRequest, 
     req: Request,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_optional)
+    current_user: models.User = Depends(get_current_user_optional_detached)
 ):
     """Generate MCQs and save in normalized format"""
     import time
     start_time = time.time()
     
     # Override client config to use server-side credentials
-    config = LLMConfig(
-        provider="openai",
-        api_key=GROQ_API_KEY,
-        base_url="https://api.groq.com/openai/v1",
-        model="llama-3.3-70b-versatile"
-    )
+    config = server_llm_config()
     
     if config.api_key == "gsk_xxxxxxxxxxxxxxxxxxxxxxxxxxxxxx":
         raise HTTPException(status_code=500, detail="Server Configuration Error: Please set the GROQ_API_KEY")
 
+    if request.cache not in generation_cache.CACHE_MODES:
+        raise HTTPException(status_code=400, detail=f"cache must be one of {', '.join(generation_cache.CACHE_MODES)}")
+
+    cache_key = generation_cache.make_key(
+        request.text,
+        request.num_questions,
+        request.difficulty,
+        request.content_type,
+        request.include_explanation,
+        config.model
+    )
+    cached = None
+    if request.cache != "bypass":
+        cached = await generation_cache.get_async(cache_key)
+    if cached is None and request.cache == "only":
+        raise HTTPException(status_code=404, detail="No cached generation for this input")
+
     try:
-        # Generate MCQs
-        questions, used_model = generate_mcqs_with_llm(
-            request.text, 
-            request.num_questions, 
-            request.difficulty, 
-            request.content_type, 
-            config
-        )
+        if cached is not None:
+            questions, used_model = cached
+        else:
+            # Generate MCQs
+            questions, used_model = await generate_mcqs_with_llm(
+                request.text, 
+                request.num_questions, 
+                request.difficulty, 
+                request.content_type, 
+                config
+            )
+            await generation_cache.put_async(cache_key, questions, used_model)
         
         generation_time = time.time() - start_time
         
         # Save to normalized database
-        try:
+        def save(db: Session):
             # 1. Create MCQ Generation record
             mcq_gen = models.MCQGeneration(
                 user_id=current_user.id if current_user else None,
@@ -1327,74 +1514,398 @@ async def generate_mcqs(
             db.add(mcq_gen)
             db.flush()  # Get the ID without committing
             
-            # 2. Save each question as a separate row
-            saved_questions = []
-            for idx, q in enumerate(questions, 1):
-                # Get options - check both uppercase and lowercase keys
-                options = q.get('options', {})
-                option_a = options.get('A') or options.get('a', '')
-                option_b = options.get('B') or options.get('b', '')
-                option_c = options.get('C') or options.get('c', '')
-                option_d = options.get('D') or options.get('d', '')
-                
-                # Get correct answer - normalize to uppercase
-                correct_ans = q.get('correct_answer') or q.get('correct_option', '')
-                if isinstance(correct_ans, str):
-                    correct_ans = correct_ans.upper()
-                
-                mcq_question = models.MCQQuestion(
-                    generation_id=mcq_gen.id,
-                    question_number=idx,
-                    question_text=q.get('question', ''),
-                    option_a=option_a,
-                    option_b=option_b,
-                    option_c=option_c,
-                    option_d=option_d,
-                    correct_answer=correct_ans,
-                    explanation=q.get('explanation', ''),
-                    times_attempted=0,
-                    times_correct=0,
-                    times_wrong=0
-                )
-                db.add(mcq_question)
-                saved_questions.append(mcq_question)
-            
-            db.commit()
-            db.refresh(mcq_gen)
+            # 2. Bulk insert the questions, IDs come back with the insert
+            rows = [mcq_question_values(mcq_gen.id, idx, q) for idx, q in enumerate(questions, 1)]
+            question_ids = persistence.insert_children(
+                db, models.MCQQuestion, rows, order_by=models.MCQQuestion.question_number
+            )
+
+            # 3. Publish to the social feed and dashboard rollups in the same transaction
+            social_feed.add_mcq(db, mcq_gen, current_user, rows)
+            analytics_rollups.record_mcq(db, mcq_gen)
+            leaderboards.note_write()
+            return mcq_gen.id, question_ids
+
+        try:
+            generation_id, question_ids = await db_writer.write(save)
             
             # Add IDs to the response
-            for i, sq in enumerate(saved_questions):
-                db.refresh(sq)
-                questions[i]['id'] = sq.id
+            for q, question_id in zip(questions, question_ids):
+                q['id'] = question_id
             
             # Return with generation ID for quiz tracking
             return {
                 "questions": questions, 
                 "model": used_model,
-                "generation_id": mcq_gen.id
+                "generation_id": generation_id,
+                "cached": cached is not None
             }
         except Exception as db_error:
             print(f"Analytics save error: {db_error}")
-            db.rollback()
             # Don't fail the request if analytics fails
-            return {"questions": questions, "model": used_model}
+            return {"questions": questions, "model": used_model, "cached": cached is not None}
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"AI Generation Failed: {str(e)}")
 
 
+@app.post("/api/generate-mcqs/stream")
+async def generate_mcqs_stream(
+    request: GenerateRequest,
+    req: Request,
+    current_user: models.User = Depends(get_current_user_optional_detached)
+):
+    """
+    Stream MCQs as Server-Sent Events.
+    Emits `generation` once the record exists, one `question` event per question
+    as soon as its JSON object closes in the LLM stream, then `done` (or `error`).
+    Each question is saved to MCQQuestion before it is sent.
+    Text longer than one prompt is rejected with 413 (unless it is cached).
+    """
+    # Checked before the stream opens, so a misconfigured server fails with a clear error
+    config = server_llm_config()
+    if config.api_key == "gsk_xxxxxxxxxxxxxxxxxxxxxxxxxxxxxx":
+        raise HTTPException(status_code=500, detail="Server Configuration Error: Please set the GROQ_API_KEY")
+
+    if request.cache not in generation_cache.CACHE_MODES:
+        raise HTTPException(status_code=400, detail=f"cache must be one of {', '.join(generation_cache.CACHE_MODES)}")
+
+    requested_model = config.model
+    cache_key = generation_cache.make_key(
+        request.text,
+        request.num_questions,
+        request.difficulty,
+        request.content_type,
+        request.include_explanation,
+        requested_model
+    )
+    cached = None
+    if request.cache != "bypass":
+        cached = await generation_cache.get_async(cache_key)
+    if cached is None and request.cache == "only":
+        raise HTTPException(status_code=404, detail="No cached generation for this input")
+    # The stream is one prompt; longer text needs the chunked path of /api/generate-mcqs
+    if cached is None and mcq_chunking.needs_chunking(request.text):
+        raise HTTPException(
+            status_code=413,
+            detail=f"Text is too long to stream (over {mcq_chunking.chunk_char_budget()} characters); "
+                   "use /api/generate-mcqs, which splits long documents"
+        )
+
+    user_id = current_user.id if current_user else None
+    ip_address = req.client.host if req.client else None
+    user_agent = req.headers.get('user-agent', None)
+
+    def create_generation(db: Session) -> int:
+        mcq_gen = models.MCQGeneration(
+            user_id=user_id,
+            input_type='paste_text',
+            content_type=request.content_type,
+            difficulty=request.difficulty,
+            num_questions=request.num_questions,
+            include_explanation=request.include_explanation,
+            source_content=request.text[:5000] if request.text else None,
+            questions_data=[],  # Empty for normalized schema
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+        db.add(mcq_gen)
+        db.flush()
+        return mcq_gen.id
+
+    def save_question(db: Session, generation_id: int, number: int, q: dict) -> int:
+        row = mcq_question_from_dict(generation_id, number, q)
+        db.add(row)
+        db.flush()
+        return row.id
+
+    def finish_generation(db: Session, generation_id: int, used_model: str, generation_time: float):
+        mcq_gen = db.get(models.MCQGeneration, generation_id)
+        mcq_gen.model_name = used_model
+        mcq_gen.generation_time_seconds = generation_time
+        # Publish to the social feed once the generation is complete
+        if current_user:
+            question_rows = db.query(models.MCQQuestion).filter(
+                models.MCQQuestion.generation_id == generation_id
+            ).order_by(models.MCQQuestion.question_number).all()
+            social_feed.add_mcq(db, mcq_gen, current_user, question_rows)
+        analytics_rollups.record_mcq(db, mcq_gen)
+        leaderboards.note_write()
+
+    async def event_stream():
+        start_time = time.time()
+        questions = []
+        used_model = None
+        try:
+            # Every write goes through db_writer: one short transaction each,
+            # never a session held open across the LLM stream
+            generation_id = await db_writer.write(create_generation)
+            yield mcq_stream.sse_event("generation", {"generation_id": generation_id, "cached": cached is not None})
+
+            async def saved(q: dict) -> dict:
+                q['id'] = await db_writer.write(save_question, generation_id, len(questions) + 1, q)
+                questions.append(q)
+                return q
+
+            if cached is not None:
+                cached_questions, used_model = cached
+                for q in cached_questions:
+                    yield mcq_stream.sse_event("question", await saved(q))
+            else:
+                parser = mcq_stream.QuestionStreamParser()
+                messages = [
+                    {"role": "system", "content": "You are a helpful AI assistant."},
+                    {"role": "user", "content": build_mcq_prompt(
+                        request.text, request.num_questions, request.difficulty, request.content_type
+                    )}
+                ]
+                async for used_model, delta in llm_client.stream_groq_with_fallback(messages):
+                    for q in parser.feed(delta):
+                        if len(questions) < request.num_questions:
+                            yield mcq_stream.sse_event("question", await saved(q))
+
+            generation_time = time.time() - start_time
+            await db_writer.write(finish_generation, generation_id, used_model, generation_time)
+
+            if cached is None:
+                await generation_cache.put_async(cache_key, questions, used_model)
+
+            yield mcq_stream.sse_event("done", {
+                "generation_id": generation_id,
+                "count": len(questions),
+                "model": used_model,
+                "cached": cached is not None,
+                "generation_time_seconds": round(generation_time, 2)
+            })
+        except Exception as e:
+            print(f"MCQ stream error: {e}")
+            yield mcq_stream.sse_event("error", {"detail": f"AI Generation Failed: {str(e)}", "count": len(questions)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ==================== BATCH GENERATION ====================
+
+def persist_batch_items(job: batch_jobs.BatchJob, items: List[batch_jobs.BatchItem]):
+    """Write a group of finished batch items in one transaction (questions bulk-inserted)"""
+    question_ids = db_writer.write_sync(save_batch_items, job, items)
+
+    # Question IDs (needed for quiz tracking) came back with the insert, in row order
+    ids = iter(question_ids)
+    for item in items:
+        for q in item.questions:
+            q['id'] = next(ids)
+
+def save_batch_items(db: Session, job: batch_jobs.BatchJob, items: List[batch_jobs.BatchItem]) -> List[int]:
+    generations = []
+    for item in items:
+        mcq_gen = models.MCQGeneration(
+            user_id=job.user_id,
+            input_type=item.input_type,
+            content_type=job.params["content_type"],
+            difficulty=job.params["difficulty"],
+            num_questions=job.params["num_questions"],
+            include_explanation=job.params["include_explanation"],
+            source_content=item.text[:5000] if item.text else None,
+            source_url=item.url,
+            source_filename=item.title if item.input_type == "upload_file" else None,
+            model_name=item.model,
+            generation_time_seconds=item.generation_time,
+            questions_data=[],  # Empty for normalized schema
+            ip_address=job.ip_address,
+            user_agent=job.user_agent
+        )
+        db.add(mcq_gen)
+        generations.append(mcq_gen)
+    db.flush()
+
+    rows_by_gen = {
+        mcq_gen.id: [mcq_question_values(mcq_gen.id, idx, q) for idx, q in enumerate(item.questions, 1)]
+        for item, mcq_gen in zip(items, generations)
+    }
+    rows = [row for gen_rows in rows_by_gen.values() for row in gen_rows]
+    question_ids = persistence.insert_children(
+        db, models.MCQQuestion, rows, order_by=models.MCQQuestion.question_number
+    )
+
+    # Publish to the social feed and dashboard rollups in the same transaction
+    user = db.get(models.User, job.user_id) if job.user_id else None
+    for mcq_gen in generations:
+        social_feed.add_mcq(db, mcq_gen, user, rows_by_gen[mcq_gen.id])
+        analytics_rollups.record_mcq(db, mcq_gen)
+        leaderboards.note_write()
+
+    for item, mcq_gen in zip(items, generations):
+        item.generation_id = mcq_gen.id
+    return question_ids
+
+def start_batch_job(items: List[batch_jobs.BatchItem], params: dict, req: Request, current_user) -> dict:
+    if not items:
+        raise HTTPException(status_code=400, detail="No items to generate from")
+    if len(items) > batch_jobs.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {batch_jobs.BATCH_MAX_ITEMS} items")
+    if params["cache"] not in generation_cache.CACHE_MODES:
+        raise HTTPException(status_code=400, detail=f"cache must be one of {', '.join(generation_cache.CACHE_MODES)}")
+
+    config = server_llm_config()
+
+    async def load_text(url: str) -> str:
+        return await extract_text_from_url(url)
+
+    async def generate(text: str):
+        cache_key = generation_cache.make_key(
+            text,
+            params["num_questions"],
+            params["difficulty"],
+            params["content_type"],
+            params["include_explanation"],
+            config.model
+        )
+        if params["cache"] != "bypass":
+            cached = await generation_cache.get_async(cache_key)
+            if cached is not None:
+                return cached[0], cached[1], True
+        if params["cache"] == "only":
+            raise ValueError("No cached generation for this input")
+
+        questions, used_model = await generate_mcqs_with_llm(
+            text,
+            params["num_questions"],
+            params["difficulty"],
+            params["content_type"],
+            config
+        )
+        await generation_cache.put_async(cache_key, questions, used_model)
+        return questions, used_model, False
+
+    job = batch_jobs.register(batch_jobs.BatchJob(
+        items,
+        params,
+        user_id=current_user.id if current_user else None,
+        ip_address=req.client.host if req.client else None,
+        user_agent=req.headers.get('user-agent', None)
+    ))
+    job.task = asyncio.create_task(batch_jobs.run_job(job, load_text, generate, persist_batch_items))
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/generate-mcqs/batch/{job.id}",
+        "progress": job.progress()
+    }
+
+@app.post("/api/generate-mcqs/batch")
+async def generate_mcqs_batch(
+    request: BatchGenerateRequest,
+    req: Request,
+    current_user: models.User = Depends(get_current_user_optional)
+):
+    """Start a batch MCQ job over many texts/URLs. Poll status_url for progress and results."""
+    items = []
+    for idx, source in enumerate(request.items):
+        if not source.text and not source.url:
+            raise HTTPException(status_code=400, detail=f"Item {idx} needs text or url")
+        items.append(batch_jobs.BatchItem(
+            idx,
+            text=source.text,
+            url=source.url,
+            title=source.title,
+            input_type="paste_text" if source.text else "url"
+        ))
+    params = request.model_dump(exclude={"items"})
+    return start_batch_job(items, params, req, current_user)
+
+@app.post("/api/generate-mcqs/batch/upload")
+async def generate_mcqs_batch_upload(
+    req: Request,
+    files: List[UploadFile] = File(...),
+    num_questions: int = Form(10),
+    difficulty: str = Form("auto"),
+    content_type: str = Form("coding"),
+    include_explanation: bool = Form(True),
+    cache: str = Form("prefer"),
+    current_user: models.User = Depends(get_current_user_optional)
+):
+    """Start a batch MCQ job over uploaded files (.pdf, .txt, .md)"""
+    items = []
+    for idx, file in enumerate(files):
+        content = await file.read()
+        text = await extract_upload_text(file.filename, content)
+        items.append(batch_jobs.BatchItem(idx, text=text, title=file.filename, input_type="upload_file"))
+    params = {
+        "num_questions": num_questions,
+        "difficulty": difficulty,
+        "content_type": content_type,
+        "include_explanation": include_explanation,
+        "cache": cache
+    }
+    return start_batch_job(items, params, req, current_user)
+
+@app.get("/api/generate-mcqs/batch/{job_id}")
+async def get_batch_job(
+    job_id: str,
+    include_questions: bool = True,
+    current_user: models.User = Depends(get_current_user_optional)
+):
+    """Progress of a batch job; finished items include their questions"""
+    job = batch_jobs.get(job_id)
+    if job is None or (job.user_id and (not current_user or current_user.id != job.user_id)):
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.to_dict(include_questions=include_questions)
+
+# ==================== END BATCH GENERATION ====================
+
+
 # ==================== ANALYTICS ENDPOINTS ====================
 
+def update_question_stats(db: Session, answers: List[schemas.QuestionAnswerCreate]):
+    """
+    Apply a submission to mcq_questions with SQL arithmetic - one executemany UPDATE, so
+    concurrent submissions never lose counts. average_time_to_answer stays the running mean
+    over times_attempted, as before.
+    """
+    per_question = {}
+    for ans in answers:
+        stats = per_question.setdefault(ans.question_id, {"q_id": ans.question_id, "n": 0, "c": 0, "w": 0, "k": 0, "s": 0.0})
+        stats["n"] += 1
+        stats["c" if ans.is_correct else "w"] += 1
+        if ans.time_spent_seconds:
+            stats["k"] += 1
+            stats["s"] += ans.time_spent_seconds
+
+    q = models.MCQQuestion.__table__.c
+    attempted = func.coalesce(q.times_attempted, 0)
+    db.execute(
+        # MySQL evaluates SET assignments left to right, so a later expression reading
+        # times_attempted would see the new value: the mean, which needs the old count,
+        # is assigned first (ordered_values keeps this order; PostgreSQL/SQLite always
+        # read the old values)
+        update(models.MCQQuestion.__table__).where(q.id == bindparam("q_id")).ordered_values(
+            (q.average_time_to_answer, case(
+                (bindparam("k") == 0, q.average_time_to_answer),
+                (q.average_time_to_answer == None, bindparam("s") / bindparam("k")),
+                else_=(q.average_time_to_answer * attempted + bindparam("s")) / (attempted + bindparam("n"))
+            )),
+            (q.times_attempted, attempted + bindparam("n")),
+            (q.times_correct, func.coalesce(q.times_correct, 0) + bindparam("c")),
+            (q.times_wrong, func.coalesce(q.times_wrong, 0) + bindparam("w"))
+        ),
+        # Same row order in every transaction, so concurrent submissions cannot deadlock
+        [per_question[qid] for qid in sorted(per_question)]
+    )
+
 @app.post("/api/quiz-session")
 async def submit_quiz_session(
     session: schemas.QuizSessionCreate,
     answers: List[schemas.QuestionAnswerCreate],
     req: Request,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_optional)
+    current_user: models.User = Depends(get_current_user_optional_detached)
 ):
     """Save quiz session with normalized answers"""
-    try:
+    def save(db: Session) -> int:
         # 1. Create quiz session
         quiz_session = models.QuizSession(
             user_id=current_user.id if current_user else None,
@@ -1418,58 +1929,42 @@ async def submit_quiz_session(
         db.add(quiz_session)
         db.flush()
         
-        # 2. Save each answer and update question statistics
-        for ans in answers:
-            # Save answer
-            question_answer = models.QuestionAnswer(
-                quiz_session_id=quiz_session.id,
-                question_id=ans.question_id,
-                user_answer=ans.user_answer,
-                is_correct=ans.is_correct,
-                time_spent_seconds=ans.time_spent_seconds
-            )
-            db.add(question_answer)
-            
-            # Update question statistics
-            question = db.query(models.MCQQuestion).filter(
-                models.MCQQuestion.id == ans.question_id
-            ).first()
-            
-            if question:
-                question.times_attempted += 1
-                if ans.is_correct:
-                    question.times_correct += 1
-                else:
-                    question.times_wrong += 1
-                
-                # Update average time
-                if ans.time_spent_seconds:
-                    if question.average_time_to_answer:
-                        question.average_time_to_answer = (
-                            (question.average_time_to_answer * (question.times_attempted - 1) + 
-                             ans.time_spent_seconds) / question.times_attempted
-                        )
-                    else:
-                        question.average_time_to_answer = ans.time_spent_seconds
-        
-        db.commit()
-        db.refresh(quiz_session)
-        
-        return {"success": True, "session_id": quiz_session.id}
+        # 2. Bulk insert the answers and update question statistics in one statement
+        answered_at = datetime.now(timezone.utc)
+        if answers:
+            db.execute(insert(models.QuestionAnswer), [{
+                "quiz_session_id": quiz_session.id,
+                "question_id": ans.question_id,
+                "user_answer": ans.user_answer,
+                "is_correct": ans.is_correct,
+                "time_spent_seconds": ans.time_spent_seconds,
+                "answered_at": answered_at
+            } for ans in answers])
+            update_question_stats(db, answers)
+
+        # 3. Publish to the social feed and dashboard rollups in the same transaction
+        db.flush()
+        social_feed.add_quiz(db, quiz_session, current_user)
+        analytics_rollups.record_quiz(db, quiz_session, answers, answered_at)
+        leaderboards.note_write()
+        return quiz_session.id
+
+    try:
+        return {"success": True, "session_id": await db_writer.write(save)}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Quiz session save error: {e}")
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/meme-generation")
 async def save_meme_generation(
     meme_gen: schemas.MemeGenerationCreate,
     req: Request,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_optional)
+    current_user: models.User = Depends(get_current_user_optional_detached)
 ):
     """Save meme generation with normalized memes"""
-    try:
+    def save(db: Session) -> int:
         # 1. Create meme generation record
         meme_generation = models.MemeGeneration(
             user_id=current_user.id if current_user else None,
@@ -1491,26 +1986,30 @@ async def save_meme_generation(
         db.add(meme_generation)
         db.flush()
         
-        # 2. Save each meme as separate row
-        for meme_data in meme_gen.memes_data:
-            generated_meme = models.GeneratedMeme(
-                generation_id=meme_generation.id,
-                meme_url=meme_data.get('url', ''),
-                meme_type=meme_data.get('type', meme_gen.meme_type),
-                source=meme_data.get('source', ''),
-                note=meme_data.get('note', ''),
-                views=0,
-                downloads=0
-            )
-            db.add(generated_meme)
-        
-        db.commit()
-        db.refresh(meme_generation)
-        
-        return {"success": True, "generation_id": meme_generation.id}
+        # 2. Bulk insert the memes
+        rows = [{
+            "generation_id": meme_generation.id,
+            "meme_url": meme_data.get('url', ''),
+            "meme_type": meme_data.get('type', meme_gen.meme_type),
+            "source": meme_data.get('source', ''),
+            "note": meme_data.get('note', ''),
+            "views": 0,
+            "downloads": 0
+        } for meme_data in meme_gen.memes_data]
+        memes = persistence.with_ids(rows, persistence.insert_children(db, models.GeneratedMeme, rows))
+
+        # 3. Publish to the social feed and dashboard rollups in the same transaction
+        social_feed.add_meme(db, meme_generation, current_user, memes)
+        analytics_rollups.record_meme(db, meme_generation)
+        leaderboards.note_write()
+        return meme_generation.id
+
+    try:
+        return {"success": True, "generation_id": await db_writer.write(save)}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Meme generation save error: {e}")
-        db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 # ==================== AUTH TRACKING ====================
@@ -1543,98 +2042,66 @@ async def logout_user(
 
 # ==================== EVENT & SESSION TRACKING ====================
 
+def event_row(event: schemas.UserEventCreate, req: Request, current_user) -> dict:
+    return {
+        "user_id": current_user.id if current_user else None,
+        "session_id": event.session_id,
+        "event_type": event.event_type,
+        "event_category": event.event_category,
+        "event_action": event.event_action,
+        "event_label": event.event_label,
+        "event_value": event.event_value,
+        "page_url": event.page_url,
+        "page_title": event.page_title,
+        "referrer": event.referrer,
+        "device_type": event.device_type,
+        "browser": event.browser,
+        "os": event.os,
+        "time_on_page": event.time_on_page,
+        "event_metadata": event.metadata,
+        "timestamp": datetime.now(timezone.utc),
+        "ip_address": req.client.host if req.client else None,
+        "user_agent": req.headers.get('user-agent', None)
+    }
+
 @app.post("/api/track-event")
 async def track_event(
     event: schemas.UserEventCreate,
     req: Request,
-    db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user_optional)
 ):
-    """Track user events for journey analysis"""
-    # Return immediately to avoid timeouts - analytics is non-critical
-    return {"success": True}
-    
-    # Disabled for now to prevent timeouts on PythonAnywhere
-    # try:
-    #     user_event = models.UserEvent(
-    #         user_id=current_user.id if current_user else None,
-    #         session_id=event.session_id,
-    #         event_type=event.event_type,
-    #         event_category=event.event_category,
-    #         event_action=event.event_action,
-    #         event_label=event.event_label,
-    #         event_value=event.event_value,
-    #         page_url=event.page_url,
-    #         page_title=event.page_title,
-    #         referrer=event.referrer,
-    #         device_type=event.device_type,
-    #         browser=event.browser,
-    #         os=event.os,
-    #         time_on_page=event.time_on_page,
-    #         event_metadata=event.metadata,
-    #         ip_address=req.client.host if req.client else None,
-    #         user_agent=req.headers.get('user-agent', None)
-    #     )
-    #     db.add(user_event)
-    #     db.commit()
-    #     
-    #     return {"success": True}
-    # except Exception as e:
-    #     print(f"Event tracking error: {e}")
-    #     db.rollback()
-    #     return {"success": False, "error": str(e)}
+    """Track user events for journey analysis (queued and bulk-written, see event_ingest.py)"""
+    return {"success": event_ingest.enqueue_event(event_row(event, req, current_user))}
+
+@app.post("/api/track-events")
+async def track_events(
+    batch: schemas.UserEventBatch,
+    req: Request,
+    current_user: models.User = Depends(get_current_user_optional)
+):
+    """Track a batch of user events in one request"""
+    if len(batch.events) > event_ingest.EVENT_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can hold at most {event_ingest.EVENT_BATCH_MAX_ITEMS} events"
+        )
+    accepted = sum(event_ingest.enqueue_event(event_row(e, req, current_user)) for e in batch.events)
+    return {"success": True, "accepted": accepted, "dropped": len(batch.events) - accepted}
 
 @app.post("/api/track-session")
 async def track_session(
     session: schemas.UserSessionCreate,
     req: Request,
-    db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user_optional)
 ):
-    """Track or update user session"""
-    # Return immediately to avoid timeouts - analytics is non-critical
-    return {"success": True}
-    
-    # Disabled for now to prevent HARAKIRI timeouts on PythonAnywhere
-    # try:
-    #     # Check if session exists
-    #     existing_session = db.query(models.UserSession).filter(
-    #         models.UserSession.session_id == session.session_id
-    #     ).first()
-    #     
-    #     if existing_session:
-    #         # Update existing session
-    #         existing_session.ended_at = session.ended_at
-    #         existing_session.duration_seconds = session.duration_seconds
-    #         existing_session.is_active = session.is_active
-    #         existing_session.pages_viewed = session.pages_viewed
-    #         existing_session.mcqs_generated = session.mcqs_generated
-    #         existing_session.quizzes_taken = session.quizzes_taken
-    #         existing_session.memes_generated = session.memes_generated
-    #     else:
-    #         # Create new session
-    #         user_session = models.UserSession(
-    #             user_id=current_user.id if current_user else None,
-    #             session_id=session.session_id,
-    #             started_at=session.started_at,
-    #             ended_at=session.ended_at,
-    #             duration_seconds=session.duration_seconds,
-    #             is_active=session.is_active,
-    #             pages_viewed=session.pages_viewed,
-    #             mcqs_generated=session.mcqs_generated,
-    #             quizzes_taken=session.quizzes_taken,
-    #             memes_generated=session.memes_generated,
-    #             ip_address=req.client.host if req.client else None,
-    #             user_agent=req.headers.get('user-agent', None)
-    #         )
-    #         db.add(user_session)
-    #     
-    #     db.commit()
-    #     return {"success": True}
-    # except Exception as e:
-    #     print(f"Session tracking error: {e}")
-    #     db.rollback()
-    #     return {"success": False, "error": str(e)}
+    """Track or update user session (queued; an update only touches the fields it sends)"""
+    row = {
+        "user_id": current_user.id if current_user else None,
+        "ip_address": req.client.host if req.client else None,
+        "user_agent": req.headers.get('user-agent', None),
+        **session.model_dump(include={"session_id", "started_at", *event_ingest.SESSION_FIELDS}, exclude_unset=True)
+    }
+    return {"success": event_ingest.enqueue_session(row)}
 
 
 # ==================== END EVENT & SESSION TRACKING ====================
@@ -1682,68 +2149,76 @@ async def upload_image(file: UploadFile = File(...), current_user: models.User =
 @app.post("/api/social/like")
 async def toggle_like(
     like_data: schemas.SocialLikeCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(get_current_user_detached)
 ):
-    # Check if like exists
-    existing_like = db.query(models.SocialLike).filter(
-        models.SocialLike.user_id == current_user.id,
+    return await db_writer.write(write_like, current_user.id, like_data)
+
+def write_like(db: Session, user_id: int, like_data: schemas.SocialLikeCreate) -> dict:
+    like_filter = (
+        models.SocialLike.user_id == user_id,
         models.SocialLike.content_type == like_data.content_type,
         models.SocialLike.content_id == like_data.content_id
-    ).first()
-    
-    if existing_like:
-        db.delete(existing_like)
-        db.commit()
-        liked = False
+    )
+    # Unlike if a like exists; the rowcount makes the counter update race-free
+    if db.query(models.SocialLike).filter(*like_filter).delete(synchronize_session=False):
+        liked, delta = False, -1
     else:
-        new_like = models.SocialLike(
-            user_id=current_user.id,
-            content_type=like_data.content_type,
-            content_id=like_data.content_id
-        )
-        db.add(new_like)
-        db.commit()
-        liked = True
-        
-    # Get updated count
-    count = db.query(models.SocialLike).filter(
-        models.SocialLike.content_type == like_data.content_type,
-        models.SocialLike.content_id == like_data.content_id
-    ).count()
+        try:
+            with db.begin_nested():
+                db.add(models.SocialLike(
+                    user_id=user_id,
+                    content_type=like_data.content_type,
+                    content_id=like_data.content_id
+                ))
+            liked, delta = True, 1
+        except IntegrityError:
+            # A concurrent request from the same user already liked it
+            liked, delta = True, 0
+
+    # Counter is updated atomically in the same transaction as the like
+    count = social_feed.bump_counter(db, like_data.content_type, like_data.content_id, "likes_count", delta)
+
+    if count is None:
+        # Content that is not in the feed - indexed count on (content_type, content_id)
+        count = db.query(func.count(models.SocialLike.id)).filter(*like_filter[1:]).scalar()
     
     return {"liked": liked, "likes_count": count}
 
 @app.post("/api/social/comment")
 async def add_comment(
     comment_data: schemas.SocialCommentCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(get_current_user_detached)
 ):
-    comment = models.SocialComment(
-        user_id=current_user.id,
-        content_type=comment_data.content_type,
-        content_id=comment_data.content_id,
-        text=comment_data.text
-    )
-    db.add(comment)
-    db.commit()
-    db.refresh(comment)
+    def save(db: Session) -> dict:
+        comment = models.SocialComment(
+            user_id=current_user.id,
+            content_type=comment_data.content_type,
+            content_id=comment_data.content_id,
+            text=comment_data.text
+        )
+        db.add(comment)
+        social_feed.bump_counter(db, comment_data.content_type, comment_data.content_id, "comments_count", 1)
+        db.flush()
+        db.refresh(comment)
+        return {"id": comment.id, "text": comment.text, "created_at": comment.created_at}
     
+    comment = await db_writer.write(save)
     return {
-        "id": comment.id,
+        "id": comment["id"],
         "user_name": current_user.full_name or "User",
         "user_avatar": current_user.profile_picture,
-        "text": comment.text,
-        "created_at": comment.created_at
+        "text": comment["text"],
+        "created_at": comment["created_at"]
     }
 
 @app.get("/api/social/comments")
 async def get_comments(
     content_type: str,
-    content_id: int,
-    db: Session = Depends(get_db)
+    content_id: int
 ):
+    return await db_executor.run(read_comments, content_type, content_id)
+
+def read_comments(db: Session, content_type: str, content_id: int) -> List[dict]:
     comments = db.query(models.SocialComment).filter(
         models.SocialComment.content_type == content_type,
         models.SocialComment.content_id == content_id
@@ -1759,246 +2234,45 @@ async def get_comments(
 
 @app.get("/api/social/feed")
 async def get_social_feed(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_optional)
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = social_feed.FEED_PAGE_SIZE,
+    db=Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_user_optional_async)
 ):
-    """Get public social feed"""
-    feed = []
-    
-    # Fetch recent Quizzes
-    # Fetch recent Quizzes - ONLY from logged in users
-    recent_quizzes = db.query(models.QuizSession).filter(
-        models.QuizSession.user_id != None
-    ).order_by(models.QuizSession.started_at.desc()).limit(20).all()
-    for q in recent_quizzes:
-        user = db.query(models.User).filter(models.User.id == q.user_id).first()
-        user_name = user.full_name if user else "Anonymous"
-        user_pic = user.profile_picture if user else None
-        
-        likes_count = db.query(models.SocialLike).filter(
-            models.SocialLike.content_type == 'quiz',
-            models.SocialLike.content_id == q.id
-        ).count()
-        
-        has_liked = False
-        if current_user:
-            has_liked = db.query(models.SocialLike).filter(
-                models.SocialLike.user_id == current_user.id,
-                models.SocialLike.content_type == 'quiz',
-                models.SocialLike.content_id == q.id
-            ).first() is not None
-        
-        comments_count = db.query(models.SocialComment).filter(
-            models.SocialComment.content_type == 'quiz',
-            models.SocialComment.content_id == q.id
-        ).count()
-        
-        
-        # Get ALL questions with answers
-        sample_answers = db.query(models.QuestionAnswer).filter(
-            models.QuestionAnswer.quiz_session_id == q.id
-        ).all()  # Changed from limit(3) to all()
-        
-        questions_preview = []
-        for ans in sample_answers:
-            question = db.query(models.MCQQuestion).filter(
-                models.MCQQuestion.id == ans.question_id
-            ).first()
-            if question:
-                # Map option letter to actual text
-                option_map = {
-                    'A': question.option_a or '',
-                    'B': question.option_b or '',
-                    'C': question.option_c or '',
-                    'D': question.option_d or ''
-                }
-                
-                # Convert to uppercase for mapping
-                user_answer_letter = ans.user_answer.upper() if isinstance(ans.user_answer, str) else ans.user_answer
-                correct_answer_letter = question.correct_answer.upper() if isinstance(question.correct_answer, str) else question.correct_answer
-                
-                user_answer_text = option_map.get(user_answer_letter, ans.user_answer)
-                correct_answer_text = option_map.get(correct_answer_letter, question.correct_answer)
-                
-                # Fallback if options are empty
-                if not user_answer_text or not user_answer_text.strip():
-                    user_answer_text = f"Option {user_answer_letter}"
-                if not correct_answer_text or not correct_answer_text.strip():
-                    correct_answer_text = f"Option {correct_answer_letter}"
-                
-                questions_preview.append({
-                    "question": question.question_text,
-                    "options": {
-                        "A": question.option_a or "Option A",
-                        "B": question.option_b or "Option B",
-                        "C": question.option_c or "Option C",
-                        "D": question.option_d or "Option D"
-                    },
-                    "user_answer": user_answer_text, # Keep for backward compatibility if needed
-                    "correct_answer": correct_answer_text, # Keep for backward compatibility
-                    "user_answer_letter": user_answer_letter,
-                    "correct_answer_letter": correct_answer_letter,
-                    "is_correct": ans.is_correct,
-                    "explanation": question.explanation
-                })
-        
-        feed.append({
-            "id": f"quiz_{q.id}",
-            "content_id": q.id,
-            "type": "quiz",
-            "user": user_name,
-            "user_pic": user_pic,
-            "action": "completed a quiz",
-            "content": f"Scored {q.score_percentage}% ({q.correct_answers}/{q.total_questions})",
-            "details": f"Completed in {int(q.time_taken_seconds)}s",
-            "questions_preview": questions_preview,
-            "time": q.started_at,
-            "likes": likes_count,
-            "has_liked": has_liked,
-            "comments": comments_count
-        })
-        
-    # Fetch recent Memes - ONLY from logged in users
-    recent_memes = db.query(models.MemeGeneration).filter(
-        models.MemeGeneration.user_id != None
-    ).order_by(models.MemeGeneration.created_at.desc()).limit(20).all()
-    for m in recent_memes:
-        user = db.query(models.User).filter(models.User.id == m.user_id).first()
-        user_name = user.full_name if user else "Anonymous"
-        user_pic = user.profile_picture if user else None
-        
-        first_meme = db.query(models.GeneratedMeme).filter(models.GeneratedMeme.generation_id == m.id).first()
-        image_url = first_meme.meme_url if first_meme else None
-        
-        likes_count = db.query(models.SocialLike).filter(
-            models.SocialLike.content_type == 'meme',
-            models.SocialLike.content_id == m.id
-        ).count()
-        
-        has_liked = False
-        if current_user:
-            has_liked = db.query(models.SocialLike).filter(
-                models.SocialLike.user_id == current_user.id,
-                models.SocialLike.content_type == 'meme',
-                models.SocialLike.content_id == m.id
-            ).first() is not None
-        
-        comments_count = db.query(models.SocialComment).filter(
-            models.SocialComment.content_type == 'meme',
-            models.SocialComment.content_id == m.id
-        ).count()
-        
-        feed.append({
-            "id": f"meme_{m.id}",
-            "content_id": m.id,
-            "type": "meme",
-            "user": user_name,
-            "user_pic": user_pic,
-            "action": "cooked up a meme",
-            "content": m.topic,
-            "image_url": image_url,
-            "details": f"Generated {m.num_memes} variants",
-            "time": m.created_at,
-            "likes": likes_count,
-            "has_liked": has_liked,
-            "comments": comments_count
-        })
-    
-    # Fetch recent MCQ Generations - ONLY from logged in users
-    recent_mcqs = db.query(models.MCQGeneration).filter(
-        models.MCQGeneration.user_id != None
-    ).order_by(models.MCQGeneration.created_at.desc()).limit(20).all()
-    for mcq in recent_mcqs:
-        user = db.query(models.User).filter(models.User.id == mcq.user_id).first()
-        user_name = user.full_name if user else "Anonymous"
-        user_pic = user.profile_picture if user else None
-        
-        likes_count = db.query(models.SocialLike).filter(
-            models.SocialLike.content_type == 'mcq',
-            models.SocialLike.content_id == mcq.id
-        ).count()
-        
-        has_liked = False
-        if current_user:
-            has_liked = db.query(models.SocialLike).filter(
-                models.SocialLike.user_id == current_user.id,
-                models.SocialLike.content_type == 'mcq',
-                models.SocialLike.content_id == mcq.id
-            ).first() is not None
-        
-        comments_count = db.query(models.SocialComment).filter(
-            models.SocialComment.content_type == 'mcq',
-            models.SocialComment.content_id == mcq.id
-        ).count()
-        
-        
-        
-        # Get ALL questions with options and correct answers for MCQ generations
-        all_questions = db.query(models.MCQQuestion).filter(
-            models.MCQQuestion.generation_id == mcq.id
-        ).all()
-        
-        questions_data = []
-        for q in all_questions:
-            # Map correct answer letter to actual text
-            option_map = {
-                'A': q.option_a or '',
-                'B': q.option_b or '',
-                'C': q.option_c or '',
-                'D': q.option_d or ''
-            }
-            
-            correct_answer_letter = q.correct_answer.upper() if isinstance(q.correct_answer, str) else q.correct_answer
-            correct_text = option_map.get(correct_answer_letter, q.correct_answer)
-            
-            # Fallback if option is empty
-            if not correct_text or not correct_text.strip():
-                correct_text = f"Option {correct_answer_letter}"
-            
-            questions_data.append({
-                "question": q.question_text,
-                "options": {
-                    "A": q.option_a or "Option A",
-                    "B": q.option_b or "Option B",
-                    "C": q.option_c or "Option C",
-                    "D": q.option_d or "Option D"
-                },
-                "correct_answer": q.correct_answer,
-                "correct_answer_text": correct_text,
-                "explanation": q.explanation
-            })
-        
-        feed.append({
-            "id": f"mcq_{mcq.id}",
-            "content_id": mcq.id,
-            "type": "mcq",
-            "user": user_name,
-            "user_pic": user_pic,
-            "action": "generated MCQs",
-            "content": f"{mcq.num_questions} {mcq.difficulty} questions",
-            "details": f"Category: {mcq.category or 'General'}",
-            "questions_data": questions_data,
-            "time": mcq.created_at,
-            "likes": likes_count,
-            "has_liked": has_liked,
-            "comments": comments_count
-        })
-        
-    feed.sort(key=lambda x: x["time"], reverse=True)
-    return feed[:40]
+    """
+    Get public social feed, newest first.
+    Every item carries a `cursor`: pass the last one as `before` for the next
+    page, or the first one as `after` to fetch only newer items.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    limit = max(1, min(limit, social_feed.FEED_MAX_PAGE_SIZE))
+
+    def read(db):
+        items = social_feed.page(db, before, after, limit)
+        liked = social_feed.liked_keys(db, current_user, [(i.content_type, i.content_id) for i in items])
+        return [social_feed.to_dict(item, liked) for item in items]
+
+    try:
+        return await database.run_sync(db, read)
+    except social_feed.FeedCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # ==================== BOOKMARK ENDPOINTS ====================
 
 @app.post("/api/bookmarks/toggle")
 async def toggle_bookmark(
     request: BookmarkRequest,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(get_current_user_detached)
 ):
     """Toggle bookmark (save/unsave) for MCQ, meme, quiz, or individual items"""
+    return await db_writer.write(write_bookmark, current_user.id, request)
+
+def write_bookmark(db: Session, user_id: int, request: BookmarkRequest) -> dict:
     # Check if bookmark exists
     query = db.query(models.Bookmark).filter(
-        models.Bookmark.user_id == current_user.id,
+        models.Bookmark.user_id == user_id,
         models.Bookmark.content_type == request.content_type,
         models.Bookmark.content_id == request.content_id
     )
@@ -2013,29 +2287,30 @@ async def toggle_bookmark(
     if existing:
         # Unsave (remove bookmark)
         db.delete(existing)
-        db.commit()
         return {"bookmarked": False, "message": "Removed from saved items"}
     else:
         # Save (add bookmark)
         bookmark = models.Bookmark(
-            user_id=current_user.id,
+            user_id=user_id,
             content_type=request.content_type,
             content_id=request.content_id,
             content_index=request.content_index,
             content_data=request.content_data
         )
         db.add(bookmark)
-        db.commit()
         return {"bookmarked": True, "message": "Saved successfully"}
 
 @app.get("/api/bookmarks")
 async def get_bookmarks(
     content_type: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db=Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
     """Get all bookmarks for the current user"""
-    query = db.query(models.Bookmark).filter(models.Bookmark.user_id == current_user.id)
+    return await database.run_sync(db, read_bookmarks, current_user.id, content_type)
+
+def read_bookmarks(db: Session, user_id: int, content_type: Optional[str]) -> List[dict]:
+    query = db.query(models.Bookmark).filter(models.Bookmark.user_id == user_id)
     
     if content_type:
         query = query.filter(models.Bookmark.content_type == content_type)
@@ -2072,7 +2347,7 @@ async def get_bookmarks(
                 memes = db.query(models.GeneratedMeme).filter(models.GeneratedMeme.generation_id == meme_gen.id).all()
                 item['content'] = {
                     "topic": meme_gen.topic,
-                    "memes": [{"url": m.meme_url, "prompt": m.prompt_used} for m in memes],
+                    "memes": [{"url": m.meme_url, "prompt": m.note} for m in memes],
                     "created_at": meme_gen.created_at
                 }
         elif bm.content_type == 'quiz':
@@ -2092,17 +2367,17 @@ async def get_bookmarks(
 async def check_bookmark(
     content_type: str,
     content_id: int,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db=Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
     """Check if content is bookmarked"""
-    bookmark = db.query(models.Bookmark).filter(
+    bookmark_id = await database.run_sync(db, lambda db: db.query(models.Bookmark.id).filter(
         models.Bookmark.user_id == current_user.id,
         models.Bookmark.content_type == content_type,
         models.Bookmark.content_id == content_id
-    ).first()
+    ).first())
     
-    return {"bookmarked": bookmark is not None}
+    return {"bookmarked": bookmark_id is not None}
 
 # ==================== END BOOKMARK ENDPOINTS ====================
 
@@ -2110,13 +2385,19 @@ async def check_bookmark(
 async def get_analytics_dashboard(
     time_range: str = "all",
     target_email: Optional[str] = None,
-    current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(get_current_user_async),
+    db=Depends(database.get_async_db)
 ):
     """
     Get comprehensive analytics for the dashboard.
     Includes Leaderboards, Social Feed, and Deep Content Analytics.
+    time_range: day (today, UTC) | week (last 7 days) | month (last 30 days) | all
     """
+    if time_range not in analytics_rollups.TIME_RANGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid time_range. Use one of: {', '.join(analytics_rollups.TIME_RANGES)}"
+        )
     
     # Determine scope - Allow anyone to filter
     if target_email and target_email != "global":
@@ -2127,210 +2408,72 @@ async def get_analytics_dashboard(
         scope_user_email = current_user.email # Default to self
         
     try:
-        # Base queries
-        mcq_query = db.query(models.MCQGeneration)
-        quiz_query = db.query(models.QuizSession)
-        meme_query = db.query(models.MemeGeneration)
-        
         # Apply User Filter
+        scope_user_id = None
         if scope_user_email:
-            user = auth.get_user_by_email(db, scope_user_email)
+            user = await database.run_sync(db, auth.get_user_by_email, scope_user_email)
             if not user:
                 return {"error": "User not found"}
-            mcq_query = mcq_query.filter(models.MCQGeneration.user_id == user.id)
-            quiz_query = quiz_query.filter(models.QuizSession.user_id == user.id)
-            meme_query = meme_query.filter(models.MemeGeneration.user_id == user.id)
+            scope_user_id = user.id
+
+        # Everything below reads the daily rollups (analytics_rollups.py), summed over the window
+        since = analytics_rollups.window_start(time_range)
+        stats = await database.run_sync(db, analytics_rollups.totals, scope_user_id, since)
+
+        def stat(metric):
+            return stats.get(metric, (0, 0.0))
             
         # --- 1. KPIs ---
-        total_quizzes = quiz_query.count()
-        total_memes = meme_query.count()
-        total_mcqs = mcq_query.count()
+        total_quizzes, score_sum = stat(analytics_rollups.QUIZZES)
+        total_memes = stat(analytics_rollups.MEMES)[0]
+        total_mcqs = stat(analytics_rollups.MCQS)[0]
         
         # Calculate Avg Score & Time
-        quiz_stats = quiz_query.with_entities(
-            func.avg(models.QuizSession.score_percentage),
-            func.avg(models.QuizSession.time_taken_seconds),
-            func.sum(models.QuizSession.time_taken_seconds)
-        ).first()
-        
-        avg_score = round(quiz_stats[0] or 0, 1)
-        total_time_spent = round((quiz_stats[2] or 0) / 60, 1) # in minutes
+        avg_score = round(score_sum / total_quizzes, 1) if total_quizzes else 0
+        total_time_spent = round(stat(analytics_rollups.QUIZ_TIME)[1] / 60, 1) # in minutes
         
         # --- MCQ Analytics ---
-        difficulty_stats = mcq_query.with_entities(
-            models.MCQGeneration.difficulty,
-            func.count(models.MCQGeneration.id)
-        ).group_by(models.MCQGeneration.difficulty).all()
-        
-        difficulty_dist = {str(stat[0]): stat[1] for stat in difficulty_stats}
+        difficulty_dist = {
+            metric[len(analytics_rollups.DIFFICULTY):]: count
+            for metric, (count, _) in stats.items()
+            if metric.startswith(analytics_rollups.DIFFICULTY)
+        }
 
         # --- 2. LEADERBOARDS (Global Only) ---
         leaderboard = []
         memeboard = []
         mcqboard = []
         
-        if not scope_user_email: # Only calculate leaderboards in global mode
-            # Quiz Leaderboard (Top Scorers)
-            top_scorers = db.query(
-                models.User.full_name,
-                models.User.email,
-                models.User.profile_picture,
-                func.avg(models.QuizSession.score_percentage).label('avg_score'),
-                func.count(models.QuizSession.id).label('quizzes_taken')
-            ).join(models.QuizSession).group_by(models.User.id).order_by(desc('avg_score')).limit(5).all()
-            
-            leaderboard = [{
-                "name": u.full_name or u.email.split('@')[0],
-                "avatar": u.profile_picture,
-                "score": round(u.avg_score or 0, 1),
-                "quizzes": u.quizzes_taken
-            } for u in top_scorers]
-            
-            # Meme Leaderboard (Top Creators)
-            top_creators = db.query(
-                models.User.full_name,
-                models.User.email,
-                models.User.profile_picture,
-                func.count(models.MemeGeneration.id).label('memes_created')
-            ).join(models.MemeGeneration).group_by(models.User.id).order_by(desc('memes_created')).limit(5).all()
-            
-            memeboard = [{
-                "name": u.full_name or u.email.split('@')[0],
-                "avatar": u.profile_picture,
-                "memes": u.memes_created
-            } for u in top_creators]
-            
-            # MCQ Leaderboard (Top Generators)
-            top_mcq_creators = db.query(
-                models.User.full_name,
-                models.User.email,
-                models.User.profile_picture,
-                func.count(models.MCQGeneration.id).label('mcqs_created')
-            ).join(models.MCQGeneration).group_by(models.User.id).order_by(desc('mcqs_created')).limit(5).all()
-            
-            mcqboard = [{
-                "name": u.full_name or u.email.split('@')[0],
-                "avatar": u.profile_picture,
-                "mcqs": u.mcqs_created
-            } for u in top_mcq_creators]
+        if not scope_user_email: # Only served in global mode, from the shared cache (leaderboards.py)
+            boards = (await leaderboards.get(time_range))["boards"]
+            leaderboard = boards["leaderboard"]
+            memeboard = boards["memeboard"]
+            mcqboard = boards["mcqboard"]
 
         # --- Question Level Analytics ---
-        q_query = db.query(models.MCQQuestion).join(models.MCQGeneration)
-        if scope_user_email:
-             # Re-fetch user to be safe (though we did it above)
-             user_obj = auth.get_user_by_email(db, scope_user_email)
-             if user_obj:
-                q_query = q_query.filter(models.MCQGeneration.user_id == user_obj.id)
-             
-        q_stats = q_query.with_entities(
-            func.sum(models.MCQQuestion.times_correct),
-            func.sum(models.MCQQuestion.times_wrong),
-            func.avg(models.MCQQuestion.average_time_to_answer)
-        ).first()
-        
-        total_correct = q_stats[0] or 0
-        total_wrong = q_stats[1] or 0
-        avg_q_time = round(q_stats[2] or 0, 1)
+        total_correct = stat(analytics_rollups.ANSWERS_CORRECT)[0]
+        total_wrong = stat(analytics_rollups.ANSWERS_WRONG)[0]
+        timed_answers, answer_seconds = stat(analytics_rollups.ANSWER_TIME)
+        avg_q_time = round(answer_seconds / timed_answers, 1) if timed_answers else 0
 
         # --- 3. TOPICS & TRENDS ---
-        top_topics = []
-        topic_counts = {}
-        
-        # Get MCQ topics (Most Searched Content)
-        recent_mcqs = mcq_query.order_by(models.MCQGeneration.created_at.desc()).limit(100).all()
-        for mcq in recent_mcqs:
-            # Clean and normalize topic
-            topic = (mcq.source_content or "").strip()[:40] 
-            if len(topic) > 3:
-                topic_counts[topic] = topic_counts.get(topic, 0) + 1
-            
-        # Get Meme topics
-        recent_memes = meme_query.order_by(models.MemeGeneration.created_at.desc()).limit(100).all()
-        for meme in recent_memes:
-            topic = (meme.topic or "").strip()
-            if len(topic) > 3:
-                topic_counts[topic] = topic_counts.get(topic, 0) + 1
-            
-        sorted_topics = sorted(topic_counts.items(), key=lambda x: x[1], reverse=True)[:8]
-        top_topics = [{"text": k, "value": v} for k, v in sorted_topics]
+        top_topics = await database.run_sync(db, analytics_rollups.top_topics, scope_user_id, since)
         
         # --- 4. SOCIAL FEED (Instagram Style) ---
-        feed = []
-        
-        # Fetch recent Quizzes with User info
-        recent_quizzes = quiz_query.order_by(models.QuizSession.started_at.desc()).limit(15).all()
-        for q in recent_quizzes:
-            user = db.query(models.User).filter(models.User.id == q.user_id).first()
-            user_name = user.full_name if user else "Anonymous"
-            user_pic = user.profile_picture if user else None
-            
-            # Get Likes
-            likes_count = db.query(models.SocialLike).filter(
-                models.SocialLike.content_type == 'quiz',
-                models.SocialLike.content_id == q.id
-            ).count()
-            
-            has_liked = db.query(models.SocialLike).filter(
-                models.SocialLike.user_id == current_user.id,
-                models.SocialLike.content_type == 'quiz',
-                models.SocialLike.content_id == q.id
-            ).first() is not None
-            
-            feed.append({
-                "id": f"quiz_{q.id}",
-                "content_id": q.id,
-                "type": "quiz",
-                "user": user_name,
-                "user_pic": user_pic,
-                "action": "aced a quiz",
-                "content": f"Scored {q.score_percentage}%",
-                "details": f"Completed in {int(q.time_taken_seconds)}s",
-                "time": q.started_at,
-                "likes": likes_count,
-                "has_liked": has_liked
-            })
-            
-        # Fetch recent Memes with User info
-        recent_memes_feed = meme_query.order_by(models.MemeGeneration.created_at.desc()).limit(15).all()
-        for m in recent_memes_feed:
-            user = db.query(models.User).filter(models.User.id == m.user_id).first()
-            user_name = user.full_name if user else "Anonymous"
-            user_pic = user.profile_picture if user else None
-            
-            # Fetch actual meme image
-            first_meme = db.query(models.GeneratedMeme).filter(models.GeneratedMeme.generation_id == m.id).first()
-            image_url = first_meme.meme_url if first_meme else None
-            
-            # Get Likes
-            likes_count = db.query(models.SocialLike).filter(
-                models.SocialLike.content_type == 'meme',
-                models.SocialLike.content_id == m.id
-            ).count()
-            
-            has_liked = db.query(models.SocialLike).filter(
-                models.SocialLike.user_id == current_user.id,
-                models.SocialLike.content_type == 'meme',
-                models.SocialLike.content_id == m.id
-            ).first() is not None
-            
-            feed.append({
-                "id": f"meme_{m.id}",
-                "content_id": m.id,
-                "type": "meme",
-                "user": user_name,
-                "user_pic": user_pic,
-                "action": "cooked up a meme",
-                "content": m.topic,
-                "image_url": image_url,
-                "details": f"Generated {m.num_memes} variants",
-                "time": m.created_at,
-                "likes": likes_count,
-                "has_liked": has_liked
-            })
-            
-        # Sort feed by time
-        feed.sort(key=lambda x: x["time"], reverse=True)
-        feed = feed[:30] # Keep top 30
+        def read_feed(db):
+            feed_items = social_feed.page(
+                db, limit=30, user_id=scope_user_id, content_types=("quiz", "meme"),
+                since=datetime.combine(since, datetime.min.time()) if since else None
+            )
+            liked = social_feed.liked_keys(db, current_user, [(i.content_type, i.content_id) for i in feed_items])
+            feed = []
+            for item in feed_items:
+                card = social_feed.to_dict(item, liked)
+                card.pop("questions_preview", None)
+                feed.append(card)
+            return feed
+
+        feed = await database.run_sync(db, read_feed)
         
         return {
             "kpis": {
@@ -2360,6 +2503,37 @@ async def get_analytics_dashboard(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/leaderboard/rank")
+async def get_leaderboard_rank(
+    time_range: str = "all",
+    current_user: models.User = Depends(get_current_user_async),
+    db=Depends(database.get_async_db)
+):
+    """
+    Current user's rank on each global leaderboard, from the cached snapshot.
+    rank is None when the user is not ranked in the snapshot (no activity in
+    the window, or activity newer than the snapshot); value is always current.
+    """
+    if time_range not in analytics_rollups.TIME_RANGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid time_range. Use one of: {', '.join(analytics_rollups.TIME_RANGES)}"
+        )
+    snapshot = await leaderboards.get(time_range)
+    values = await database.run_sync(db, leaderboards.user_values, current_user.id, time_range)
+    return {
+        "time_range": time_range,
+        "computed_at": snapshot["computed_at"],
+        "ranks": {
+            board: {
+                "rank": leaderboards.rank(snapshot, board, current_user.id),
+                "value": value,
+                "out_of": leaderboards.ranked_users(snapshot, board)
+            }
+            for board, value in values.items()
+        }
+    }
+
 @app.get("/api/analytics/users")
 async def get_analytics_users(
     current_user: models.User = Depends(get_current_user),
@@ -2505,8 +2679,7 @@ class FeedbackCreate(BaseModel):
 async def submit_feedback(
     feedback_data: FeedbackCreate,
     request: Request,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user_optional)
+    current_user: models.User = Depends(get_current_user_optional_detached)
 ):
     """Submit feedback (works for both guests and logged-in users)"""
     
@@ -2543,14 +2716,15 @@ async def submit_feedback(
         user_agent=request.headers.get("user-agent")
     )
     
-    db.add(feedback)
-    db.commit()
-    db.refresh(feedback)
+    def save(db: Session) -> int:
+        db.add(feedback)
+        db.flush()
+        return feedback.id
     
     return {
         "success": True,
         "message": "Thank you for your feedback!",
-        "feedback_id": feedback.id
+        "feedback_id": await db_writer.write(save)
     }
 
 @app.get("/api/feedback/list")
@@ -0,0 +1,154 @@
+"""
+Map-reduce MCQ generation for long documents.
+
+Instead of keeping only the first few thousand characters of the source,
+long texts are split into token-bounded, overlapping chunks. Each chunk is
+given a share of the requested questions, the chunk generations run
+concurrently under a semaphore, and the results are merged and deduplicated.
+"""
+import asyncio
+import os
+import re
+from collections import Counter
+from typing import Awaitable, Callable, List, Tuple
+
+# Rough size of one chunk in model tokens (~4 chars / 0.75 words per token)
+CHUNK_TOKENS = int(os.environ.get("MCQ_CHUNK_TOKENS", "750"))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("MCQ_CHUNK_OVERLAP_TOKENS", "100"))
+CHUNK_CONCURRENCY = int(os.environ.get("MCQ_CHUNK_CONCURRENCY", "4"))
+
+CHARS_PER_TOKEN = 4
+WORDS_PER_TOKEN = 0.75
+
+ChunkGenerator = Callable[[str, int], Awaitable[Tuple[List[dict], str]]]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN
+
+
+def chunk_char_budget() -> int:
+    """Max characters of source text sent in a single prompt"""
+    return CHUNK_TOKENS * CHARS_PER_TOKEN
+
+
+def needs_chunking(text: str) -> bool:
+    return estimate_tokens(text) > CHUNK_TOKENS
+
+
+def split_into_chunks(text: str, max_tokens: int = None, overlap_tokens: int = None) -> List[str]:
+    """Split text into overlapping windows of words, each within the token budget"""
+    max_tokens = max_tokens or CHUNK_TOKENS
+    overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+
+    words = (text or "").split()
+    max_words = max(1, int(max_tokens * WORDS_PER_TOKEN))
+    overlap_words = min(int(overlap_tokens * WORDS_PER_TOKEN), max_words // 2)
+    stride = max_words - overlap_words
+
+    chunks = []
+    for start in range(0, len(words), stride):
+        chunk_words = words[start:start + max_words]
+        # Very long "words" (URLs, base64) can still blow the budget - hard cap by chars
+        chunks.append(" ".join(chunk_words)[:max_tokens * CHARS_PER_TOKEN])
+        if start + max_words >= len(words):
+            break
+    return chunks
+
+
+def allocate_questions(num_questions: int, chunks: List[str]) -> List[int]:
+    """
+    Give each chunk a share of num_questions proportional to its length
+    (largest-remainder rounding). With fewer questions than chunks the
+    questions are spread evenly across the document.
+    """
+    n = len(chunks)
+    if n == 0 or num_questions <= 0:
+        return [0] * n
+
+    if num_questions < n:
+        shares = [0] * n
+        step = n / num_questions
+        for i in range(num_questions):
+            shares[int(i * step)] += 1
+        return shares
+
+    sizes = [max(len(c), 1) for c in chunks]
+    total = sum(sizes)
+    exact = [num_questions * s / total for s in sizes]
+    shares = [max(1, int(e)) for e in exact]
+    # Hand out (or take back) the rounding difference by largest remainder
+    diff = num_questions - sum(shares)
+    order = sorted(range(n), key=lambda i: exact[i] - int(exact[i]), reverse=diff > 0)
+    i = 0
+    while diff != 0 and order:
+        idx = order[i % n]
+        if diff > 0:
+            shares[idx] += 1
+            diff -= 1
+        elif shares[idx] > 1:
+            shares[idx] -= 1
+            diff += 1
+        i += 1
+    return shares
+
+
+def _question_fingerprint(q: dict) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", str(q.get("question", "")).lower()).strip()
+
+
+def _is_near_duplicate(a: str, b: str, threshold: float = 0.8) -> bool:
+    wa, wb = set(a.split()), set(b.split())
+    if not wa or not wb:
+        return a == b
+    return len(wa & wb) / len(wa | wb) >= threshold
+
+
+def merge_questions(results: List[List[dict]], limit: int) -> List[dict]:
+    """Interleave per-chunk results (keeps document coverage) and drop duplicates"""
+    merged, seen = [], []
+    longest = max((len(r) for r in results), default=0)
+    for i in range(longest):
+        for questions in results:
+            if i >= len(questions) or len(merged) >= limit:
+                continue
+            q = questions[i]
+            fp = _question_fingerprint(q)
+            if not fp or any(_is_near_duplicate(fp, s) for s in seen):
+                continue
+            seen.append(fp)
+            merged.append(q)
+    return merged
+
+
+async def generate_chunked(text: str, num_questions: int, generate_chunk: ChunkGenerator,
+                           concurrency: int = None) -> Tuple[List[dict], str]:
+    """Run generate_chunk(chunk_text, n) over every chunk concurrently and merge the results"""
+    chunks = split_into_chunks(text)
+    shares = allocate_questions(num_questions, chunks)
+    semaphore = asyncio.Semaphore(concurrency or CHUNK_CONCURRENCY)
+
+    async def run(chunk: str, n: int):
+        async with semaphore:
+            return await generate_chunk(chunk, n)
+
+    jobs = [(chunk, n) for chunk, n in zip(chunks, shares) if n > 0]
+    print(f"Chunked MCQ generation: {len(chunks)} chunks, {len(jobs)} with questions")
+    outcomes = await asyncio.gather(*(run(c, n) for c, n in jobs), return_exceptions=True)
+
+    results, used_models, errors = [], [], []
+    for outcome in outcomes:
+        if isinstance(outcome, Exception):
+            errors.append(outcome)
+            continue
+        questions, model = outcome
+        results.append(questions)
+        used_models.append(model)
+
+    if not results and errors:
+        raise errors[0]
+    if errors:
+        print(f"Chunked MCQ generation: {len(errors)} chunk(s) failed: {errors[0]}")
+
+    used_model = Counter(used_models).most_common(1)[0][0] if used_models else "unknown"
+    return merge_questions(results, num_questions), used_model
@@ -0,0 +1,106 @@
+"""
+Incremental parsing of streamed LLM output for /api/generate-mcqs/stream.
+
+The model streams a document shaped like { "questions": [ {...}, {...} ] }
+(optionally wrapped in markdown fences). QuestionStreamParser is fed raw
+text deltas and returns each question object as soon as its closing brace
+arrives, so it can be persisted and pushed to the client immediately.
+"""
+import json
+from typing import List
+
+
+class QuestionStreamParser:
+    """
+    Emits every JSON object found directly inside the questions array: the
+    value of a "questions" key, or a bare top-level array. Brackets in prose
+    around the JSON (e.g. "Here are [3] questions") do not count.
+    """
+
+    def __init__(self):
+        self._stack: List[str] = []   # open brackets: '{' or '['
+        self._in_string = False
+        self._escape = False
+        self._capture: List[str] = []  # chars of the object currently being captured
+        self._capture_depth = None     # stack depth at which the captured object opened
+        self._array_depth = None       # stack depth of the questions array
+        self._array_items = 0          # objects captured from it so far
+        self._done = False             # questions array closed
+        self._string: List[str] = []   # chars of the string being read
+        self._last_string = None
+        self._key = None               # object key awaiting its value
+        self.errors = 0
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Consume a text delta and return any objects completed by it"""
+        completed = []
+        for ch in chunk:
+            if self._capture_depth is not None:
+                self._capture.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._string.append(ch)
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = "".join(self._string)
+                else:
+                    self._string.append(ch)
+                continue
+
+            key, self._key = self._key, None
+            if ch == '"':
+                # Strings only count once we are inside the JSON document
+                if self._stack:
+                    self._in_string = True
+                    self._string = []
+                    self._last_string = None
+            elif ch == ":" and self._stack:
+                self._key = self._last_string
+            elif ch in " \t\r\n":
+                self._key = key
+            elif ch in "{[":
+                self._stack.append(ch)
+                depth = len(self._stack)
+                if (ch == "[" and self._array_depth is None and not self._done
+                        and (depth == 1 or key == "questions")):
+                    self._array_depth = depth
+                    self._array_items = 0
+                elif (ch == "{" and self._capture_depth is None
+                        and self._array_depth is not None and depth == self._array_depth + 1):
+                    self._capture_depth = depth
+                    self._capture = ["{"]
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                depth = len(self._stack)
+                self._stack.pop()
+                if ch == "}" and depth == self._capture_depth:
+                    obj = self._decode("".join(self._capture))
+                    if obj is not None:
+                        completed.append(obj)
+                    self._array_items += 1
+                    self._capture = []
+                    self._capture_depth = None
+                elif ch == "]" and depth == self._array_depth:
+                    # An empty top-level "array" was prose; a filled one is the answer
+                    self._array_depth = None
+                    self._done = self._array_items > 0
+        return completed
+
+    def _decode(self, raw: str):
+        try:
+            obj = json.loads(raw)
+        except json.JSONDecodeError:
+            print(f"Skipping malformed streamed question: {raw[:200]}")
+            self.errors += 1
+            return None
+        return obj if isinstance(obj, dict) else None
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,193 @@
+"""
+Health-scored model router with per-model circuit breakers.
+
+Every Groq call reports its outcome here. Each model keeps a rolling
+success rate and latency (EWMA) and a circuit state:
+
+  closed     - healthy, eligible for traffic
+  open       - rate limited or failing; skipped until its cool-down ends
+               (Retry-After is honoured for 429s)
+  half_open  - cool-down over; exactly one probe call is let through and
+               its outcome closes or re-opens the circuit
+
+Only rate limits (429), server errors (5xx), timeouts and connection
+errors count against a model. Other 4xx responses are the caller's fault
+(a context that is too long, a bad request) and leave its health alone.
+
+Callers ask for the best available model instead of walking a fixed list
+and sleeping on 429s.
+"""
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURE_THRESHOLD = int(os.environ.get("LLM_CIRCUIT_FAILURE_THRESHOLD", "3"))
+BASE_COOLDOWN_SECONDS = float(os.environ.get("LLM_CIRCUIT_COOLDOWN_SECONDS", "10"))
+MAX_COOLDOWN_SECONDS = float(os.environ.get("LLM_CIRCUIT_MAX_COOLDOWN_SECONDS", "300"))
+
+EWMA_ALPHA = 0.2
+LATENCY_PRIOR_SECONDS = 2.0   # assumed latency for models we have not timed yet
+RANK_PENALTY = 0.1            # keeps the configured (quality) preference order unless a model degrades
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After header -> seconds (accepts delta-seconds or an HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_model_fault(status_code: Optional[int]) -> bool:
+    """Whether a failed call counts against the model (None = timeout or connection error)"""
+    return status_code is None or status_code == 429 or status_code >= 500
+
+
+class ModelHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.consecutive_failures = 0
+        self.consecutive_opens = 0
+        self.probe_in_flight = False
+        self.success_rate = 1.0
+        self.latency = LATENCY_PRIOR_SECONDS
+        self.calls = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.last_error: Optional[str] = None
+
+    def score(self, rank: int) -> float:
+        return self.success_rate / (1.0 + self.latency / 30.0) - rank * RANK_PENALTY
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            "model": self.name,
+            "state": self.state,
+            "retry_in_seconds": round(max(0.0, self.open_until - now), 1) if self.state == OPEN else 0,
+            "success_rate": round(self.success_rate, 3),
+            "latency_seconds": round(self.latency, 3),
+            "consecutive_failures": self.consecutive_failures,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "last_error": self.last_error
+        }
+
+
+class ModelRouter:
+    def __init__(self):
+        self._models: Dict[str, ModelHealth] = {}
+        self._lock = threading.Lock()
+
+    def _health(self, model: str) -> ModelHealth:
+        health = self._models.get(model)
+        if health is None:
+            health = self._models[model] = ModelHealth(model)
+        return health
+
+    def acquire(self, candidates: List[str], exclude: Iterable[str] = ()) -> Optional[str]:
+        """Pick the best model that can take a call right now (None if all are open)"""
+        now = time.monotonic()
+        exclude = set(exclude)
+        with self._lock:
+            best, best_score = None, None
+            for rank, model in enumerate(candidates):
+                if model in exclude:
+                    continue
+                health = self._health(model)
+                if health.state == OPEN and now >= health.open_until:
+                    health.state = HALF_OPEN
+                    health.probe_in_flight = False
+                if health.state == OPEN or (health.state == HALF_OPEN and health.probe_in_flight):
+                    continue
+                if health.state == HALF_OPEN:
+                    # Probe recovered models first so preferred models win their traffic back
+                    health.probe_in_flight = True
+                    return health.name
+                score = health.score(rank)
+                if best_score is None or score > best_score:
+                    best, best_score = health, score
+            return best.name if best else None
+
+    def seconds_until_available(self, candidates: List[str]) -> Optional[float]:
+        """Time until the first open circuit among candidates cools down"""
+        now = time.monotonic()
+        with self._lock:
+            waits = [
+                max(0.0, self._health(m).open_until - now)
+                for m in candidates
+                if self._health(m).state == OPEN
+            ]
+        return min(waits) if waits else None
+
+    def record_success(self, model: str, latency: float):
+        with self._lock:
+            health = self._health(model)
+            health.calls += 1
+            health.success_rate = (1 - EWMA_ALPHA) * health.success_rate + EWMA_ALPHA
+            health.latency = (1 - EWMA_ALPHA) * health.latency + EWMA_ALPHA * latency
+            if health.state == HALF_OPEN:
+                # Probe succeeded - start the model's record afresh
+                health.success_rate = 1.0
+            health.consecutive_failures = 0
+            health.consecutive_opens = 0
+            health.probe_in_flight = False
+            health.state = CLOSED
+
+    def record_failure(self, model: str, status_code: Optional[int] = None,
+                       retry_after: Optional[float] = None, error: Optional[str] = None):
+        with self._lock:
+            health = self._health(model)
+            if not is_model_fault(status_code):
+                # The request was bad, not the model: give back a probe slot, change nothing else
+                health.probe_in_flight = False
+                return
+            health.calls += 1
+            health.failures += 1
+            health.success_rate = (1 - EWMA_ALPHA) * health.success_rate
+            health.consecutive_failures += 1
+            health.last_error = error or (f"HTTP {status_code}" if status_code else None)
+
+            if status_code == 429:
+                health.rate_limited += 1
+                self._open(health, retry_after)
+            elif health.state == HALF_OPEN or health.consecutive_failures >= FAILURE_THRESHOLD:
+                self._open(health, retry_after)
+
+    def release(self, model: str):
+        """Give back a half-open probe slot without recording an outcome (e.g. caller cancelled)"""
+        with self._lock:
+            self._health(model).probe_in_flight = False
+
+    def _open(self, health: ModelHealth, retry_after: Optional[float]):
+        if retry_after is None:
+            retry_after = min(MAX_COOLDOWN_SECONDS, BASE_COOLDOWN_SECONDS * (2 ** health.consecutive_opens))
+        health.consecutive_opens += 1
+        health.state = OPEN
+        health.probe_in_flight = False
+        health.open_until = time.monotonic() + retry_after
+        print(f"Circuit open for {health.name} ({health.last_error}); retry in {retry_after:.1f}s")
+
+    def snapshot(self, candidates: Optional[List[str]] = None) -> List[dict]:
+        now = time.monotonic()
+        with self._lock:
+            names = candidates or list(self._models)
+            return [self._health(m).to_dict(now) for m in names]
+
+
+# Process-wide router shared by all LLM calls
+router = ModelRouter()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Text, JSON, Float, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Date, Text, JSON, Float, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -118,6 +118,7 @@ class MCQGeneration(Base):
     # Engagement Tracking
     view_count = Column(Integer, default=0)
     share_count = Column(Integer, default=0)
+    trending_score = Column(Float, default=0, server_default="0", nullable=False)  # decayed, see trending.py
     save_count = Column(Integer, default=0)
     quiz_completion_count = Column(Integer, default=0)
     
@@ -131,6 +132,12 @@ class MCQGeneration(Base):
     questions = relationship("MCQQuestion", back_populates="generation", cascade="all, delete-orphan")
     quiz_sessions = relationship("QuizSession", back_populates="mcq_generation")
 
+    # Windowed per-user queries are index range scans
+    __table_args__ = (
+        Index('ix_mcq_generations_user_created', 'user_id', 'created_at'),
+        Index('ix_mcq_generations_trending', 'trending_score'),
+    )
+
 class MCQQuestion(Base):
     """Individual questions - normalized for better analytics"""
     __tablename__ = "mcq_questions"
@@ -196,6 +203,11 @@ class QuizSession(Base):
     mcq_generation = relationship("MCQGeneration", back_populates="quiz_sessions")
     answers = relationship("QuestionAnswer", back_populates="quiz_session")
 
+    # Windowed per-user queries are index range scans
+    __table_args__ = (
+        Index('ix_quiz_sessions_user_started', 'user_id', 'started_at'),
+    )
+
 class QuestionAnswer(Base):
     """Track each individual answer"""
     __tablename__ = "question_answers"
@@ -249,6 +261,7 @@ class MemeGeneration(Base):
     # Engagement Tracking
     view_count = Column(Integer, default=0)
     share_count = Column(Integer, default=0)
+    trending_score = Column(Float, default=0, server_default="0", nullable=False)  # decayed, see trending.py
     save_count = Column(Integer, default=0)
     
     # Metadata
@@ -260,6 +273,12 @@ class MemeGeneration(Base):
     user = relationship("User", back_populates="meme_generations")
     memes = relationship("GeneratedMeme", back_populates="generation")
 
+    # Windowed per-user queries are index range scans
+    __table_args__ = (
+        Index('ix_meme_generations_user_created', 'user_id', 'created_at'),
+        Index('ix_meme_generations_trending', 'trending_score'),
+    )
+
 class GeneratedMeme(Base):
     """Individual memes"""
     __tablename__ = "generated_memes"
@@ -282,6 +301,88 @@ class GeneratedMeme(Base):
     # Relationships
     generation = relationship("MemeGeneration", back_populates="memes")
 
+class GenerationCacheEntry(Base):
+    """Persistent tier of the MCQ generation cache (see generation_cache.py)"""
+    __tablename__ = "generation_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)  # sha256 of normalized inputs
+    model_name = Column(String(100), nullable=True)
+    questions_data = Column(JSON, nullable=False)
+    size_bytes = Column(Integer, default=0)
+
+    # Eviction bookkeeping
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_hit_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class FeedItem(Base):
+    """Materialized social feed entry, written with the content it describes (see social_feed.py)"""
+    __tablename__ = "feed_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_type = Column(String(20), nullable=False)  # 'quiz', 'meme' or 'mcq'
+    content_id = Column(Integer, nullable=False)  # ID of QuizSession, MemeGeneration or MCQGeneration
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+
+    # Precomputed card: user name/avatar, action, score text, preview data
+    summary = Column(JSON, nullable=False)
+
+    # Denormalized social counters
+    likes_count = Column(Integer, default=0, nullable=False)
+    comments_count = Column(Integer, default=0, nullable=False)
+
+    created_at = Column(DateTime, nullable=False)  # naive UTC; feed order
+
+    # Author name/avatar are read through this, not from summary, so profile edits show up
+    user = relationship("User")
+
+    __table_args__ = (
+        UniqueConstraint('content_type', 'content_id', name='unique_feed_content'),
+        Index('ix_feed_items_created_id', 'created_at', 'id'),
+        Index('ix_feed_items_user_created_id', 'user_id', 'created_at', 'id'),
+    )
+
+class UserDailyStat(Base):
+    """Per-user daily rollup of dashboard metrics (see analytics_rollups.py)"""
+    __tablename__ = "user_daily_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    metric = Column(String(150), nullable=False)  # e.g. 'quizzes', 'difficulty:easy', 'topic:...'
+    count = Column(Integer, default=0, nullable=False)
+    total = Column(Float, default=0, nullable=False)  # summed value (score, seconds) where relevant
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'metric', 'day', name='unique_user_daily_metric'),
+        Index('ix_user_daily_stats_metric_day', 'metric', 'day'),
+    )
+
+class GlobalDailyStat(Base):
+    """Site-wide daily rollup of dashboard metrics, including anonymous activity"""
+    __tablename__ = "global_daily_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False)
+    metric = Column(String(150), nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+    total = Column(Float, default=0, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('metric', 'day', name='unique_global_daily_metric'),
+    )
+
+class LeaderboardSnapshot(Base):
+    """Shared tier of the leaderboard cache, one row per time_range (see leaderboards.py)"""
+    __tablename__ = "leaderboard_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    time_range = Column(String(20), unique=True, nullable=False)
+    data = Column(JSON, nullable=False)  # top entries + sorted value distribution per board
+    computed_at = Column(DateTime, nullable=False)  # naive UTC
+
 # ==================== USER JOURNEY & EVENT TRACKING ====================
 
 class UserEvent(Base):
@@ -379,6 +480,7 @@ class SocialLike(Base):
     # Ensure unique like per user per content
     __table_args__ = (
         UniqueConstraint('user_id', 'content_type', 'content_id', name='unique_user_like'),
+        Index('ix_social_likes_content', 'content_type', 'content_id'),
     )
 
 class SocialComment(Base):
@@ -402,6 +504,10 @@ class SocialComment(Base):
     utm_medium = Column(String(100), nullable=True)
     utm_campaign = Column(String(100), nullable=True)
 
+    __table_args__ = (
+        Index('ix_social_comments_content', 'content_type', 'content_id'),
+    )
+
 # ==================== BOOKMARKS ====================
 
 class Bookmark(Base):
@@ -0,0 +1,121 @@
+"""
+PDF text extraction off the event loop.
+
+pypdf is pure Python and CPU bound, so pages are extracted in a process
+pool. Large documents are split into page batches that run in parallel
+across cores, and results come back page by page (in order) so callers
+can stream them to the client as they are ready.
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+
+# 0 = use a thread instead of processes (for hosts that forbid subprocesses)
+PDF_EXTRACT_WORKERS = int(os.environ.get("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "8"))
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "500"))
+
+_executor: Optional[Executor] = None
+
+
+class PDFExtractError(Exception):
+    pass
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        if PDF_EXTRACT_WORKERS > 0:
+            # spawn: never fork a process that is running an event loop and threads
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-extract")
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+# --- worker-side functions (must be top level so they can be pickled) ---
+
+def _count_pages(file_content: bytes) -> int:
+    return len(PdfReader(io.BytesIO(file_content)).pages)
+
+
+def _extract_pages(file_content: bytes, page_numbers: List[int]) -> List[Tuple[int, str]]:
+    reader = PdfReader(io.BytesIO(file_content))
+    return [(n, reader.pages[n - 1].extract_text() or "") for n in page_numbers]
+
+
+# --- helpers ---
+
+def parse_page_range(spec: Optional[str], total_pages: int) -> List[int]:
+    """'1-5,8,10-' -> [1, 2, 3, 4, 5, 8, 10, ..., total] (1-based, in order, clipped)"""
+    if not spec:
+        return list(range(1, total_pages + 1))
+    pages = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                start, end = part.split("-", 1)
+                first = int(start) if start.strip() else 1
+                last = int(end) if end.strip() else total_pages
+            else:
+                first = last = int(part)
+        except ValueError:
+            raise PDFExtractError(f"Invalid page range: {spec}")
+        pages.extend(range(max(first, 1), min(last, total_pages) + 1))
+    return sorted(set(pages))
+
+
+async def extract_pages(
+    file_content: bytes,
+    page_range: Optional[str] = None,
+    max_pages: Optional[int] = None
+) -> AsyncIterator[Tuple[int, str]]:
+    """Yield (page_number, text) in page order while later batches are still extracting"""
+    loop = asyncio.get_running_loop()
+    executor = get_executor()
+    try:
+        total = await loop.run_in_executor(executor, _count_pages, file_content)
+    except Exception as e:
+        raise PDFExtractError(str(e))
+
+    pages = parse_page_range(page_range, total)
+    limit = min(max_pages or PDF_MAX_PAGES, PDF_MAX_PAGES)
+    pages = pages[:limit]
+
+    batches = [pages[i:i + PDF_PAGES_PER_TASK] for i in range(0, len(pages), PDF_PAGES_PER_TASK)]
+    futures = [loop.run_in_executor(executor, _extract_pages, file_content, batch) for batch in batches]
+    try:
+        for future in futures:
+            try:
+                results = await future
+            except Exception as e:
+                raise PDFExtractError(str(e))
+            for page_number, text in results:
+                yield page_number, text
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+async def extract_text(file_content: bytes, page_range: Optional[str] = None,
+                       max_pages: Optional[int] = None) -> str:
+    parts = [text async for _, text in extract_pages(file_content, page_range, max_pages)]
+    return "\n".join(parts)
@@ -0,0 +1,51 @@
+"""
+Periodic maintenance jobs (counter reconciliation, rollup compaction, ...).
+
+Each job is a sync function taking a fresh DB session; it runs in the
+threadpool so it never blocks the event loop. Jobs are started from the
+app's startup event and cancelled on shutdown.
+"""
+import asyncio
+from typing import Callable, Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+import database
+
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+def run_with_session(job: Callable[[Session], object]):
+    db = database.SessionLocal()
+    try:
+        return job(db)
+    finally:
+        db.close()
+
+
+def start(name: str, interval_seconds: float, job: Callable[[Session], object],
+          initial_delay: Optional[float] = None):
+    """Run job(db) every interval_seconds (<= 0 disables the job)"""
+    if interval_seconds <= 0 or name in _tasks:
+        return
+
+    async def loop():
+        await asyncio.sleep(interval_seconds if initial_delay is None else initial_delay)
+        while True:
+            try:
+                await run_in_threadpool(run_with_session, job)
+            except Exception as e:
+                print(f"Periodic job {name} failed: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    _tasks[name] = asyncio.get_running_loop().create_task(loop())
+    print(f"Periodic job {name} scheduled every {interval_seconds:.0f}s")
+
+
+async def stop_all():
+    tasks = list(_tasks.values())
+    _tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
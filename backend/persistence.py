@@ -0,0 +1,59 @@
+"""
+Bulk insert helpers for generation children (MCQ questions, generated memes).
+
+Children go in as one multi-row INSERT ... RETURNING id instead of one ORM
+add + refresh per row. Databases without RETURNING (SQLite < 3.35, older
+MySQL) get a chunked INSERT ... VALUES (...), (...) and one query reading
+the ids back. So does SQLite: it has RETURNING, but not in a guaranteed
+row order, and SQLAlchemy would fall back to one INSERT per row to keep
+the ids matched to their rows.
+"""
+from collections import defaultdict
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.sql.compiler import InsertmanyvaluesSentinelOpts
+from sqlalchemy.orm import Session
+
+# Stay under SQLITE_MAX_VARIABLE_NUMBER on old SQLite builds (999)
+MAX_BIND_PARAMS = 900
+
+
+def _batched_returning(dialect) -> bool:
+    """True when an ordered executemany RETURNING goes out as multi-row INSERTs (PostgreSQL)"""
+    return bool(
+        dialect.insert_executemany_returning_sort_by_parameter_order
+        and dialect.insertmanyvalues_implicit_sentinel & InsertmanyvaluesSentinelOpts.AUTOINCREMENT
+    )
+
+
+def insert_children(db: Session, model, rows: List[dict], parent_key: str = "generation_id",
+                    order_by=None) -> List[int]:
+    """
+    Insert child rows of newly created parents in the caller's transaction and return
+    their ids in row order. Without RETURNING, ids are read back per parent ordered by
+    order_by (default: id), which must follow the row order within each parent.
+    """
+    if not rows:
+        return []
+    if _batched_returning(db.get_bind().dialect):
+        result = db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+        return list(result.scalars())
+
+    chunk = max(1, MAX_BIND_PARAMS // len(rows[0]))
+    for i in range(0, len(rows), chunk):
+        db.execute(insert(model).values(rows[i:i + chunk]))
+
+    parent_column = getattr(model, parent_key)
+    parent_ids = list(dict.fromkeys(row[parent_key] for row in rows))
+    ids_by_parent = defaultdict(list)
+    for child_id, parent_id in db.query(model.id, parent_column).filter(
+        parent_column.in_(parent_ids)
+    ).order_by(parent_column, order_by if order_by is not None else model.id):
+        ids_by_parent[parent_id].append(child_id)
+    return [ids_by_parent[row[parent_key]].pop(0) for row in rows]
+
+
+def with_ids(rows: List[dict], ids: List[int]) -> List[dict]:
+    """Copies of rows with their new ids, for code that reads rows back as objects"""
+    return [{**row, "id": row_id} for row, row_id in zip(rows, ids)]
@@ -98,10 +98,13 @@ class UserEventCreate(BaseModel):
     time_on_page: Optional[float] = None
     metadata: Optional[Dict[str, Any]] = None
 
+class UserEventBatch(BaseModel):
+    events: List[UserEventCreate]
+
 # --- Session Tracking Schema ---
 class UserSessionCreate(BaseModel):
     session_id: str
-    started_at: datetime
+    started_at: Optional[datetime] = None  # omitted by the end-of-session beacon
     ended_at: Optional[datetime] = None
     duration_seconds: Optional[float] = None
     is_active: bool = True
@@ -0,0 +1,400 @@
+"""
+Materialized social feed (feed_items table).
+
+Feed rows are written in the same transaction as the quiz session, meme
+generation or MCQ generation they describe (fan-in on write). Each row
+holds the whole card precomputed in `summary` plus denormalized like and
+comment counters, so a feed page is one indexed range scan over
+(created_at, id) and a has_liked lookup. The author's current name and
+avatar are joined in at read time rather than trusted from the summary,
+which would go stale when they edit their profile.
+
+Only content from logged in users is published to the feed.
+
+Fill the table from existing rows, or repair counter drift, with:
+    python backend/social_feed.py backfill
+    python backend/social_feed.py reconcile
+"""
+import base64
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, func, or_, select, tuple_, update
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+import db_writer
+import models
+
+FEED_PAGE_SIZE = 40
+FEED_MAX_PAGE_SIZE = 100
+BACKFILL_BATCH_SIZE = 500
+RECONCILE_BATCH_SIZE = 1000
+RECONCILE_INTERVAL_SECONDS = int(os.environ.get("FEED_RECONCILE_INTERVAL_SECONDS", "3600"))
+
+
+class FeedCursorError(ValueError):
+    pass
+
+
+# ==== CARD SUMMARIES ====
+
+def option_text(question, letter, default=None) -> str:
+    """Map an option letter to its text, falling back to 'Option X' when the option is empty"""
+    option_map = {
+        'A': question.option_a or '',
+        'B': question.option_b or '',
+        'C': question.option_c or '',
+        'D': question.option_d or ''
+    }
+    text = option_map.get(letter, default)
+    if not text or not str(text).strip():
+        text = f"Option {letter}"
+    return text
+
+
+def question_options(question) -> dict:
+    return {
+        "A": question.option_a or "Option A",
+        "B": question.option_b or "Option B",
+        "C": question.option_c or "Option C",
+        "D": question.option_d or "Option D"
+    }
+
+
+def quiz_questions_preview(answers: Iterable) -> list:
+    """ALL answered questions of a quiz (each answer with its question loaded)"""
+    preview = []
+    for ans in answers:
+        question = ans.question
+        if not question:
+            continue
+        # Convert to uppercase for mapping
+        user_answer_letter = ans.user_answer.upper() if isinstance(ans.user_answer, str) else ans.user_answer
+        correct_answer_letter = question.correct_answer.upper() if isinstance(question.correct_answer, str) else question.correct_answer
+        preview.append({
+            "question": question.question_text,
+            "options": question_options(question),
+            "user_answer": option_text(question, user_answer_letter, ans.user_answer), # Keep for backward compatibility if needed
+            "correct_answer": option_text(question, correct_answer_letter, question.correct_answer), # Keep for backward compatibility
+            "user_answer_letter": user_answer_letter,
+            "correct_answer_letter": correct_answer_letter,
+            "is_correct": ans.is_correct,
+            "explanation": question.explanation
+        })
+    return preview
+
+
+def mcq_questions_data(questions: Iterable) -> list:
+    """ALL questions of an MCQ generation with options and correct answers"""
+    data = []
+    for q in questions:
+        correct_answer_letter = q.correct_answer.upper() if isinstance(q.correct_answer, str) else q.correct_answer
+        data.append({
+            "question": q.question_text,
+            "options": question_options(q),
+            "correct_answer": q.correct_answer,
+            "correct_answer_text": option_text(q, correct_answer_letter, q.correct_answer),
+            "explanation": q.explanation
+        })
+    return data
+
+
+def _user_fields(user) -> dict:
+    return {
+        "user": user.full_name if user else "Anonymous",
+        "user_pic": user.profile_picture if user else None
+    }
+
+
+def quiz_summary(quiz, user, answers: Iterable) -> dict:
+    return {
+        "id": f"quiz_{quiz.id}",
+        "content_id": quiz.id,
+        "type": "quiz",
+        **_user_fields(user),
+        "action": "completed a quiz",
+        "content": f"Scored {quiz.score_percentage}% ({quiz.correct_answers}/{quiz.total_questions})",
+        "details": f"Completed in {int(quiz.time_taken_seconds or 0)}s",
+        "questions_preview": quiz_questions_preview(answers)
+    }
+
+
+def meme_summary(generation, user, memes: Iterable) -> dict:
+    first_meme = min(memes, key=lambda meme: meme.id) if memes else None
+    return {
+        "id": f"meme_{generation.id}",
+        "content_id": generation.id,
+        "type": "meme",
+        **_user_fields(user),
+        "action": "cooked up a meme",
+        "content": generation.topic,
+        "image_url": first_meme.meme_url if first_meme else None,
+        "details": f"Generated {generation.num_memes} variants"
+    }
+
+
+def mcq_summary(generation, user, questions: Iterable) -> dict:
+    return {
+        "id": f"mcq_{generation.id}",
+        "content_id": generation.id,
+        "type": "mcq",
+        **_user_fields(user),
+        "action": "generated MCQs",
+        "content": f"{generation.num_questions} {generation.difficulty} questions",
+        "details": f"Category: {generation.category or 'General'}",
+        "questions_data": mcq_questions_data(questions)
+    }
+
+
+# ==== WRITE PATH (call before the caller's commit) ====
+
+def feed_time(value: Optional[datetime] = None) -> datetime:
+    """Feed times are stored as naive UTC so every row compares the same way"""
+    if value is None:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def add_item(db: Session, content_type: str, content_id: int, user_id: int, summary: dict,
+             created_at: Optional[datetime] = None, likes_count: int = 0,
+             comments_count: int = 0) -> models.FeedItem:
+    item = models.FeedItem(
+        content_type=content_type,
+        content_id=content_id,
+        user_id=user_id,
+        summary=summary,
+        likes_count=likes_count,
+        comments_count=comments_count,
+        created_at=feed_time(created_at)
+    )
+    db.add(item)
+    return item
+
+
+def add_quiz(db: Session, quiz: models.QuizSession, user) -> Optional[models.FeedItem]:
+    """Publish a quiz session; its answers must already be flushed"""
+    if not user:
+        return None
+    answers = db.query(models.QuestionAnswer).options(
+        joinedload(models.QuestionAnswer.question)
+    ).filter(
+        models.QuestionAnswer.quiz_session_id == quiz.id
+    ).order_by(models.QuestionAnswer.id).all()
+    return add_item(db, "quiz", quiz.id, user.id, quiz_summary(quiz, user, answers), quiz.started_at)
+
+
+def add_meme(db: Session, generation: models.MemeGeneration, user, memes: list) -> Optional[models.FeedItem]:
+    """memes: GeneratedMeme rows, or GeneratedMeme column dicts with their ids (bulk inserts)"""
+    if not user:
+        return None
+    memes = [SimpleNamespace(**m) if isinstance(m, dict) else m for m in memes]
+    return add_item(db, "meme", generation.id, user.id, meme_summary(generation, user, memes))
+
+
+def add_mcq(db: Session, generation: models.MCQGeneration, user, questions: list) -> Optional[models.FeedItem]:
+    """questions: MCQQuestion rows, or MCQQuestion column dicts (bulk inserts), in order"""
+    if not user:
+        return None
+    questions = [SimpleNamespace(**q) if isinstance(q, dict) else q for q in questions]
+    return add_item(db, "mcq", generation.id, user.id, mcq_summary(generation, user, questions))
+
+
+def bump_counter(db: Session, content_type: str, content_id: int, column: str, delta: int) -> Optional[int]:
+    """
+    Atomic `SET column = column + delta` in the caller's transaction.
+    Returns the new value, or None when the content has no feed item.
+    """
+    counter = getattr(models.FeedItem, column)
+    match = and_(models.FeedItem.content_type == content_type, models.FeedItem.content_id == content_id)
+    if delta:
+        result = db.execute(update(models.FeedItem).where(match).values({column: counter + delta}))
+        if result.rowcount == 0:
+            return None
+    return db.query(counter).filter(match).scalar()
+
+
+def _repair_range(db: Session, first_id: int, last_id: int) -> int:
+    likes = select(func.count(models.SocialLike.id)).where(
+        models.SocialLike.content_type == models.FeedItem.content_type,
+        models.SocialLike.content_id == models.FeedItem.content_id
+    ).scalar_subquery()
+    comments = select(func.count(models.SocialComment.id)).where(
+        models.SocialComment.content_type == models.FeedItem.content_type,
+        models.SocialComment.content_id == models.FeedItem.content_id
+    ).scalar_subquery()
+    result = db.execute(
+        update(models.FeedItem).where(
+            models.FeedItem.id.between(first_id, last_id),
+            or_(models.FeedItem.likes_count != likes, models.FeedItem.comments_count != comments)
+        ).values(likes_count=likes, comments_count=comments).execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def reconcile_counts(db: Session, batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    """Repair counter drift against social_likes / social_comments; returns rows fixed"""
+    repaired, last_id = 0, 0
+    while True:
+        ids = [row[0] for row in db.query(models.FeedItem.id).filter(
+            models.FeedItem.id > last_id
+        ).order_by(models.FeedItem.id).limit(batch_size).all()]
+        if not ids:
+            break
+        # Short transactions per id range (through db_writer) so writers are never blocked for long
+        repaired += db_writer.write_sync(_repair_range, ids[0], ids[-1])
+        last_id = ids[-1]
+    if repaired:
+        print(f"Feed counters: repaired {repaired} drifted items")
+    return repaired
+
+
+# ==== READ PATH ====
+
+def encode_cursor(item: models.FeedItem) -> str:
+    """Opaque cursor for a feed position: (time, type, id)"""
+    raw = json.dumps([item.created_at.isoformat(), item.content_type, item.id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        time_value, _, item_id = json.loads(raw)
+        return datetime.fromisoformat(time_value), int(item_id)
+    except (ValueError, TypeError):
+        raise FeedCursorError("Invalid feed cursor")
+
+
+def page(db: Session, before: Optional[str] = None, after: Optional[str] = None,
+         limit: int = FEED_PAGE_SIZE, user_id: Optional[int] = None,
+         content_types: Optional[Iterable[str]] = None,
+         since: Optional[datetime] = None) -> List[models.FeedItem]:
+    """One feed page, newest first - a range scan on (created_at, id)"""
+    position = tuple_(models.FeedItem.created_at, models.FeedItem.id)
+    query = db.query(models.FeedItem).options(joinedload(models.FeedItem.user))
+    if user_id:
+        query = query.filter(models.FeedItem.user_id == user_id)
+    if content_types:
+        query = query.filter(models.FeedItem.content_type.in_(list(content_types)))
+    if since:
+        query = query.filter(models.FeedItem.created_at >= feed_time(since))
+    if before:
+        query = query.filter(position < tuple_(*decode_cursor(before)))
+    if after:
+        # Items just newer than the cursor, so polling clients only get what changed
+        query = query.filter(position > tuple_(*decode_cursor(after)))
+        items = query.order_by(models.FeedItem.created_at.asc(), models.FeedItem.id.asc()).limit(limit).all()
+        items.reverse()
+        return items
+    return query.order_by(models.FeedItem.created_at.desc(), models.FeedItem.id.desc()).limit(limit).all()
+
+
+def liked_keys(db: Session, user, keys: List[Tuple[str, int]]) -> Set[Tuple[str, int]]:
+    """Which of keys (content_type, content_id) the user has liked - one IN query"""
+    if not user or not keys:
+        return set()
+    by_type = {}
+    for content_type, content_id in keys:
+        by_type.setdefault(content_type, set()).add(content_id)
+    return set(db.query(models.SocialLike.content_type, models.SocialLike.content_id).filter(
+        models.SocialLike.user_id == user.id,
+        or_(*[
+            and_(models.SocialLike.content_type == content_type, models.SocialLike.content_id.in_(ids))
+            for content_type, ids in by_type.items()
+        ])
+    ).all())
+
+
+def to_dict(item: models.FeedItem, liked: Set[Tuple[str, int]]) -> dict:
+    return {
+        **item.summary,
+        **_user_fields(item.user),
+        "time": item.created_at,
+        "cursor": encode_cursor(item),
+        "likes": item.likes_count,
+        "has_liked": (item.content_type, item.content_id) in liked,
+        "comments": item.comments_count
+    }
+
+
+# ==== BACKFILL ====
+
+def _grouped_counts(db: Session, model, content_type: str, ids: List[int]) -> dict:
+    return dict(db.query(model.content_id, func.count(model.id)).filter(
+        model.content_type == content_type,
+        model.content_id.in_(ids)
+    ).group_by(model.content_id).all())
+
+
+def _missing(db: Session, model, content_type: str):
+    """Source rows from logged in users that have no feed item yet"""
+    published = select(models.FeedItem.content_id).where(models.FeedItem.content_type == content_type)
+    return db.query(model).filter(model.user_id != None, model.id.notin_(published))
+
+
+def backfill(db: Session, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Create feed items for existing content; safe to re-run"""
+    sources = [
+        ("quiz", models.QuizSession, [
+            joinedload(models.QuizSession.user),
+            selectinload(models.QuizSession.answers).joinedload(models.QuestionAnswer.question)
+        ]),
+        ("meme", models.MemeGeneration, [
+            joinedload(models.MemeGeneration.user),
+            selectinload(models.MemeGeneration.memes)
+        ]),
+        ("mcq", models.MCQGeneration, [
+            joinedload(models.MCQGeneration.user),
+            selectinload(models.MCQGeneration.questions)
+        ])
+    ]
+    total = 0
+    for content_type, model, options in sources:
+        while True:
+            rows = _missing(db, model, content_type).options(*options).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            likes = _grouped_counts(db, models.SocialLike, content_type, ids)
+            comments = _grouped_counts(db, models.SocialComment, content_type, ids)
+            for row in rows:
+                if content_type == "quiz":
+                    summary = quiz_summary(row, row.user, sorted(row.answers, key=lambda a: a.id))
+                    created_at = row.started_at
+                elif content_type == "meme":
+                    summary = meme_summary(row, row.user, row.memes)
+                    created_at = row.created_at
+                else:
+                    summary = mcq_summary(row, row.user, sorted(row.questions, key=lambda q: q.id))
+                    created_at = row.created_at
+                add_item(db, content_type, row.id, row.user_id, summary, created_at,
+                         likes.get(row.id, 0), comments.get(row.id, 0))
+            db.commit()
+            db.expunge_all()
+            total += len(rows)
+            print(f"Feed backfill: {content_type} +{len(rows)}")
+    return total
+
+
+def is_empty(db: Session) -> bool:
+    return db.query(models.FeedItem.id).first() is None
+
+
+if __name__ == "__main__":
+    commands = {"backfill": backfill, "reconcile": reconcile_counts}
+    if len(sys.argv) != 2 or sys.argv[1] not in commands:
+        print("Usage: python backend/social_feed.py backfill|reconcile")
+        sys.exit(1)
+    import database
+    models.Base.metadata.create_all(bind=database.engine)
+    session = database.SessionLocal()
+    try:
+        print(f"Feed {sys.argv[1]} complete: {commands[sys.argv[1]](session)} items")
+    finally:
+        session.close()
@@ -12,6 +12,24 @@ def print_fail(msg, err=None):
     if err:
         print(f"   Error: {err}")
 
+_local = None
+
+def local_app():
+    """
+    The app in-process on a throwaway SQLite database, for tests that have to
+    look at the database itself. Returns (TestClient, main module).
+    """
+    global _local
+    if _local is None:
+        import os, sys, tempfile
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test_system.db"
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import main, models, database
+        from fastapi.testclient import TestClient
+        models.Base.metadata.create_all(bind=database.engine)
+        _local = (TestClient(main.app), main)
+    return _local
+
 def test_health():
     try:
         res = requests.get(f"{BASE_URL}/")
@@ -129,6 +147,176 @@ def test_database_integrity():
     except Exception as e:
         print_fail("Trending API exception", e)
 
+def test_social_feed_query_count():
+    print("\n--- Testing Social Feed Query Count ---")
+    try:
+        from datetime import datetime, timedelta
+        from sqlalchemy import event
+        client, main = local_app()
+        models, database, social_feed = main.models, main.database, main.social_feed
+        from auth import core as auth
+        import schemas
+
+        db = database.SessionLocal()
+        try:
+            users = [auth.create_user(db, schemas.UserCreate(email=f"feed{i}@example.com", full_name=f"Feed {i}"))
+                     for i in range(3)]
+            base = datetime.utcnow() - timedelta(days=1)
+            for n in range(60):
+                user = users[n % 3]
+                gen = models.MemeGeneration(user_id=user.id, input_type="topic", topic=f"Topic {n}",
+                                            meme_type="image", num_memes=1, total_generated=1, successful_generations=1,
+                                            failed_generations=0, created_at=base + timedelta(minutes=n))
+                db.add(gen)
+                db.flush()
+                social_feed.add_meme(db, gen, user, [])
+                if n % 2:
+                    db.add(models.SocialLike(user_id=users[0].id, content_type="meme", content_id=gen.id))
+            db.commit()
+        finally:
+            db.close()
+
+        headers = {"Authorization": f"Bearer {auth.create_access_token({'sub': 'feed0@example.com'})}"}
+        engines = [database.engine] + ([database.async_engine.sync_engine] if database.async_engine is not None else [])
+        statements = [0]
+
+        def count(*args):
+            statements[0] += 1
+
+        counts = {}
+        for limit in (5, 50):
+            for engine in engines:
+                event.listen(engine, "before_cursor_execute", count)
+            statements[0] = 0
+            try:
+                res = client.get(f"/api/social/feed?limit={limit}", headers=headers)
+            finally:
+                for engine in engines:
+                    event.remove(engine, "before_cursor_execute", count)
+            if res.status_code != 200 or len(res.json()) != limit:
+                print_fail(f"Feed page of {limit} failed: {res.status_code}", res.text[:200])
+                return
+            counts[limit] = statements[0]
+
+        if counts[5] == counts[50] and counts[50] <= 6:
+            print_pass(f"Feed runs {counts[50]} statements for a page of 5 or 50 items")
+        else:
+            print_fail(f"Feed statement count grows with the page: {counts}")
+    except Exception as e:
+        print_fail("Feed query count exception", e)
+
+def test_generation_cache_hits():
+    print("\n--- Testing Generation Cache Hit Counts ---")
+    try:
+        client, main = local_app()
+        models, database, generation_cache = main.models, main.database, main.generation_cache
+        calls = []
+
+        async def fake_llm(text, num_questions, difficulty, content_type, config):
+            calls.append(text)
+            return [{"question": f"Q{i}", "options": {"A": "1", "B": "2", "C": "3", "D": "4"},
+                     "correct_answer": "A", "explanation": "e"} for i in range(num_questions)], "fake-model"
+
+        llm = main.generate_mcqs_with_llm
+        main.generate_mcqs_with_llm = fake_llm
+        try:
+            payload = {"text": "Cache hit counting source text", "num_questions": 2}
+            first = client.post("/api/generate-mcqs", json=payload).json()
+            hits = [client.post("/api/generate-mcqs", json=payload).json() for _ in range(2)]
+            # Second tier: a hit served from the table after the LRU is dropped
+            generation_cache.clear_memory()
+            hits.append(client.post("/api/generate-mcqs", json=payload).json())
+        finally:
+            main.generate_mcqs_with_llm = llm
+
+        if first.get("cached") is not False or not all(h.get("cached") for h in hits) or len(calls) != 1:
+            print_fail(f"Expected one generation then cache hits: {first.get('cached')}, "
+                       f"{[h.get('cached') for h in hits]}, {len(calls)} LLM calls")
+            return
+
+        generation_cache.flush_hits()
+        db = database.SessionLocal()
+        try:
+            hit_count = db.query(models.GenerationCacheEntry.hit_count).scalar()
+        finally:
+            db.close()
+        if hit_count == len(hits):
+            print_pass(f"Cache hits written back: hit_count {hit_count}")
+        else:
+            print_fail(f"hit_count is {hit_count}, expected {len(hits)}")
+    except Exception as e:
+        print_fail("Generation cache hit count exception", e)
+
+def test_stream_parser():
+    print("\n--- Testing Streamed Question Parser ---")
+    from mcq_stream import QuestionStreamParser
+    text = (
+        'Sure! Here are [2] questions about Python, see the "questions" list:\n'
+        '```json\n{"topic": "Python", "tags": ["a", "b"], "questions": [\n'
+        '  {"question": "What is [x]?", "options": {"a": "1", "b": "2"}, "correct_option": "a"},\n'
+        '  {"question": "Why \\"indent\\"?", "options": {"a": "3", "b": "4"}, "correct_option": "b"}\n'
+        '], "meta": {"note": "not a question"}}\n```'
+    )
+    try:
+        parser = QuestionStreamParser()
+        found = []
+        for i in range(0, len(text), 7):
+            found.extend(parser.feed(text[i:i + 7]))
+        if [q["question"] for q in found] == ["What is [x]?", 'Why "indent"?']:
+            print_pass("Parser skipped the prose and emitted only the two questions")
+        else:
+            print_fail("Parser emitted the wrong objects", found)
+    except Exception as e:
+        print_fail("Stream parser exception", e)
+
+def test_local_inference_batching():
+    print("\n--- Testing Local Inference Batching ---")
+    import asyncio
+    from local_inference import InferenceServer
+    try:
+        # Built before asyncio.run(), as local_inference.main() does
+        server = InferenceServer("stub", batch_wait_ms=5)
+        server.generate_batch = lambda prompts, max_new_tokens, temperature: [p.upper() for p in prompts]
+
+        async def run():
+            batcher = asyncio.ensure_future(server.batch_loop())
+            try:
+                return await asyncio.wait_for(
+                    asyncio.gather(server.submit("first", 8, 0.0), server.submit("second", 8, 0.0)), 5
+                )
+            finally:
+                batcher.cancel()
+
+        results = asyncio.run(run())
+        if results == ["FIRST", "SECOND"]:
+            print_pass("Submitted prompts got their batched results")
+        else:
+            print_fail("Wrong batched results", results)
+    except asyncio.TimeoutError:
+        print_fail("Submitted prompts never got a result")
+    except Exception as e:
+        print_fail("Local inference batching exception", e)
+
+def test_model_router_client_errors():
+    print("\n--- Testing Model Router Client Errors ---")
+    import model_router
+    try:
+        router = model_router.ModelRouter()
+        for _ in range(model_router.FAILURE_THRESHOLD + 2):
+            router.record_failure("m", status_code=400)
+        health = router.snapshot(["m"])[0]
+        if router.acquire(["m"]) != "m" or health["state"] != "closed" or health["consecutive_failures"]:
+            print_fail("Repeated 400s counted against the model", health)
+            return
+        for _ in range(model_router.FAILURE_THRESHOLD):
+            router.record_failure("m", status_code=503)
+        if router.acquire(["m"]) is None:
+            print_pass("400s left the circuit closed, 503s opened it")
+        else:
+            print_fail("Repeated 503s did not open the circuit", router.snapshot(["m"]))
+    except Exception as e:
+        print_fail("Model router exception", e)
+
 if __name__ == "__main__":
     print("🚀 Starting System Tests...")
     test_health()
@@ -137,4 +325,9 @@ if __name__ == "__main__":
     test_quiz_submission(gen_id)
     test_social_feed()
     test_database_integrity()
+    test_stream_parser()
+    test_social_feed_query_count()
+    test_generation_cache_hits()
+    test_local_inference_batching()
+    test_model_router_client_errors()
     print("\n✅ Testing Complete")
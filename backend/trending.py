@@ -0,0 +1,100 @@
+"""
+Trending scores for /api/trending.
+
+  score  views + 2*saves + 3*shares, computed in SQL at read time
+  hot    the same points decayed by age, Hacker News style:
+             points / (age_hours + 2) ** TRENDING_GRAVITY
+         precomputed into the trending_score column by a periodic job,
+         so reads are an index-ordered top-K
+
+Content older than TRENDING_WINDOW_DAYS has a hot score of 0.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+import db_writer
+import models
+
+TRENDING_GRAVITY = float(os.environ.get("TRENDING_GRAVITY", "1.8"))
+TRENDING_WINDOW_DAYS = int(os.environ.get("TRENDING_WINDOW_DAYS", "7"))
+TRENDING_REFRESH_INTERVAL_SECONDS = int(os.environ.get("TRENDING_REFRESH_INTERVAL_SECONDS", "300"))
+TRENDING_BATCH_SIZE = 500
+
+SORTS = ("score", "hot")
+MODELS = {"mcq": models.MCQGeneration, "meme": models.MemeGeneration}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def points(model):
+    """SQL expression for the undecayed trending score"""
+    return (
+        func.coalesce(model.view_count, 0)
+        + func.coalesce(model.save_count, 0) * 2
+        + func.coalesce(model.share_count, 0) * 3
+    )
+
+
+def decay(score: float, created_at: Optional[datetime], now: datetime) -> float:
+    if created_at is None:
+        return 0.0
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    age_hours = max((now - created_at).total_seconds() / 3600, 0)
+    return score / (age_hours + 2) ** TRENDING_GRAVITY
+
+
+def top(db: Session, model, since: datetime, limit: int, sort: str = "score") -> List[Tuple[object, float]]:
+    """Top `limit` items created since `since`: (row, trending score)"""
+    query = db.query(model).filter(model.created_at >= since)
+    if sort == "hot":
+        rows = query.filter(model.trending_score > 0).order_by(
+            model.trending_score.desc(), model.id.desc()
+        ).limit(limit).all()
+        return [(row, row.trending_score) for row in rows]
+
+    score = points(model).label("score")
+    return query.add_columns(score).order_by(score.desc(), model.id.desc()).limit(limit).all()
+
+
+def _expire(db: Session, model, cutoff: datetime):
+    db.execute(update(model).where(
+        model.trending_score > 0, model.created_at < cutoff
+    ).values(trending_score=0))
+
+
+def _write_scores(db: Session, model, scores: List[dict]):
+    # ORM bulk UPDATE by primary key: one executemany per batch
+    db.execute(update(model), scores)
+
+
+def refresh_scores(db: Session) -> int:
+    """Periodic job: recompute hot scores inside the window, zero the ones that left it.
+    Items without views, saves or shares keep their default score of 0.
+    Reads on db, writes through db_writer one batch at a time."""
+    now = _utcnow()
+    cutoff = now - timedelta(days=TRENDING_WINDOW_DAYS)
+    updated = 0
+    for model in MODELS.values():
+        db_writer.write_sync(_expire, model, cutoff)
+
+        last_id = 0
+        while True:
+            rows = db.query(model.id, points(model), model.created_at).filter(
+                model.created_at >= cutoff, points(model) > 0, model.id > last_id
+            ).order_by(model.id).limit(TRENDING_BATCH_SIZE).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            db_writer.write_sync(_write_scores, model, [
+                {"id": item_id, "trending_score": decay(score, created_at, now)}
+                for item_id, score, created_at in rows
+            ])
+            updated += len(rows)
+    return updated
@@ -0,0 +1,196 @@
+"""
+Async URL fetching + text extraction for /api/extract-url.
+
+- Shared httpx.AsyncClient (keep-alive pool) with hard timeouts
+- Body is streamed and aborted once it passes URL_MAX_BYTES
+- lxml parser when installed (much faster than html.parser), parsed off the event loop
+- Extracted text is cached on disk per URL together with the ETag /
+  Last-Modified validators, so a repeat extraction is a conditional GET
+  that usually costs a single 304
+"""
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Optional, Tuple
+
+import httpx
+from bs4 import BeautifulSoup
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+URL_FETCH_TIMEOUT = float(os.environ.get("URL_FETCH_TIMEOUT", "15"))
+URL_MAX_BYTES = int(os.environ.get("URL_MAX_BYTES", str(5 * 1024 * 1024)))
+URL_CACHE_DIR = os.environ.get(
+    "URL_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), "..", "url_cache")
+)
+URL_CACHE_FRESH_SECONDS = int(os.environ.get("URL_CACHE_FRESH_SECONDS", "60"))
+URL_CACHE_MAX_FILES = int(os.environ.get("URL_CACHE_MAX_FILES", "2000"))
+
+USER_AGENT = "Mozilla/5.0 (compatible; AI-MCQ-Meme-Generator/1.0)"
+
+# Cache statuses reported back to callers
+MISS = "miss"
+HIT = "hit"
+REVALIDATED = "revalidated"
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop = None
+_writes_since_prune = 0
+
+
+class FetchError(Exception):
+    pass
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=10),
+            follow_redirects=True,
+            headers={"User-Agent": USER_AGENT}
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+# --- disk cache ---
+
+def _cache_path(url: str) -> str:
+    return os.path.join(URL_CACHE_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+
+def _read_cache(url: str) -> Optional[dict]:
+    try:
+        with open(_cache_path(url), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        return entry if entry.get("url") == url else None
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(entry: dict):
+    """Best effort - a failed write is logged, never raised"""
+    global _writes_since_prune
+    path = _cache_path(entry["url"])
+    tmp_path = None
+    try:
+        os.makedirs(URL_CACHE_DIR, exist_ok=True)
+        # Unique per writer, so threads of one process never share a temp file
+        fd, tmp_path = tempfile.mkstemp(dir=URL_CACHE_DIR, prefix=os.path.basename(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)  # atomic, so concurrent readers never see half a file
+    except OSError as e:
+        print(f"URL cache write error: {e}")
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return
+
+    _writes_since_prune += 1
+    if _writes_since_prune >= 100:
+        _writes_since_prune = 0
+        _prune_cache()
+
+
+def _prune_cache():
+    """Keep only the URL_CACHE_MAX_FILES most recently written entries"""
+    try:
+        files = [os.path.join(URL_CACHE_DIR, name) for name in os.listdir(URL_CACHE_DIR) if name.endswith(".json")]
+        if len(files) <= URL_CACHE_MAX_FILES:
+            return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - URL_CACHE_MAX_FILES]:
+            os.remove(path)
+    except OSError as e:
+        print(f"URL cache prune error: {e}")
+
+
+# --- fetching ---
+
+def html_to_text(content: bytes) -> str:
+    soup = BeautifulSoup(content, HTML_PARSER)
+    # Basic text extraction - can be improved
+    paragraphs = soup.find_all('p')
+    return "\n".join([p.get_text() for p in paragraphs])
+
+
+async def _download(url: str, headers: dict) -> Tuple[int, dict, bytes]:
+    async with get_client().stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            return 304, dict(response.headers), b""
+        response.raise_for_status()
+
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > URL_MAX_BYTES:
+            raise FetchError(f"Page exceeds the {URL_MAX_BYTES} byte limit")
+
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body.extend(chunk)
+            if len(body) > URL_MAX_BYTES:
+                raise FetchError(f"Page exceeds the {URL_MAX_BYTES} byte limit")
+        return response.status_code, dict(response.headers), bytes(body)
+
+
+async def fetch_text(url: str) -> Tuple[str, str]:
+    """Return (extracted_text, cache_status) for url"""
+    entry = await run_in_threadpool(_read_cache, url)
+    if entry and time.time() - entry.get("checked_at", 0) < URL_CACHE_FRESH_SECONDS:
+        return entry["text"], HIT
+
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    try:
+        status, response_headers, body = await asyncio.wait_for(_download(url, headers), URL_FETCH_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise FetchError(f"Timed out after {URL_FETCH_TIMEOUT:.0f}s")
+    except (httpx.HTTPError, httpx.InvalidURL) as e:
+        raise FetchError(str(e))
+
+    if status == 304 and entry:
+        entry["checked_at"] = time.time()
+        await run_in_threadpool(_write_cache, entry)
+        return entry["text"], REVALIDATED
+
+    text = await run_in_threadpool(html_to_text, body)
+    lowered = {k.lower(): v for k, v in response_headers.items()}
+    new_entry = {
+        "url": url,
+        "etag": lowered.get("etag"),
+        "last_modified": lowered.get("last-modified"),
+        "text": text,
+        "fetched_at": time.time(),
+        "checked_at": time.time()
+    }
+    # Pages without validators are only useful within the freshness window
+    if new_entry["etag"] or new_entry["last_modified"] or URL_CACHE_FRESH_SECONDS > 0:
+        await run_in_threadpool(_write_cache, new_entry)
+    return text, MISS
@@ -0,0 +1,120 @@
+"""
+Write-behind buffer for the view/share counters of /api/content/view and
+/api/content/share.
+
+Hits only add to an in-memory dict keyed by (content_type, id, column).
+A background task flushes it as batched
+    UPDATE <table> SET view_count = view_count + :n WHERE id = :id
+statements every COUNTER_FLUSH_INTERVAL_MS, as soon as
+COUNTER_FLUSH_EVENTS hits are pending, and once more on shutdown.
+A failed flush puts its counts back so they go out with the next one.
+"""
+import asyncio
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, func, update
+
+import db_writer
+import models
+
+COUNTER_FLUSH_INTERVAL_MS = int(os.environ.get("COUNTER_FLUSH_INTERVAL_MS", "250"))
+COUNTER_FLUSH_EVENTS = int(os.environ.get("COUNTER_FLUSH_EVENTS", "500"))
+
+TABLES = {"mcq": models.MCQGeneration.__table__, "meme": models.MemeGeneration.__table__}
+COLUMNS = ("view_count", "share_count")
+
+_pending: Dict[Tuple[str, int, str], int] = defaultdict(int)
+_pending_events = 0
+_lock = threading.Lock()
+_wake: Optional[asyncio.Event] = None
+_task: Optional[asyncio.Task] = None
+
+
+def add(content_type: str, content_id: int, column: str, n: int = 1) -> bool:
+    """Buffer an increment; False for content types without counters"""
+    global _pending_events
+    if content_type not in TABLES or column not in COLUMNS:
+        return False
+    with _lock:
+        _pending[(content_type, content_id, column)] += n
+        _pending_events += n
+        full = _pending_events >= COUNTER_FLUSH_EVENTS
+    if full and _wake is not None:
+        _wake.set()
+    return True
+
+
+def _take() -> Dict[Tuple[str, int, str], int]:
+    global _pending, _pending_events
+    with _lock:
+        batch, _pending, _pending_events = _pending, defaultdict(int), 0
+    return batch
+
+
+def _restore(batch: Dict[Tuple[str, int, str], int]):
+    global _pending_events
+    with _lock:
+        for key, n in batch.items():
+            _pending[key] += n
+            _pending_events += n
+
+
+def flush() -> int:
+    """Write all pending increments, one executemany per (table, column); returns rows touched"""
+    batch = _take()
+    if not batch:
+        return 0
+    grouped = defaultdict(list)
+    for (content_type, content_id, column), n in batch.items():
+        grouped[(content_type, column)].append({"b_id": content_id, "n": n})
+
+    try:
+        db_writer.write_sync(_write, grouped)
+    except Exception as e:
+        _restore(batch)
+        print(f"Counter flush failed, will retry: {e}")
+        return 0
+    return len(batch)
+
+
+def _write(db, grouped):
+    for (content_type, column), params in grouped.items():
+        table = TABLES[content_type]
+        db.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values(
+                {column: func.coalesce(table.c[column], 0) + bindparam("n")}
+            ),
+            params
+        )
+
+
+async def _run():
+    while True:
+        try:
+            await asyncio.wait_for(_wake.wait(), COUNTER_FLUSH_INTERVAL_MS / 1000)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+        await run_in_threadpool(flush)
+
+
+def start():
+    global _wake, _task
+    if _task is None:
+        _wake = asyncio.Event()
+        _task = asyncio.get_running_loop().create_task(_run())
+
+
+async def stop():
+    """Cancel the flusher and write whatever is still buffered"""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+    await run_in_threadpool(flush)
+
@@ -261,7 +261,7 @@ class AnalyticsSDK {
                 is_active: false
             });
 
-            navigator.sendBeacon('/api/track-session', data);
+            navigator.sendBeacon('/api/track-session', new Blob([data], { type: 'application/json' }));
         };
 
         window.addEventListener('beforeunload', endSession);
@@ -301,14 +301,15 @@ class AnalyticsSDK {
         this.events = [];
 
         try {
-            for (const event of eventsToSend) {
-                await fetch('/api/track-event', {
+            // One request per batch (the server accepts up to 100 events per request)
+            for (let i = 0; i < eventsToSend.length; i += 100) {
+                await fetch('/api/track-events', {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json',
                         'Authorization': `Bearer ${localStorage.getItem('token') || ''}`
                     },
-                    body: JSON.stringify(event)
+                    body: JSON.stringify({ events: eventsToSend.slice(i, i + 100) })
                 });
             }
         } catch (error) {